@@ -0,0 +1,349 @@
+"""
+SHA-256 Hashing Microbenchmarks
+===============================
+Measures the hashing functions and Flask routes in SHA256.py so changes
+can be checked for throughput regressions before they are deployed.
+
+Suites:
+    file       calculate_sha256() per read strategy and block size
+    bytes      calculate_sha256_from_bytes() (the in-memory path)
+    endpoints  every hashing route, driven through the Flask test client,
+               including the batch and Merkle routes
+
+Run this file:
+    python bench_sha256.py                          # default sizes, print a table
+    python bench_sha256.py -o results.json          # save machine-readable results
+    python bench_sha256.py --baseline results.json  # compare, exit 1 on regression
+    python bench_sha256.py --max-size 4G --suite file
+
+Sizes go from bytes to --max-size (default 256M). Data is generated from a
+fixed seed so runs are reproducible; the on-disk files are written to a
+temporary directory and removed afterwards.
+"""
+
+import argparse
+import io
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BENCH_SEED = 1234
+SIZE_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+ALL_SIZES = [64, 4 * 1024, 64 * 1024, 1024 ** 2, 16 * 1024 ** 2, 256 * 1024 ** 2,
+             1024 ** 3, 4 * 1024 ** 3]
+BLOCK_SIZES = [8192, 64 * 1024, 1024 ** 2, 8 * 1024 ** 2]
+# The batch route is timed with the size split over this many files
+BATCH_FILES = 4
+# Merkle leaves for the Merkle routes; small enough that sizes from 1M
+# up have several leaves
+MERKLE_BENCH_CHUNK = 256 * 1024
+
+
+def parse_size(text):
+    """Parse sizes like '512', '64K', '16M' or '4G' into bytes."""
+    text = text.strip().upper().rstrip('B')
+    unit = text[-1] if text and text[-1] in SIZE_UNITS else ''
+    return int(float(text[:len(text) - len(unit)]) * SIZE_UNITS[unit])
+
+
+def format_size(size):
+    for unit in ('G', 'M', 'K'):
+        if size >= SIZE_UNITS[unit] and size % SIZE_UNITS[unit] == 0:
+            return f"{size // SIZE_UNITS[unit]}{unit}"
+    return str(size)
+
+
+def make_data(size):
+    """Return ``size`` reproducible pseudo-random bytes."""
+    block = random.Random(BENCH_SEED).randbytes(min(size, 1024 ** 2))
+    if size <= len(block):
+        return block
+    return (block * (size // len(block) + 1))[:size]
+
+
+def make_file(directory, size):
+    """Write a reproducible file of ``size`` bytes and return its path."""
+    path = os.path.join(directory, f"bench-{size}.bin")
+    if not os.path.exists(path):
+        block = make_data(min(size, 1024 ** 2))
+        with open(path, 'wb') as f:
+            remaining = size
+            while remaining > 0:
+                f.write(block[:remaining])
+                remaining -= len(block)
+    return path
+
+
+class SaltedReader(io.RawIOBase):
+    """
+    Read ``data`` with its first bytes replaced by ``salt``.
+
+    Gives every request of a benchmark different content (so /upload
+    measures storing a new file, not the dedup path) without copying
+    the payload for each call.
+    """
+
+    def __init__(self, data, salt):
+        salt = salt[:len(data)]
+        self.parts = [memoryview(salt), memoryview(data)[len(salt):]]
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while self.parts and not self.parts[0]:
+            self.parts.pop(0)
+        if not self.parts:
+            return 0
+        size = min(len(buffer), len(self.parts[0]))
+        buffer[:size] = self.parts[0][:size]
+        self.parts[0] = self.parts[0][size:]
+        return size
+
+
+def measure(fn, size, min_time=0.2, repeat=5):
+    """
+    Time ``fn`` and return its best and median run time.
+
+    The number of calls per run is scaled so each run lasts at least
+    ``min_time`` seconds, which keeps small sizes from being all noise.
+
+    Returns:
+        dict: best_s, median_s (seconds per call), calls per run, MB/s
+    """
+    fn()  # warm up (page cache, imports, pools)
+    start = time.perf_counter()
+    fn()
+    once = max(time.perf_counter() - start, 1e-9)
+    number = max(1, int(min_time / once))
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        timings.append((time.perf_counter() - start) / number)
+
+    best = min(timings)
+    return {
+        'best_s': best,
+        'median_s': statistics.median(timings),
+        'calls': number,
+        'mb_per_s': size / best / 1024 ** 2
+    }
+
+
+def bench_file(sha256, sizes, workdir, repeat):
+    results = []
+    for size in sizes:
+        path = make_file(workdir, size)
+        for strategy in ('auto',) + sha256.HASH_STRATEGIES:
+            block_sizes = [sha256.HASH_BLOCK_SIZE] if strategy in ('auto', 'mmap') else BLOCK_SIZES
+            for block_size in block_sizes:
+                stats = measure(lambda: sha256.calculate_sha256(
+                    path, strategy, block_size, use_cache=False), size, repeat=repeat)
+                results.append(dict(stats, suite='file', name='calculate_sha256',
+                                    size=size, strategy=strategy, block_size=block_size))
+    return results
+
+
+def bench_bytes(sha256, sizes, repeat):
+    results = []
+    for size in sizes:
+        data = make_data(size)
+        stats = measure(lambda: sha256.calculate_sha256_from_bytes(data), size, repeat=repeat)
+        results.append(dict(stats, suite='bytes', name='calculate_sha256_from_bytes', size=size))
+    return results
+
+
+def bench_endpoints(sha256, sizes, repeat):
+    client = sha256.app.test_client()
+    limit = sha256.app.config['MAX_CONTENT_LENGTH'] or float('inf')
+    salts = itertools.count()
+    results = []
+
+    def check(route, response):
+        if response.status_code != 200:
+            raise RuntimeError(f"{route} returned {response.status_code}")
+        return response
+
+    for size in sizes:
+        # Leave room for the multipart framing
+        if size > limit - 64 * 1024:
+            continue
+        data = make_data(size)
+        expected = sha256.calculate_sha256_from_bytes(data)
+        routes = {
+            '/upload': {},
+            '/verify': {'expected_hash': expected},
+            '/api/calculate-hash': {},
+            '/api/verify-hash': {'client_hash': expected},
+            '/api/merkle-hash': {'chunk_size': str(MERKLE_BENCH_CHUNK)},
+        }
+        for route, fields in routes.items():
+            def post():
+                # Identical uploads would only measure the dedup path
+                stream = (SaltedReader(data, next(salts).to_bytes(8, 'big')) if route == '/upload'
+                          else io.BytesIO(data))
+                form = dict(fields, file=(stream, 'bench.bin'))
+                check(route, client.post(route, data=form, content_type='multipart/form-data'))
+            stats = measure(post, size, repeat=repeat)
+            results.append(dict(stats, suite='endpoints', name=route, size=size))
+
+        part = max(1, size // BATCH_FILES)
+
+        def post_batch():
+            form = {'files': [(io.BytesIO(data[i * part:(i + 1) * part]), f'bench-{i}.bin')
+                              for i in range(BATCH_FILES)]}
+            check('/api/calculate-hash-batch', client.post(
+                '/api/calculate-hash-batch', data=form, content_type='multipart/form-data'))
+        stats = measure(post_batch, part * BATCH_FILES, repeat=repeat)
+        results.append(dict(stats, suite='endpoints', name='/api/calculate-hash-batch', size=size))
+
+        # Re-check every leaf of a stored file against its Merkle hashes
+        filename = f'bench-merkle-{size}.bin'
+        check('/upload', client.post('/upload', data={'file': (io.BytesIO(data), filename)},
+                                     content_type='multipart/form-data'))
+        tree = check('/api/merkle-hash', client.post(
+            '/api/merkle-hash', data={'file': (io.BytesIO(data), filename),
+                                      'chunk_size': str(MERKLE_BENCH_CHUNK)},
+            content_type='multipart/form-data')).get_json()
+        request = {'filename': filename, 'chunk_size': MERKLE_BENCH_CHUNK, 'chunks': tree['chunks']}
+
+        def post_merkle_verify():
+            verified = check('/api/merkle-verify', client.post('/api/merkle-verify', json=request))
+            if not verified.get_json()['verified']:
+                raise RuntimeError('/api/merkle-verify reported corruption')
+        stats = measure(post_merkle_verify, size, repeat=repeat)
+        results.append(dict(stats, suite='endpoints', name='/api/merkle-verify', size=size))
+    return results
+
+
+def result_key(result):
+    """Identify a result independently of its timings."""
+    return (result['suite'], result['name'], result['size'],
+            result.get('strategy'), result.get('block_size'))
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compare results against a baseline run.
+
+    Args:
+        results (list): Results of this run
+        baseline (list): Results loaded from a saved run
+        tolerance (float): Allowed slowdown, e.g. 0.1 for 10%
+
+    Returns:
+        list: (result, baseline result, change) for every regression
+    """
+    previous = {result_key(r): r for r in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get(result_key(result))
+        if before is None:
+            continue
+        change = result['mb_per_s'] / before['mb_per_s'] - 1
+        result['baseline_mb_per_s'] = before['mb_per_s']
+        result['change'] = change
+        if change < -tolerance:
+            regressions.append((result, before, change))
+    return regressions
+
+
+def environment_info():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ''
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'commit': commit or None,
+    }
+
+
+def print_table(results):
+    print(f"{'suite':<10} {'name':<28} {'size':>6} {'strategy':<9} {'block':>6} "
+          f"{'MB/s':>10} {'change':>8}")
+    for r in results:
+        change = f"{r['change'] * 100:+.1f}%" if 'change' in r else ''
+        block = format_size(r['block_size']) if r.get('block_size') else ''
+        print(f"{r['suite']:<10} {r['name']:<28} {format_size(r['size']):>6} "
+              f"{r.get('strategy') or '':<9} {block:>6} {r['mb_per_s']:>10.1f} {change:>8}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='SHA-256 hashing microbenchmarks')
+    parser.add_argument('--suite', action='append', choices=['file', 'bytes', 'endpoints'],
+                        help='Suite to run (repeatable, default: all)')
+    parser.add_argument('--max-size', type=parse_size, default=parse_size('256M'),
+                        help='Largest size to benchmark (default: 256M)')
+    parser.add_argument('--sizes', help='Comma-separated sizes instead of the default ladder')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs per case (default: 5)')
+    parser.add_argument('-o', '--output', help='Write results as JSON to this file')
+    parser.add_argument('--baseline', help='JSON results to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help='Allowed slowdown against the baseline (default: 0.10)')
+    args = parser.parse_args(argv)
+
+    suites = args.suite or ['file', 'bytes', 'endpoints']
+    if args.sizes:
+        sizes = [parse_size(s) for s in args.sizes.split(',')]
+    else:
+        sizes = [s for s in ALL_SIZES if s <= args.max_size]
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    with tempfile.TemporaryDirectory(prefix='sha256-bench-') as workdir:
+        # SHA256.py creates its upload folder relative to the working
+        # directory, so keep it inside the scratch directory
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            import SHA256 as sha256
+            results = []
+            if 'file' in suites:
+                results += bench_file(sha256, sizes, workdir, args.repeat)
+            if 'bytes' in suites:
+                results += bench_bytes(sha256, sizes, args.repeat)
+            if 'endpoints' in suites:
+                results += bench_endpoints(sha256, sizes, args.repeat)
+        finally:
+            os.chdir(cwd)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f)['results'], args.tolerance)
+
+    print_table(results)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'environment': environment_info(), 'results': results}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+        for result, before, change in regressions:
+            print(f"  {result['suite']} {result['name']} {format_size(result['size'])} "
+                  f"{result.get('strategy') or ''}: {before['mb_per_s']:.1f} -> "
+                  f"{result['mb_per_s']:.1f} MB/s ({change * 100:+.1f}%)")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
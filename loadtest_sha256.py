@@ -0,0 +1,352 @@
+"""
+SHA-256 Service Load Test
+=========================
+Drives the hashing routes of SHA256.py with concurrent clients and reports
+latency percentiles and throughput, so worker counts can be sized and
+scaling claims checked before a release. Unlike bench_sha256.py, requests
+go over real HTTP to a real server process.
+
+By default the app is started locally on a free port (in a temporary
+directory, so nothing is left behind); use --url to load an already
+running server instead. No external services are needed.
+
+Workload profile:
+    --endpoints   route mix as name=weight, e.g. upload=1,verify=1,calculate-hash=2
+    --sizes       file-size mix as size=weight, e.g. 4K=70,1M=25,8M=5
+    --concurrency client counts to sweep, e.g. 1,4,16,64
+    --duration    seconds per concurrency level
+
+Or put the same keys in a JSON file and pass --profile FILE.
+
+Run this file:
+    python loadtest_sha256.py                              # default profile
+    python loadtest_sha256.py --concurrency 1,8,32 -o report.json
+    python loadtest_sha256.py --workers 4 --threads 8      # size the local server
+    python loadtest_sha256.py --url http://127.0.0.1:5000 --duration 30
+"""
+
+import argparse
+import hashlib
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit
+
+from bench_sha256 import environment_info, format_size, make_data, parse_size
+
+ENDPOINTS = {
+    'upload': '/upload',
+    'verify': '/verify',
+    'calculate-hash': '/api/calculate-hash',
+    'verify-hash': '/api/verify-hash',
+}
+
+DEFAULT_PROFILE = {
+    'endpoints': {'upload': 1, 'verify': 1, 'calculate-hash': 1, 'verify-hash': 1},
+    'sizes': {'4K': 60, '256K': 30, '4M': 10},
+    'concurrency': [1, 4, 16],
+    'duration': 10,
+    'seed': 1234,
+}
+
+
+def parse_weights(text):
+    """Parse 'a=1,b=2' into {'a': 1.0, 'b': 2.0}; a name without '=' gets weight 1."""
+    weights = {}
+    for item in text.split(','):
+        name, _, weight = item.partition('=')
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, int(round(p / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def multipart_frame(fields, filename):
+    """
+    Encode form fields and the framing around one file part.
+
+    Returns:
+        tuple: (bytes before the file data, bytes after it, Content-Type header value)
+    """
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n'
+                     f'{value}\r\n'.encode())
+    parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="file"; '
+                 f'filename="{filename}"\r\nContent-Type: application/octet-stream\r\n\r\n'.encode())
+    return b''.join(parts), f'\r\n--{boundary}--\r\n'.encode(), f'multipart/form-data; boundary={boundary}'
+
+
+def multipart_body(fields, filename, data):
+    """
+    Encode form fields and one file part as multipart/form-data.
+
+    Returns:
+        tuple: (body bytes, Content-Type header value)
+    """
+    head, tail, content_type = multipart_frame(fields, filename)
+    return head + data + tail, content_type
+
+
+class Workload:
+    """
+    Pre-built request bodies for every (endpoint, size) in a profile.
+
+    Bodies are built once up front so the clients spend their time
+    waiting on the server, not on encoding. Uploads are the exception
+    in one respect: the server stores identical content only once, so
+    every upload gets a random salt over the start of its data (sent
+    as separate pieces, without copying the data).
+    """
+
+    def __init__(self, profile):
+        self.endpoints = list(profile['endpoints'].items())
+        self.sizes = [(parse_size(size), weight) for size, weight in profile['sizes'].items()]
+        for name, _ in self.endpoints:
+            if name not in ENDPOINTS:
+                raise ValueError(f"Unknown endpoint '{name}' (choose from {', '.join(ENDPOINTS)})")
+
+        self.bodies = {}
+        for size, _ in self.sizes:
+            data = make_data(size)
+            digest = hashlib.sha256(data).hexdigest()
+            for name, _ in self.endpoints:
+                fields = {'verify': {'expected_hash': digest},
+                          'verify-hash': {'client_hash': digest}}.get(name, {})
+                if name == 'upload':
+                    head, tail, content_type = multipart_frame(fields, f'load-{size}.bin')
+                    self.bodies[name, size] = (head, data, tail), content_type
+                else:
+                    self.bodies[name, size] = multipart_body(fields, f'load-{size}.bin', data)
+
+    def pick(self, rng):
+        """Return (endpoint name, size) drawn from the profile's weights."""
+        name = rng.choices([n for n, _ in self.endpoints], [w for _, w in self.endpoints])[0]
+        size = rng.choices([s for s, _ in self.sizes], [w for _, w in self.sizes])[0]
+        return name, size
+
+    def body(self, name, size):
+        """
+        Return (body, Content-Type) for one request.
+
+        The body is bytes, or for uploads a tuple of pieces with a fresh
+        salt, so each upload is new content to the server.
+        """
+        body, content_type = self.bodies[name, size]
+        if name != 'upload':
+            return body, content_type
+        head, data, tail = body
+        salt = uuid.uuid4().bytes[:len(data)]
+        return (head, salt, memoryview(data)[len(salt):], tail), content_type
+
+
+def run_level(url, workload, concurrency, duration, seed):
+    """
+    Run ``concurrency`` clients for ``duration`` seconds.
+
+    Each client keeps one HTTP/1.1 connection open and sends requests
+    back to back, picking endpoint and size from the profile.
+
+    Returns:
+        tuple: (list of (endpoint, size, latency seconds, ok) per request,
+            wall-clock seconds)
+    """
+    target = urlsplit(url)
+    samples = []
+    samples_lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(client_id):
+        rng = random.Random(seed * 1000 + client_id)
+        conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=120)
+        mine = []
+        while time.perf_counter() < deadline:
+            name, size = workload.pick(rng)
+            body, content_type = workload.body(name, size)
+            length = len(body) if isinstance(body, bytes) else sum(len(piece) for piece in body)
+            start = time.perf_counter()
+            try:
+                conn.request('POST', ENDPOINTS[name], body,
+                             {'Content-Type': content_type, 'Content-Length': str(length)})
+                response = conn.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                ok = False
+                conn.close()
+                conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=120)
+            mine.append((name, size, time.perf_counter() - start, ok))
+        conn.close()
+        with samples_lock:
+            samples.extend(mine)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - started
+
+
+def summarize(samples, elapsed):
+    """Latency percentiles (ms) and throughput for a list of samples."""
+    latencies = sorted(s[2] for s in samples if s[3])
+    ok_bytes = sum(s[1] for s in samples if s[3])
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for s in samples if not s[3]),
+        'req_per_s': len(latencies) / elapsed if elapsed else 0.0,
+        'mb_per_s': ok_bytes / elapsed / 1024 ** 2 if elapsed else 0.0,
+        'p50_ms': (percentile(latencies, 50) or 0) * 1000,
+        'p95_ms': (percentile(latencies, 95) or 0) * 1000,
+        'p99_ms': (percentile(latencies, 99) or 0) * 1000,
+        'max_ms': (latencies[-1] if latencies else 0) * 1000,
+    }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workdir, port, workers=None, threads=None, timeout=30):
+    """
+    Start SHA256.py on 127.0.0.1:port in a child process.
+
+    The child runs the production server (``SHA256.py serve``) in
+    ``workdir`` so its upload folder is scratch space. Returns once the
+    port accepts connections.
+
+    Returns:
+        subprocess.Popen: The server process
+    """
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'SHA256.py')
+    command = [sys.executable, script, 'serve', '--host', '127.0.0.1', '--port', str(port)]
+    if workers:
+        command += ['--workers', str(workers)]
+    if threads:
+        command += ['--threads', str(threads)]
+    process = subprocess.Popen(command, cwd=workdir,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"Server did not start listening on port {port}")
+
+
+def load_test(url, profile, report=print):
+    """
+    Run every concurrency level of a profile against a server.
+
+    Returns:
+        list: One result per concurrency level, with an overall summary
+            and a breakdown per endpoint
+    """
+    workload = Workload(profile)
+    results = []
+    for concurrency in profile['concurrency']:
+        samples, elapsed = run_level(url, workload, concurrency, profile['duration'],
+                                     profile['seed'])
+        result = dict(summarize(samples, elapsed), concurrency=concurrency, endpoints={})
+        for name, _ in workload.endpoints:
+            result['endpoints'][name] = summarize([s for s in samples if s[0] == name], elapsed)
+        results.append(result)
+        report(result)
+    return results
+
+
+def print_level(result):
+    row = (f"{result['concurrency']:>5} {result['requests']:>8} {result['errors']:>6} "
+           f"{result['req_per_s']:>9.1f} {result['mb_per_s']:>8.1f} {result['p50_ms']:>8.1f} "
+           f"{result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f}")
+    print(row)
+    for name, stats in result['endpoints'].items():
+        print(f"{'':>5} {name:<16} {stats['requests']:>6} req, {stats['errors']} err, "
+              f"p50 {stats['p50_ms']:.1f} / p95 {stats['p95_ms']:.1f} / "
+              f"p99 {stats['p99_ms']:.1f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load test the SHA-256 web service')
+    parser.add_argument('--url', help='Load this running server instead of starting one')
+    parser.add_argument('--workers', type=int, help='Server processes for the local server')
+    parser.add_argument('--threads', type=int, help='Threads per server process')
+    parser.add_argument('--profile', help='JSON workload profile (keys as in DEFAULT_PROFILE)')
+    parser.add_argument('--endpoints', help='Endpoint mix, e.g. upload=1,verify-hash=3')
+    parser.add_argument('--sizes', help='File-size mix, e.g. 4K=70,1M=25,8M=5')
+    parser.add_argument('--concurrency', help='Comma-separated client counts to sweep')
+    parser.add_argument('--duration', type=float, help='Seconds per concurrency level')
+    parser.add_argument('--seed', type=int, help='Random seed for the request mix')
+    parser.add_argument('-o', '--output', help='Write the report as JSON to this file')
+    args = parser.parse_args(argv)
+
+    profile = dict(DEFAULT_PROFILE)
+    if args.profile:
+        with open(args.profile) as f:
+            profile.update(json.load(f))
+    if args.endpoints:
+        profile['endpoints'] = parse_weights(args.endpoints)
+    if args.sizes:
+        profile['sizes'] = parse_weights(args.sizes)
+    if args.concurrency:
+        profile['concurrency'] = [int(c) for c in args.concurrency.split(',')]
+    if args.duration is not None:
+        profile['duration'] = args.duration
+    if args.seed is not None:
+        profile['seed'] = args.seed
+
+    sizes = ', '.join(f"{format_size(parse_size(s))}={w:g}" for s, w in profile['sizes'].items())
+    endpoints = ', '.join(f"{n}={w:g}" for n, w in profile['endpoints'].items())
+    print(f"endpoints: {endpoints}\nsizes: {sizes}\n{profile['duration']:g}s per level\n")
+    print(f"{'conc':>5} {'requests':>8} {'errors':>6} {'req/s':>9} {'MB/s':>8} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+
+    with tempfile.TemporaryDirectory(prefix='sha256-load-') as workdir:
+        server = None
+        url = args.url
+        if not url:
+            port = free_port()
+            server = start_server(workdir, port, args.workers, args.threads)
+            url = f'http://127.0.0.1:{port}'
+        try:
+            results = load_test(url, profile, report=print_level)
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'environment': environment_info(), 'url': args.url or 'local',
+                       'profile': profile, 'results': results}, f, indent=2)
+        print(f"\nReport written to {args.output}")
+
+    return 1 if any(r['errors'] for r in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
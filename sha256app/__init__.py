@@ -0,0 +1,29 @@
+"""
+SHA-256 file integrity checker: the Flask app, its hashing engine and stores.
+
+SHA256.py at the top of the repository is the entry point and re-exports
+the public names. Modules only import from modules above them here:
+
+    config        Flask app and app.config
+    metrics       Prometheus metrics
+    backends      hash backend registry, new_hash()
+    database      SQLite base class
+    hashing       file and stream hashing, digest cache, thread pools
+    compression   gzip/zstd request bodies
+    profiling     Server-Timing phases and request profiling
+    admission     admission control for hashing work
+    ingest        hashing request bodies while they stream in
+    store         content-addressed storage and the hash catalog
+    uploads       resumable uploads
+    scrubber      background integrity scrubber
+    jobs          hashing job queue
+    merkle        Merkle-tree hashing
+    ranges        byte-range and sampled hashing
+    delta         block signatures and delta uploads
+    manifest      directory tree manifests and bulk verification
+    page          the web interface page
+    routes        Flask routes and request hook registration
+    server        pre-fork production server
+    asgi          ASGI serving mode
+    cli           command line
+"""
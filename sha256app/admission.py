@@ -0,0 +1,358 @@
+"""
+Admission control and backpressure for hashing work.
+"""
+
+from flask import g, request, jsonify
+import asyncio
+import math
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+from .config import app
+from .metrics import LATENCY_BUCKETS, metrics
+
+
+class Overloaded(Exception):
+    """Raised when a request cannot be admitted; carries a Retry-After hint."""
+    
+    def __init__(self, reason, retry_after):
+        super().__init__(f"Server busy ({reason}), retry after {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+# acquire() timeout meaning "use max_wait"
+DEFAULT_WAIT = object()
+
+
+class _AdmissionWaiter:
+    """One queued acquire(); woken by the releaser that admits it."""
+    
+    __slots__ = ('nbytes', 'queued', 'admitted_at', 'event', 'loop', 'future')
+    
+    def __init__(self, nbytes):
+        self.nbytes = nbytes
+        self.queued = time.monotonic()
+        self.admitted_at = None
+        self.event = None
+        self.loop = None
+        self.future = None
+
+
+class AdmissionController:
+    """
+    Limits how much hashing work runs at once.
+    
+    A hashing request is admitted once, before its body is read, and
+    counts its declared size (Content-Length) against the byte budget
+    until its response is done. Routes that hash stored files receive
+    their (small) request body first and then hold one slot while they
+    work. Background jobs, which have no request to reject, admit each
+    block they hash instead (see admitted_update()).
+    
+    While the concurrency or byte budget is used up, work waits in a
+    FIFO queue; a request is rejected with Overloaded (HTTP 503 +
+    Retry-After) when the queue is full or it has waited max_wait
+    seconds, so a rejected upload is never received. check() applies
+    the queue test without reserving anything.
+    
+    Work bigger than the whole byte budget is admitted only when nothing
+    else is running, so it cannot starve. Waiters are either
+    threads (acquire()) or coroutines (acquire_async()); a coroutine waits
+    on a future and never ties up a thread.
+    
+    The limits are server-wide. Each process runs its own controller, so
+    a server with several processes gives each one an equal share (see
+    set_processes()).
+    
+    Args:
+        max_concurrent (int): Hashing work running at the same time (0 = unlimited)
+        max_bytes (int): Total bytes of admitted work (0 = unlimited)
+        max_queue (int): Work allowed to wait for admission
+        max_wait (float): Seconds a request may wait before being rejected
+        processes (int): Server processes sharing the limits
+    """
+    
+    def __init__(self, max_concurrent=0, max_bytes=0, max_queue=64, max_wait=2.0, processes=1):
+        self.limits = (max_concurrent, max_bytes, max_queue)
+        self.max_wait = max_wait
+        self.active = 0
+        self.active_bytes = 0
+        self.rejected = Counter()
+        self.admitted = 0
+        self.avg_hold = 0.1       # moving average of seconds a slot is held
+        self._waiters = deque()
+        self._lock = threading.Lock()
+        self.set_processes(processes)
+    
+    def set_processes(self, processes):
+        """
+        Share the configured limits among ``processes`` server processes.
+        
+        Every limit is divided by the number of processes, rounded up so
+        each process can run at least one piece of work. Called in each
+        worker after it is started.
+        """
+        processes = max(1, processes)
+        with self._lock:
+            self.processes = processes
+            self.max_concurrent, self.max_bytes, self.max_queue = (
+                -(-limit // processes) for limit in self.limits)
+            self._wake()
+    
+    def _fits(self, nbytes):
+        if self.max_concurrent and self.active >= self.max_concurrent:
+            return False
+        if self.max_bytes and self.active_bytes + nbytes > self.max_bytes:
+            return self.active == 0
+        return True
+    
+    def _retry_after(self):
+        # Time for the work ahead of a new arrival to drain, at least 1s
+        slots = self.max_concurrent or max(1, self.active)
+        return max(1, int(math.ceil(self.avg_hold * (len(self._waiters) + self.active) / slots)))
+    
+    def _reject(self, reason):
+        self.rejected[reason] += 1
+        metrics.inc('sha256_admission_rejected_total', (('reason', reason),))
+        raise Overloaded(reason, self._retry_after())
+    
+    def _admit(self, nbytes, waited):
+        self.active += 1
+        self.active_bytes += nbytes
+        self.admitted += 1
+        metrics.inc('sha256_admission_active')
+        metrics.inc('sha256_admission_active_bytes', value=nbytes)
+        metrics.observe('sha256_admission_wait_seconds', waited)
+        return time.monotonic()
+    
+    def _wake(self):
+        # Admit waiters from the head of the queue for as long as they
+        # fit, on their behalf, then wake them. Called with the lock held.
+        while self._waiters and self._fits(self._waiters[0].nbytes):
+            waiter = self._waiters.popleft()
+            metrics.inc('sha256_admission_queue_depth', value=-1)
+            waiter.admitted_at = self._admit(waiter.nbytes, time.monotonic() - waiter.queued)
+            if waiter.future is not None:
+                waiter.loop.call_soon_threadsafe(_wake_future, waiter.future)
+            else:
+                waiter.event.set()
+    
+    def _enqueue(self, nbytes, timeout):
+        # Returns the admission time if there was room, else a queued waiter
+        if not self._waiters and self._fits(nbytes):
+            return self._admit(nbytes, 0.0)
+        if timeout is not None and len(self._waiters) >= self.max_queue:
+            self._reject('queue_full')
+        waiter = _AdmissionWaiter(nbytes)
+        self._waiters.append(waiter)
+        metrics.inc('sha256_admission_queue_depth')
+        return waiter
+    
+    def _give_up(self, waiter):
+        # A waiter stops waiting; True if it was admitted in the meantime
+        if waiter.admitted_at is not None:
+            return True
+        self._waiters.remove(waiter)
+        metrics.inc('sha256_admission_queue_depth', value=-1)
+        self._wake()
+        return False
+    
+    def check(self):
+        """
+        Reject a new request straight away if the server is overloaded.
+        
+        Nothing is reserved; the request is admitted later with acquire(),
+        once its body has been received.
+        
+        Raises:
+            Overloaded: If the queue is full, or its head has waited longer
+                than max_wait
+        """
+        with self._lock:
+            if len(self._waiters) >= self.max_queue:
+                self._reject('queue_full')
+            if self._waiters and time.monotonic() - self._waiters[0].queued > self.max_wait:
+                self._reject('timeout')
+    
+    def acquire(self, nbytes=0, timeout=DEFAULT_WAIT):
+        """
+        Wait for a slot and ``nbytes`` of budget.
+        
+        Args:
+            nbytes (int): Bytes the work will hash
+            timeout (float): Seconds to wait before Overloaded (default:
+                max_wait); None waits as long as it takes and is never
+                rejected for a full queue
+        
+        Returns:
+            float: Time of admission, to be passed to release()
+        
+        Raises:
+            Overloaded: If the queue is full or the wait timed out
+        """
+        if timeout is DEFAULT_WAIT:
+            timeout = self.max_wait
+        with self._lock:
+            waiter = self._enqueue(nbytes, timeout)
+            if not isinstance(waiter, _AdmissionWaiter):
+                return waiter
+            waiter.event = threading.Event()
+        if not waiter.event.wait(timeout):
+            with self._lock:
+                if not self._give_up(waiter):
+                    self._reject('timeout')
+        return waiter.admitted_at
+    
+    async def acquire_async(self, nbytes=0, timeout=DEFAULT_WAIT):
+        """Coroutine version of acquire(); waits on the event loop, not a thread."""
+        if timeout is DEFAULT_WAIT:
+            timeout = self.max_wait
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            waiter = self._enqueue(nbytes, timeout)
+            if not isinstance(waiter, _AdmissionWaiter):
+                return waiter
+            waiter.loop = loop
+            waiter.future = loop.create_future()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                if not self._give_up(waiter):
+                    self._reject('timeout')
+        except asyncio.CancelledError:
+            with self._lock:
+                admitted = self._give_up(waiter)
+            if admitted:
+                self.release(nbytes, waiter.admitted_at)
+            raise
+        return waiter.admitted_at
+    
+    def release(self, nbytes, admitted_at):
+        """Give back a slot taken by acquire()."""
+        with self._lock:
+            self.active -= 1
+            self.active_bytes -= nbytes
+            self.avg_hold = 0.9 * self.avg_hold + 0.1 * (time.monotonic() - admitted_at)
+            metrics.inc('sha256_admission_active', value=-1)
+            metrics.inc('sha256_admission_active_bytes', value=-nbytes)
+            self._wake()
+    
+    @contextmanager
+    def admit(self, nbytes=0, timeout=DEFAULT_WAIT):
+        """Context manager around acquire() and release()."""
+        admitted_at = self.acquire(nbytes, timeout)
+        try:
+            yield
+        finally:
+            self.release(nbytes, admitted_at)
+    
+    def status(self):
+        """Return current load, limits and rejection counts as a dict."""
+        with self._lock:
+            return {
+                'active': self.active,
+                'active_bytes': self.active_bytes,
+                'queue_depth': len(self._waiters),
+                'admitted': self.admitted,
+                'rejected': dict(self.rejected),
+                'max_concurrent': self.max_concurrent,
+                'max_bytes': self.max_bytes,
+                'max_queue': self.max_queue,
+                'max_wait': self.max_wait,
+                'processes': self.processes
+            }
+
+
+def _wake_future(future):
+    if not future.done():
+        future.set_result(None)
+
+
+metrics.describe('sha256_admission_active', 'gauge', 'Hashing work admitted and running')
+metrics.describe('sha256_admission_active_bytes', 'gauge', 'Bytes of admitted hashing work')
+metrics.describe('sha256_admission_queue_depth', 'gauge', 'Hashing work waiting for admission')
+metrics.describe('sha256_admission_rejected_total', 'counter', 'Hashing requests rejected with 503, by reason')
+metrics.describe('sha256_admission_wait_seconds', 'histogram', 'Time spent waiting for admission',
+                 LATENCY_BUCKETS)
+
+admission = AdmissionController(
+    max_concurrent=app.config['ADMISSION_MAX_CONCURRENT'],
+    max_bytes=app.config['ADMISSION_MAX_BYTES'],
+    max_queue=app.config['ADMISSION_QUEUE_SIZE'],
+    max_wait=app.config['ADMISSION_QUEUE_TIMEOUT'],
+    processes=app.config['ADMISSION_PROCESSES'])
+
+# View functions whose requests hash data and so go through admission.
+# Streamed ones are admitted before their body is read; the rest receive
+# their body first (ADMISSION_HELD_ENDPOINTS). Either way the request
+# holds one slot and its declared bytes until it is done.
+ADMISSION_ENDPOINTS = {
+    'upload_file', 'verify_file', 'api_verify_hash', 'api_calculate_hash',
+    'api_calculate_hash_batch', 'api_upload_chunk', 'api_verify_manifest', 'api_submit_job',
+    'api_merkle_hash', 'api_merkle_verify', 'api_complete_upload',
+    'api_range_hash', 'api_record_range_hashes', 'api_sampled_verify',
+    'api_block_signature', 'api_apply_delta'
+}
+ADMISSION_HELD_ENDPOINTS = {
+    'api_merkle_hash', 'api_merkle_verify', 'api_complete_upload',
+    'api_range_hash', 'api_record_range_hashes', 'api_sampled_verify',
+    'api_block_signature', 'api_apply_delta'
+}
+
+
+def overloaded_response(exc, flag='success'):
+    """The 503 response for a rejected request."""
+    response = jsonify({flag: False, 'error': str(exc), 'retry_after': exc.retry_after})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(exc.retry_after)
+    return response
+
+
+def admitted_update(update):
+    """
+    Wrap a hash update function so every block is admitted first.
+    
+    Used for background jobs, which have no request to reject: blocks
+    wait for a slot for as long as it takes instead of failing halfway.
+    """
+    def update_admitted(block):
+        with admission.admit(len(block), timeout=None):
+            update(block)
+    return update_admitted
+
+
+# Request hooks (registered in routes.py)
+
+def declared_bytes(content_length):
+    """Bytes a request counts against the byte budget."""
+    # A body without a Content-Length is counted at the most it may send
+    if content_length is None:
+        return app.config['MAX_CONTENT_LENGTH'] or 0
+    return content_length
+
+
+def _admission_start_request():
+    if request.endpoint not in ADMISSION_ENDPOINTS:
+        return None
+    flag = 'verified' if request.endpoint == 'verify_file' else 'success'
+    nbytes = declared_bytes(request.content_length)
+    try:
+        if request.endpoint in ADMISSION_HELD_ENDPOINTS:
+            # Rejected before the body is read, so it is never received
+            admission.check()
+            # Receive first: the slot is held only while the view works
+            request.get_data(cache=True, parse_form_data=True)
+        # Waits at most max_wait; streamed uploads are rejected unread
+        g.admission = (nbytes, admission.acquire(nbytes))
+    except Overloaded as e:
+        return overloaded_response(e, flag)
+    return None
+
+
+def _admission_teardown_request(exc):
+    if 'admission' in g:
+        admission.release(*g.pop('admission'))
@@ -0,0 +1,520 @@
+"""
+ASGI serving mode.
+
+The same hashing endpoints as an asyncio application. Request bodies
+are received asynchronously and parsed incrementally, and only the
+hashing (and disk writes) run on the hash thread pool, so a slow client
+costs a coroutine instead of a worker thread. Every other route is
+passed through to the Flask app on a thread.
+
+Run with any ASGI server, e.g.:
+    uvicorn SHA256:asgi_app --workers 4
+or: python SHA256.py serve-async
+"""
+
+from werkzeug.datastructures import Headers
+from werkzeug.exceptions import ClientDisconnected, UnsupportedMediaType
+from werkzeug.http import parse_options_header
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+import asyncio
+import io
+import json
+import os
+import queue
+import sys
+import tempfile
+import time
+from datetime import datetime
+from urllib.parse import parse_qs
+
+from .config import CORS_ORIGINS, app
+from .metrics import metrics, record_request
+from .backends import select_hash_backends
+from .hashing import get_hash_executor, parse_algorithms
+from .compression import (CorruptEncodingError, DecodedTooLargeError, DecompressingWriter,
+                          check_content_encoding)
+from .admission import Overloaded, admission, declared_bytes
+from .ingest import HashingStream
+from .store import content_store, hash_catalog
+from .scrubber import scrubber
+from .ranges import blob_stored
+# Registers the Flask routes that requests outside ASGI_ROUTES fall back to
+from . import routes  # noqa: F401
+
+# Data is handed to the thread pool in batches of at least this size
+ASGI_HASH_BATCH = 256 * 1024
+
+
+class ASGIRequestError(Exception):
+    """Raised while reading an ASGI request; carries the HTTP status."""
+    
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+async def _asgi_read_form(scope, receive, ingest_folder=None, algorithms=('sha256',)):
+    """
+    Receive and parse a multipart body, hashing file parts as they arrive.
+    
+    Args:
+        scope (dict): ASGI connection scope
+        receive (callable): ASGI receive channel
+        ingest_folder (str): Folder for file data, or None to only hash it
+        algorithms (list): Digests to compute for every file part
+    
+    Returns:
+        tuple: (dict of form fields, dict of field name -> (filename, HashingStream))
+    """
+    headers = Headers([(k.decode('latin-1'), v.decode('latin-1')) for k, v in scope['headers']])
+    mimetype, options = parse_options_header(headers.get('Content-Type', ''))
+    if mimetype != 'multipart/form-data' or 'boundary' not in options:
+        raise ASGIRequestError('Expected multipart/form-data')
+    
+    loop = asyncio.get_running_loop()
+    executor = get_hash_executor()
+    decoder = MultipartDecoder(options['boundary'].encode('latin-1'),
+                               max_form_memory_size=500 * 1024)
+    fields, files = {}, {}
+    current = None          # file part stream (or its decoder), or list (form field)
+    pending = bytearray()   # file data not yet handed to the pool
+    received = 0
+    limit = app.config['MAX_CONTENT_LENGTH']
+    
+    async def flush(last=False):
+        if current is None or isinstance(current, list):
+            return
+        data = bytes(pending)
+        pending.clear()
+        try:
+            if data:
+                await loop.run_in_executor(executor, current.write, data)
+            if last and isinstance(current, DecompressingWriter):
+                await loop.run_in_executor(executor, current.finish)
+        except (CorruptEncodingError, DecodedTooLargeError) as e:
+            raise ASGIRequestError(e.description, e.code)
+    
+    try:
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                raise ASGIRequestError('Client disconnected')
+            chunk = message.get('body', b'')
+            more_body = message.get('more_body', False)
+            received += len(chunk)
+            if limit is not None and received > limit:
+                raise ASGIRequestError('Request body too large', 413)
+            decoder.receive_data(chunk)
+            if not more_body:
+                decoder.receive_data(None)
+            
+            event = decoder.next_event()
+            while not isinstance(event, (NeedData, Epilogue)):
+                if isinstance(event, File):
+                    sink_path = None
+                    if ingest_folder:
+                        fd, sink_path = tempfile.mkstemp(dir=ingest_folder, prefix='.ingest-')
+                        os.close(fd)
+                    current = HashingStream(sink_path, algorithms)
+                    if event.name in files:
+                        await loop.run_in_executor(None, current.close)
+                        current = None
+                    else:
+                        files[event.name] = (event.filename, current)
+                        try:
+                            encoding = check_content_encoding(event.headers.get('content-encoding'))
+                        except UnsupportedMediaType as e:
+                            raise ASGIRequestError(e.description, 415)
+                        if encoding:
+                            current = DecompressingWriter(
+                                current, encoding, app.config['MAX_DECOMPRESSED_LENGTH'])
+                elif isinstance(event, Field):
+                    current = []
+                    fields.setdefault(event.name, current)
+                elif isinstance(event, Data):
+                    if isinstance(current, list):
+                        current.append(event.data)
+                    elif current is not None:
+                        pending += event.data
+                        if len(pending) >= ASGI_HASH_BATCH or not event.more_data:
+                            await flush(last=not event.more_data)
+                event = decoder.next_event()
+    except BaseException:
+        await _asgi_close(files)
+        raise
+    
+    for name, parts in fields.items():
+        fields[name] = b''.join(parts).decode('utf-8', 'replace')
+    return fields, files
+
+
+def _close_streams(streams):
+    for stream in streams:
+        stream.close()
+
+
+async def _asgi_close(files):
+    """Close the streams of a parsed form on a thread; closing removes their files."""
+    streams = [stream for _, stream in files.values()]
+    if streams:
+        await asyncio.get_running_loop().run_in_executor(None, _close_streams, streams)
+
+
+async def _asgi_upload(scope, receive):
+    """Async version of upload_file()."""
+    algorithms = _asgi_algorithms(scope)
+    content_store.setup()
+    fields, files = await _asgi_read_form(scope, receive, app.config['UPLOAD_FOLDER'], algorithms)
+    try:
+        if 'file' not in files:
+            return 400, {'success': False, 'error': 'No file uploaded'}
+        filename, stream = files['file']
+        if filename == '':
+            return 400, {'success': False, 'error': 'No file selected'}
+        
+        file_hash = stream.hexdigest()
+        loop = asyncio.get_running_loop()
+        is_new = await loop.run_in_executor(get_hash_executor(), content_store.add_stream, stream)
+        await loop.run_in_executor(None, content_store.set_ref, filename, file_hash, stream.size)
+        await loop.run_in_executor(None, hash_catalog.record, file_hash, stream.size, filename)
+        blob_stored(file_hash, is_new)
+        result = {
+            'success': True,
+            'filename': filename,
+            'hash': file_hash,
+            'size': stream.size,
+            'duplicate': not is_new,
+            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+        if len(algorithms) > 1:
+            result['digests'] = stream.hexdigests()
+        return 200, result
+    finally:
+        await _asgi_close(files)
+
+
+async def _asgi_verify(scope, receive):
+    """Async version of verify_file(); nothing is written to disk."""
+    algorithms = _asgi_algorithms(scope)
+    fields, files = await _asgi_read_form(scope, receive, None, algorithms)
+    try:
+        if 'file' not in files or 'expected_hash' not in fields:
+            return 400, {'verified': False, 'error': 'Missing file or hash'}
+        filename, stream = files['file']
+        if filename == '':
+            return 400, {'verified': False, 'error': 'No file selected'}
+        expected_hash = fields['expected_hash'].strip().lower()
+        calculated_hash = stream.hexdigest()
+        await asyncio.get_running_loop().run_in_executor(
+            None, hash_catalog.record, calculated_hash, stream.size, filename)
+        result = {
+            'verified': calculated_hash == expected_hash,
+            'filename': filename,
+            'calculated_hash': calculated_hash,
+            'expected_hash': expected_hash
+        }
+        if len(algorithms) > 1:
+            result['digests'] = stream.hexdigests()
+        return 200, result
+    finally:
+        await _asgi_close(files)
+
+
+async def _asgi_api_verify_hash(scope, receive):
+    """Async version of api_verify_hash()."""
+    algorithms = _asgi_algorithms(scope)
+    fields, files = await _asgi_read_form(scope, receive, None, algorithms)
+    try:
+        if 'file' not in files or 'client_hash' not in fields:
+            return 400, {'success': False, 'error': 'Missing file or client_hash'}
+        filename, stream = files['file']
+        if filename == '':
+            return 400, {'success': False, 'error': 'No file selected'}
+        client_hash = fields['client_hash'].strip().lower()
+        server_hash = stream.hexdigest()
+        await asyncio.get_running_loop().run_in_executor(
+            None, hash_catalog.record, server_hash, stream.size, filename)
+        hashes_match = client_hash == server_hash
+        result = {
+            'success': True,
+            'verified': hashes_match,
+            'client_hash': client_hash,
+            'server_hash': server_hash,
+            'filename': filename,
+            'timestamp': datetime.now().isoformat(),
+            'message': 'Hashes match! File integrity verified.' if hashes_match else 'Hash mismatch! Possible corruption.'
+        }
+        if len(algorithms) > 1:
+            result['digests'] = stream.hexdigests()
+        return 200, result
+    finally:
+        await _asgi_close(files)
+
+
+async def _asgi_api_calculate_hash(scope, receive):
+    """Async version of api_calculate_hash()."""
+    algorithms = _asgi_algorithms(scope)
+    fields, files = await _asgi_read_form(scope, receive, None, algorithms)
+    try:
+        if 'file' not in files:
+            return 400, {'success': False, 'error': 'No file uploaded'}
+        filename, stream = files['file']
+        if filename == '':
+            return 400, {'success': False, 'error': 'No file selected'}
+        await asyncio.get_running_loop().run_in_executor(
+            None, hash_catalog.record, stream.hexdigest(), stream.size, filename)
+        result = {
+            'success': True,
+            'hash': stream.hexdigest(),
+            'filename': filename,
+            'size': stream.size,
+            'timestamp': datetime.now().isoformat()
+        }
+        if len(algorithms) > 1:
+            result['digests'] = stream.hexdigests()
+        return 200, result
+    finally:
+        await _asgi_close(files)
+
+
+def _asgi_algorithms(scope):
+    """The ?algorithms= query parameter of an ASGI request, parsed."""
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    try:
+        return parse_algorithms(query.get('algorithms', [''])[0])
+    except ValueError as e:
+        raise ASGIRequestError(str(e))
+
+
+ASGI_ROUTES = {
+    ('POST', '/upload'): (_asgi_upload, 'success'),
+    ('POST', '/verify'): (_asgi_verify, 'verified'),
+    ('POST', '/api/verify-hash'): (_asgi_api_verify_hash, 'success'),
+    ('POST', '/api/calculate-hash'): (_asgi_api_calculate_hash, 'success'),
+}
+
+
+def _asgi_cors_headers(scope):
+    """CORS headers for /api/* responses, matching the Flask-CORS setup."""
+    if not scope['path'].startswith('/api/'):
+        return []
+    for key, value in scope['headers']:
+        if key == b'origin' and value.decode('latin-1') in CORS_ORIGINS:
+            return [(b'access-control-allow-origin', value), (b'vary', b'Origin')]
+    return []
+
+
+async def _asgi_send_json(send, status, payload, extra_headers=()):
+    body = json.dumps(payload, sort_keys=True).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'),
+                    (b'content-length', str(len(body)).encode())] + list(extra_headers)
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+class _ASGIInput(io.RawIOBase):
+    """
+    wsgi.input for a request passed through to the Flask app.
+    
+    The body is not buffered: pump() runs on the event loop and hands the
+    received chunks to the reading thread one at a time, receiving the
+    next one only after the previous one was taken. Once the body is
+    complete it keeps listening for the client to disconnect, so a
+    streamed response can stop early.
+    """
+    
+    _EOF = object()
+    
+    def __init__(self, loop):
+        self.loop = loop
+        self.chunks = queue.Queue()
+        self.taken = asyncio.Event()
+        self.disconnected = False
+        self.buffer = b''
+        self.eof = False
+    
+    async def pump(self, receive):
+        try:
+            more_body = True
+            while more_body:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    return
+                more_body = message.get('more_body', False)
+                self.taken.clear()
+                self.chunks.put(message.get('body', b''))
+                if more_body:
+                    await self.taken.wait()
+            self.chunks.put(self._EOF)
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+        finally:
+            self.disconnected = True
+            # Wake a reader still waiting for data
+            self.chunks.put(None)
+    
+    def readable(self):
+        return True
+    
+    def readinto(self, buffer):
+        while not self.buffer and not self.eof:
+            chunk = self.chunks.get()
+            self.loop.call_soon_threadsafe(self.taken.set)
+            if chunk is None:
+                raise ClientDisconnected()
+            if chunk is self._EOF:
+                self.eof = True
+            else:
+                self.buffer = chunk
+        size = min(len(buffer), len(self.buffer))
+        buffer[:size] = self.buffer[:size]
+        self.buffer = self.buffer[size:]
+        return size
+
+
+async def _asgi_wsgi_fallback(scope, receive, send):
+    """
+    Run a request through the Flask WSGI app on a thread.
+    
+    Both directions stream: the app reads the body as it arrives (see
+    _ASGIInput), and every chunk of the response is sent as soon as the
+    app produces it, so server-sent events and streamed results work.
+    """
+    loop = asyncio.get_running_loop()
+    body = _ASGIInput(loop)
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': str(server[0]),
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': str(client[0]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for key, value in scope['headers']:
+        name = key.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = 'HTTP_' + name
+        environ[name] = f"{environ[name]},{value}" if name in environ else value
+    limit = app.config['MAX_CONTENT_LENGTH']
+    if 'CONTENT_LENGTH' not in environ:
+        # Chunked body: read to the end, MAX_CONTENT_LENGTH still applies
+        environ['wsgi.input_terminated'] = True
+    elif limit is not None and int(environ['CONTENT_LENGTH'] or 0) > limit:
+        await _asgi_send_json(send, 413, {'success': False, 'error': 'Request body too large'})
+        return
+    
+    response = {}
+    
+    def start_response(status, headers, exc_info=None):
+        response['status'] = int(status.split(' ', 1)[0])
+        response['headers'] = [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]
+    
+    def send_from_thread(message):
+        asyncio.run_coroutine_threadsafe(send(message), loop).result()
+    
+    def call_app():
+        result = app(environ, start_response)
+        try:
+            started = False
+            for chunk in result:
+                if body.disconnected:
+                    return
+                if not started:
+                    send_from_thread({'type': 'http.response.start', 'status': response['status'],
+                                      'headers': response['headers']})
+                    started = True
+                if chunk:
+                    send_from_thread({'type': 'http.response.body', 'body': chunk,
+                                      'more_body': True})
+            if not started:
+                send_from_thread({'type': 'http.response.start', 'status': response['status'],
+                                  'headers': response['headers']})
+            send_from_thread({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+    
+    pump = loop.create_task(body.pump(receive))
+    try:
+        await loop.run_in_executor(None, call_app)
+    finally:
+        pump.cancel()
+
+
+async def asgi_app(scope, receive, send):
+    """
+    ASGI entry point serving the hashing API asynchronously.
+    
+    /upload, /verify, /api/verify-hash and /api/calculate-hash are
+    handled natively; everything else goes to the Flask app.
+    """
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                if app.config['METRICS_DIR'] and metrics.multiprocess_dir is None:
+                    metrics.enable_multiprocess(app.config['METRICS_DIR'])
+                await asyncio.get_running_loop().run_in_executor(None, select_hash_backends)
+                # Every worker offers; the one that gets the lock scrubs
+                scrubber.start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await asyncio.get_running_loop().run_in_executor(None, scrubber.stop)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    
+    if scope['type'] != 'http':
+        return
+    
+    route = ASGI_ROUTES.get((scope['method'], scope['path']))
+    # Whole-body Content-Encoding is decoded by the Flask request class
+    if route is None or dict(scope['headers']).get(b'content-encoding', b'identity') != b'identity':
+        await _asgi_wsgi_fallback(scope, receive, send)
+        return
+    
+    handler, flag = route
+    start = time.perf_counter()
+    content_length = dict(scope['headers']).get(b'content-length')
+    nbytes = declared_bytes(int(content_length) if content_length else None)
+    metrics.inc('sha256_http_requests_in_flight')
+    try:
+        try:
+            # Admitted before the body is read, as in the Flask hook; the
+            # wait happens on the event loop and costs no thread
+            admitted_at = await admission.acquire_async(nbytes)
+        except Overloaded as e:
+            status = 503
+            payload = {flag: False, 'error': str(e), 'retry_after': e.retry_after}
+            headers = _asgi_cors_headers(scope) + [(b'retry-after', str(e.retry_after).encode())]
+            await _asgi_send_json(send, status, payload, headers)
+        else:
+            try:
+                status, payload = await handler(scope, receive)
+            except ASGIRequestError as e:
+                status, payload = e.status, {flag: False, 'error': str(e)}
+            except Exception as e:
+                status, payload = 500, {flag: False, 'error': str(e)}
+            finally:
+                admission.release(nbytes, admitted_at)
+            await _asgi_send_json(send, status, payload, _asgi_cors_headers(scope))
+    finally:
+        metrics.inc('sha256_http_requests_in_flight', value=-1)
+    
+    record_request(scope['path'], scope['method'], status, time.perf_counter() - start,
+                   int(content_length) if content_length else None)
@@ -0,0 +1,303 @@
+"""
+Hash backend registry and new_hash().
+
+Every content digest in the package is made through new_hash(), which asks the
+backend registry for the implementation selected for that algorithm.
+hashlib (OpenSSL) is always available; other implementations are used
+when installed, if they give the same results and measure faster in a
+short self-benchmark when the server starts. Importing the module does
+no benchmarking: until a server (or the hash-backends command) selects,
+the first hash made picks the first conforming backend. SHA256_HASH_BACKEND
+overrides the choice, e.g. "hashlib" or "sha256=pycryptodome,md5=hashlib".
+"""
+
+import hashlib
+import importlib
+import os
+import threading
+import time
+
+try:
+    import Crypto.Hash as pycryptodome_hash  # Optional hash backend: pip install pycryptodome
+except ImportError:
+    pycryptodome_hash = None
+
+try:
+    from cryptography.hazmat.primitives import hashes as crypto_hashes  # Optional hash backend
+except ImportError:
+    crypto_hashes = None
+
+from .config import app
+
+# Algorithms that can be requested next to SHA-256. MD5 is here for
+# S3-style ETags only, not for integrity.
+DIGEST_ALGORITHMS = ('md5', 'sha1', 'sha224', 'sha256', 'sha384', 'sha512',
+                     'sha3_224', 'sha3_256', 'sha3_384', 'sha3_512', 'blake2b', 'blake2s')
+
+# Bytes hashed per round of the startup self-benchmark
+HASH_BENCHMARK_SIZE = 1024 * 1024
+HASH_BENCHMARK_ROUNDS = 3
+# A backend must beat the preferred one by this factor to replace it, so
+# near-ties don't flip with benchmark noise from one start to the next
+HASH_BENCHMARK_MARGIN = 1.10
+
+
+class HashBackendRegistry:
+    """
+    Registry of hash implementations and the one selected per algorithm.
+    
+    A backend is a factory that takes an algorithm name and returns an
+    object with hashlib's interface: update(), digest(), hexdigest() and
+    copy(). Updates after digest() must keep working, as with hashlib.
+    
+    How it works:
+        1. Backends are registered in order of preference (hashlib first)
+        2. select() checks each backend against hashlib on test data and
+           drops the ones that disagree or lack part of the interface
+        3. With more than one conforming backend for an algorithm, each is
+           timed on HASH_BENCHMARK_SIZE bytes; the first registered one
+           within HASH_BENCHMARK_MARGIN of the fastest wins
+        4. new() creates hash objects from the selected backend; if
+           select() has not run yet, the first call selects without
+           benchmarking, honouring the overrides given here
+    
+    Args:
+        overrides (dict): Overrides for the selection made on first use
+            (see select())
+    """
+    
+    def __init__(self, overrides=None):
+        self.backends = {}     # name -> (factory, algorithms)
+        self.selected = {}     # algorithm -> backend name
+        self.benchmarks = {}   # algorithm -> {backend name: MB/s}
+        self.overrides = dict(overrides or {})
+        self._factories = {}
+        self._select_lock = threading.Lock()
+    
+    def register(self, name, factory, algorithms):
+        """
+        Add a backend.
+        
+        Args:
+            name (str): Backend name, as used in SHA256_HASH_BACKEND
+            factory (callable): factory(algorithm) -> new hash object
+            algorithms (iterable): Algorithm names it implements
+        """
+        self.backends[name] = (factory, tuple(algorithms))
+    
+    def conforms(self, name, algorithm):
+        """Return True if a backend gives hashlib's results for ``algorithm``."""
+        factory = self.backends[name][0]
+        data = bytes(range(256)) * 64
+        try:
+            reference = hashlib.new(algorithm, data)
+            hash_object = factory(algorithm)
+            hash_object.update(memoryview(data)[:1000])
+            copied = hash_object.copy()
+            hash_object.update(data[1000:])
+            if hash_object.hexdigest() != reference.hexdigest():
+                return False
+            if hash_object.digest() != reference.digest():
+                return False
+            copied.update(data[1000:])
+            hash_object.update(data)
+            reference.update(data)
+            return (copied.hexdigest() == hashlib.new(algorithm, data).hexdigest()
+                    and hash_object.hexdigest() == reference.hexdigest()
+                    and factory(algorithm).hexdigest() == hashlib.new(algorithm).hexdigest())
+        except Exception:
+            return False
+    
+    def benchmark(self, name, algorithm, data):
+        """Best throughput of one backend on ``data``, in MB/s."""
+        factory = self.backends[name][0]
+        best = float('inf')
+        for _ in range(HASH_BENCHMARK_ROUNDS):
+            start = time.perf_counter()
+            hash_object = factory(algorithm)
+            hash_object.update(data)
+            hash_object.digest()
+            best = min(best, time.perf_counter() - start)
+        return len(data) / max(best, 1e-9) / 1024 ** 2
+    
+    def select(self, overrides=None, run_benchmark=True):
+        """
+        Choose a backend for every algorithm.
+        
+        Args:
+            overrides (dict): {algorithm: backend name}; the key '*' applies
+                to every algorithm the backend implements correctly
+            run_benchmark (bool): Time competing backends; if False the first
+                conforming one in registration order is used
+        
+        Raises:
+            ValueError: If an override names an unknown backend, or one that
+                does not implement the algorithm correctly
+        """
+        overrides = dict(overrides or {})
+        for backend in overrides.values():
+            if backend not in self.backends:
+                raise ValueError(f"Unknown hash backend '{backend}' "
+                                 f"(available: {', '.join(self.backends)})")
+        
+        # Built aside and swapped in at the end: threads hashing meanwhile
+        # keep using the previous selection
+        data = os.urandom(HASH_BENCHMARK_SIZE) if run_benchmark else None
+        selected, benchmarks = {}, {}
+        for algorithm in DIGEST_ALGORITHMS:
+            forced = overrides.get(algorithm)
+            default = overrides.get('*')
+            if forced is None and default is not None and algorithm in self.backends[default][1] \
+                    and self.conforms(default, algorithm):
+                forced = default
+            if forced is not None:
+                if algorithm not in self.backends[forced][1] or not self.conforms(forced, algorithm):
+                    raise ValueError(f"Hash backend '{forced}' cannot be used for {algorithm}")
+                selected[algorithm] = forced
+                continue
+            
+            candidates = [name for name, (_, algorithms) in self.backends.items()
+                          if algorithm in algorithms and self.conforms(name, algorithm)]
+            if len(candidates) > 1 and run_benchmark:
+                rates = {name: self.benchmark(name, algorithm, data) for name in candidates}
+                benchmarks[algorithm] = rates
+                fastest = max(rates.values())
+                candidates = [name for name in candidates
+                              if rates[name] * HASH_BENCHMARK_MARGIN >= fastest]
+            if candidates:
+                selected[algorithm] = candidates[0]
+        
+        self._factories = {algorithm: self.backends[name][0]
+                           for algorithm, name in selected.items()}
+        self.selected, self.benchmarks, self.overrides = selected, benchmarks, overrides
+    
+    def ensure_selected(self):
+        """Select without benchmarking unless a selection was already made."""
+        with self._select_lock:
+            if not self._factories:
+                self.select(self.overrides, run_benchmark=False)
+    
+    def new(self, algorithm):
+        factory = self._factories.get(algorithm)
+        if factory is None:
+            self.ensure_selected()
+            factory = self._factories[algorithm]
+        return factory(algorithm)
+    
+    def status(self):
+        """Return the registered backends, selection and benchmark results."""
+        return {
+            'backends': {name: list(algorithms) for name, (_, algorithms) in self.backends.items()},
+            'selected': dict(self.selected),
+            'overrides': dict(self.overrides),
+            'benchmarks_mb_per_s': {algorithm: {name: round(rate, 1) for name, rate in rates.items()}
+                                    for algorithm, rates in self.benchmarks.items()}
+        }
+
+
+def parse_hash_backend_overrides(value):
+    """
+    Parse SHA256_HASH_BACKEND.
+    
+    "pycryptodome" selects that backend for every algorithm it
+    implements; "sha256=pycryptodome,md5=hashlib" picks per algorithm.
+    
+    Returns:
+        dict: {algorithm or '*': backend name}
+    """
+    overrides = {}
+    for item in (value or '').split(','):
+        algorithm, _, backend = item.strip().rpartition('=')
+        if backend:
+            overrides[algorithm.strip().lower().replace('-', '_') or '*'] = backend.strip()
+    return overrides
+
+
+# hashlib's named constructors skip the name lookup hashlib.new() does
+_HASHLIB_CONSTRUCTORS = {algorithm: getattr(hashlib, algorithm) for algorithm in DIGEST_ALGORITHMS}
+
+
+def _hashlib_new(algorithm):
+    return _HASHLIB_CONSTRUCTORS[algorithm]()
+
+
+# pycryptodome module names; its BLAKE2 objects refuse updates after a
+# digest, so conformance checking leaves those to hashlib
+_PYCRYPTODOME_MODULES = {
+    'md5': 'MD5', 'sha1': 'SHA1', 'sha224': 'SHA224', 'sha256': 'SHA256', 'sha384': 'SHA384',
+    'sha512': 'SHA512', 'sha3_224': 'SHA3_224', 'sha3_256': 'SHA3_256', 'sha3_384': 'SHA3_384',
+    'sha3_512': 'SHA3_512'
+}
+
+
+def _pycryptodome_new(algorithm):
+    return importlib.import_module(f'Crypto.Hash.{_PYCRYPTODOME_MODULES[algorithm]}').new()
+
+
+class _CryptographyHash:
+    """hashlib-style wrapper around a cryptography.hazmat Hash context."""
+    
+    def __init__(self, algorithm, context=None):
+        self.name = algorithm
+        self._context = context or crypto_hashes.Hash(
+            getattr(crypto_hashes, _CRYPTOGRAPHY_ALGORITHMS[algorithm])())
+    
+    def update(self, data):
+        self._context.update(data)
+    
+    def copy(self):
+        return _CryptographyHash(self.name, self._context.copy())
+    
+    def digest(self):
+        return self._context.copy().finalize()
+    
+    def hexdigest(self):
+        return self.digest().hex()
+
+
+_CRYPTOGRAPHY_ALGORITHMS = {
+    'md5': 'MD5', 'sha1': 'SHA1', 'sha224': 'SHA224', 'sha256': 'SHA256', 'sha384': 'SHA384',
+    'sha512': 'SHA512', 'sha3_224': 'SHA3_224', 'sha3_256': 'SHA3_256', 'sha3_384': 'SHA3_384',
+    'sha3_512': 'SHA3_512'
+}
+
+
+hash_backends = HashBackendRegistry(parse_hash_backend_overrides(app.config['HASH_BACKEND']))
+hash_backends.register('hashlib', _hashlib_new, DIGEST_ALGORITHMS)
+if pycryptodome_hash is not None:
+    hash_backends.register('pycryptodome', _pycryptodome_new, _PYCRYPTODOME_MODULES)
+if crypto_hashes is not None:
+    hash_backends.register('cryptography', _CryptographyHash, _CRYPTOGRAPHY_ALGORITHMS)
+
+
+def select_hash_backends():
+    """
+    Select hash backends from the configuration, benchmarking them if
+    HASH_BACKEND_BENCHMARK is set.
+    
+    Called once when a server starts (the pre-fork master selects before
+    forking, so workers inherit the result) and by the hash-backends
+    command. Raises ValueError for a bad SHA256_HASH_BACKEND.
+    """
+    hash_backends.select(parse_hash_backend_overrides(app.config['HASH_BACKEND']),
+                         app.config['HASH_BACKEND_BENCHMARK'])
+
+
+def new_hash(algorithm='sha256', data=None):
+    """
+    Create a hash object with the selected backend for ``algorithm``.
+    
+    Use this instead of hashlib.sha256() / hashlib.new() so every route
+    picks up a faster implementation when the host has one.
+    
+    Args:
+        algorithm (str): Algorithm name (see DIGEST_ALGORITHMS)
+        data (bytes): Optional initial data
+    
+    Returns:
+        Hash object with update(), digest(), hexdigest() and copy()
+    """
+    hash_object = hash_backends.new(algorithm)
+    if data is not None:
+        hash_object.update(data)
+    return hash_object
@@ -0,0 +1,274 @@
+"""
+Command-line entry point: servers, manifests and maintenance commands.
+"""
+
+import argparse
+import os
+import signal
+import sys
+import tempfile
+import threading
+import time
+
+from .config import app
+from .metrics import metrics
+from .backends import hash_backends, select_hash_backends
+from .hashing import enable_digest_cache
+from .admission import admission
+from .store import ContentStore, content_store
+from .scrubber import scrubber
+from .jobs import job_queue
+from .manifest import verify_manifest, write_manifest
+from .server import PreforkServer
+# Registers the Flask routes the servers serve
+from . import routes  # noqa: F401
+
+
+def run_server(host='0.0.0.0', port=5000, debug=None, workers=None, threads=None,
+               max_requests=None, max_requests_jitter=None):
+    """
+    Run the Flask application.
+    
+    The app will be available at: http://localhost:5000
+    
+    By default this is the multi-process PreforkServer; arguments left as
+    None come from app.config (SERVER_* keys). With debug=True the
+    single-process Flask debug server with the reloader is used instead.
+    
+    Features:
+    - Upload files and get SHA-256 hash
+    - Verify file integrity by comparing hashes
+    - See live demonstrations of how SHA-256 works
+    """
+    config = app.config
+    if debug is None:
+        debug = config['DEBUG_SERVER']
+    
+    print("=" * 60)
+    print("SHA-256 File Integrity Checker - Flask Demo")
+    print("=" * 60)
+    print("\nStarting server...")
+    print(f"Visit: http://localhost:{port}")
+    print("\nThis demonstrates the same SHA-256 concept used in your")
+    print("JavaScript cloud storage system, but on the server side!")
+    print("=" * 60)
+    print("\nPress CTRL+C to stop the server\n")
+    
+    if PreforkServer.LISTEN_FD_ENV not in os.environ:
+        scrubber.set_enabled(config['SCRUB_ENABLED'])
+    select_hash_backends()
+    
+    if debug:
+        scrubber.start()
+        app.run(debug=True, host=host, port=port)
+        return 0
+    
+    # Workers share their metrics through a directory. It survives a
+    # reload (the re-executed master finds it in the environment), so
+    # counters keep counting; a fresh start begins from zero.
+    if PreforkServer.LISTEN_FD_ENV not in os.environ:
+        if config['METRICS_DIR']:
+            _clear_metrics_dir(config['METRICS_DIR'])
+        else:
+            config['METRICS_DIR'] = tempfile.mkdtemp(prefix='sha256-metrics-')
+    os.environ['SHA256_METRICS_DIR'] = config['METRICS_DIR']
+    
+    server = PreforkServer(
+        app, host, port,
+        workers=workers or config['SERVER_WORKERS'],
+        threads=threads or config['SERVER_THREADS'],
+        max_requests=config['SERVER_MAX_REQUESTS'] if max_requests is None else max_requests,
+        max_requests_jitter=(config['SERVER_MAX_REQUESTS_JITTER'] if max_requests_jitter is None
+                             else max_requests_jitter),
+        graceful_timeout=config['SERVER_GRACEFUL_TIMEOUT'],
+        post_fork=_worker_post_fork,
+        worker_exit=lambda server: metrics.flush(),
+        background=[scrubber.serve])
+    return server.run()
+
+
+def _clear_metrics_dir(directory):
+    """Remove the metrics files of an earlier server run."""
+    if os.path.isdir(directory):
+        for name in os.listdir(directory):
+            if name.endswith('.json'):
+                os.remove(os.path.join(directory, name))
+
+
+def _worker_post_fork(server):
+    # Admission limits are server-wide; each worker enforces its share.
+    # Workers started after SIGTTIN/SIGTTOU use the new count, older ones
+    # keep theirs until they are recycled.
+    admission.set_processes(server.num_workers)
+    metrics.enable_multiprocess(app.config['METRICS_DIR'])
+
+
+def main(argv=None):
+    """
+    Command-line entry point.
+    
+    With no arguments the web server is started. Subcommands:
+    
+        python SHA256.py serve [--workers N] [--threads N] [--max-requests N] [--debug]
+            Run the multi-process web server (default command)
+    
+        python SHA256.py manifest DIR [-o FILE] [-j N] [--threads]
+            Hash every file under DIR and write a manifest
+        
+        python SHA256.py verify-manifest DIR MANIFEST [-j N] [--threads]
+            Check DIR against a manifest; exits 1 if anything differs
+        
+        python SHA256.py serve-async [--host H] [--port P] [--workers N]
+            Serve the ASGI app (asgi_app) with uvicorn
+        
+        python SHA256.py jobs-worker [-j N]
+            Process queued hash/verify jobs without serving HTTP
+        
+        python SHA256.py gc [--full] [--grace SECONDS]
+            Delete stored blobs that no filename points at any more
+        
+        python SHA256.py scrub
+            Run the integrity scrubber without serving HTTP, e.g. next to
+            gunicorn (the built-in servers run it themselves)
+        
+        python SHA256.py hash-backends
+            Show the hash backend selected for each algorithm and why
+    
+    Returns:
+        int: Process exit code
+    """
+    parser = argparse.ArgumentParser(description='SHA-256 file integrity checker')
+    subparsers = parser.add_subparsers(dest='command')
+    
+    serve_parser = subparsers.add_parser('serve', help='Run the web server (default)')
+    serve_parser.add_argument('--host', default='0.0.0.0')
+    serve_parser.add_argument('--port', type=int, default=5000)
+    serve_parser.add_argument('-w', '--workers', type=int, default=None,
+                              help='Worker processes (default: CPU count)')
+    serve_parser.add_argument('--threads', type=int, default=None,
+                              help='Request threads per worker (default: 8)')
+    serve_parser.add_argument('--max-requests', type=int, default=None,
+                              help='Recycle a worker after this many requests (default: never)')
+    serve_parser.add_argument('--max-requests-jitter', type=int, default=None,
+                              help='Random extra requests before recycling, per worker')
+    serve_parser.add_argument('--debug', action='store_true', default=None,
+                              help='Single-process Flask debug server with the reloader')
+    
+    async_parser = subparsers.add_parser('serve-async', help='Run the ASGI server (needs uvicorn)')
+    async_parser.add_argument('--host', default='0.0.0.0')
+    async_parser.add_argument('--port', type=int, default=5000)
+    async_parser.add_argument('--workers', type=int, default=1, help='Number of server processes')
+    
+    jobs_parser = subparsers.add_parser('jobs-worker', help='Run hash/verify job workers only')
+    jobs_parser.add_argument('-j', '--workers', type=int, default=2, help='Worker threads (default: 2)')
+    
+    subparsers.add_parser('hash-backends', help='Show the selected hash implementations')
+    subparsers.add_parser('scrub', help='Run the integrity scrubber only')
+    
+    gc_parser = subparsers.add_parser('gc', help='Delete blobs no filename points at')
+    gc_parser.add_argument('--full', action='store_true',
+                           help='Check every blob, not only those orphaned by a re-upload')
+    gc_parser.add_argument('--grace', type=float, default=None,
+                           help=f'Keep blobs touched in the last SECONDS '
+                                f'(default: {ContentStore.GC_GRACE})')
+    
+    manifest_parser = subparsers.add_parser('manifest', help='Hash a directory tree into a manifest')
+    manifest_parser.add_argument('root', help='Directory to hash')
+    manifest_parser.add_argument('-o', '--output', default='-', help='Manifest file (default: stdout)')
+    
+    verify_parser = subparsers.add_parser('verify-manifest', help='Check a directory tree against a manifest')
+    verify_parser.add_argument('root', help='Directory the manifest paths are relative to')
+    verify_parser.add_argument('manifest', help='Manifest file written by the manifest command')
+    
+    for sub in (manifest_parser, verify_parser):
+        sub.add_argument('-j', '--workers', type=int, default=None,
+                         help='Number of parallel workers (default: CPU count)')
+        sub.add_argument('--threads', action='store_true',
+                         help='Use a thread pool instead of a process pool')
+        sub.add_argument('--digest-cache', metavar='DB',
+                         help='Reuse digests of unchanged files from this SQLite cache')
+    
+    args = parser.parse_args(argv)
+    
+    if getattr(args, 'digest_cache', None):
+        enable_digest_cache(args.digest_cache, app.config['DIGEST_CACHE_MAX_ENTRIES'])
+    
+    if args.command == 'manifest':
+        use_processes = not args.threads
+        if args.output == '-':
+            stats = write_manifest(args.root, sys.stdout, args.workers, use_processes)
+        else:
+            with open(args.output, 'w', encoding='utf-8', newline='\n') as out:
+                stats = write_manifest(args.root, out, args.workers, use_processes)
+        print(f"Hashed {stats['files']} files ({stats['bytes']} bytes), "
+              f"{stats['errors']} errors", file=sys.stderr)
+        return 1 if stats['errors'] else 0
+    
+    if args.command == 'verify-manifest':
+        with open(args.manifest, encoding='utf-8', newline='\n') as manifest:
+            stats = verify_manifest(args.root, manifest, args.workers, not args.threads)
+        print(f"{stats['OK']} ok, {stats['MISMATCH']} mismatched, {stats['MISSING']} missing, "
+              f"{stats['EXTRA']} extra, {stats['ERROR']} errors", file=sys.stderr)
+        return 1 if any(stats[status] for status in ('MISMATCH', 'MISSING', 'EXTRA', 'ERROR')) else 0
+    
+    if args.command == 'hash-backends':
+        select_hash_backends()
+        status = hash_backends.status()
+        print(f"Registered: {', '.join(status['backends'])}")
+        for algorithm, backend in status['selected'].items():
+            rates = status['benchmarks_mb_per_s'].get(algorithm, {})
+            timings = ', '.join(f"{name} {rate:.0f} MB/s" for name, rate in rates.items())
+            forced = ' (override)' if backend in (status['overrides'].get(algorithm),
+                                                  status['overrides'].get('*')) else ''
+            print(f"  {algorithm:<9} {backend}{forced}" + (f"  [{timings}]" if timings else ''))
+        return 0
+    
+    if args.command == 'jobs-worker':
+        job_queue.start(args.workers)
+        print(f"Processing jobs from {job_queue.db_path} with {args.workers} workers",
+              file=sys.stderr)
+        try:
+            while job_queue.running:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            job_queue.stop()
+        return 0
+    
+    if args.command == 'gc':
+        result = content_store.gc(args.grace, args.full)
+        print(f"Deleted {result['deleted']} blobs ({result['bytes']} bytes)", file=sys.stderr)
+        return 0
+    
+    if args.command == 'scrub':
+        scrubber.set_enabled(True)
+        print(f"Scrubbing {content_store.objects_dir}", file=sys.stderr)
+        stop_event = threading.Event()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, lambda signum, frame: stop_event.set())
+        scrubber.serve(stop_event)
+        return 0
+    
+    if args.command == 'serve-async':
+        try:
+            import uvicorn
+        except ImportError:
+            print("serve-async needs uvicorn: pip install uvicorn", file=sys.stderr)
+            return 1
+        # uvicorn's workers import the app afresh; they read their share
+        # of the admission limits and the shared metrics directory from
+        # the environment
+        os.environ['SHA256_ADMISSION_PROCESSES'] = str(args.workers)
+        scrubber.set_enabled(app.config['SCRUB_ENABLED'])
+        if args.workers > 1:
+            if app.config['METRICS_DIR']:
+                _clear_metrics_dir(app.config['METRICS_DIR'])
+            else:
+                app.config['METRICS_DIR'] = tempfile.mkdtemp(prefix='sha256-metrics-')
+            os.environ['SHA256_METRICS_DIR'] = app.config['METRICS_DIR']
+        uvicorn.run('SHA256:asgi_app', host=args.host, port=args.port, workers=args.workers)
+        return 0
+    
+    if args.command == 'serve':
+        return run_server(args.host, args.port, args.debug, args.workers, args.threads,
+                          args.max_requests, args.max_requests_jitter)
+    return run_server()
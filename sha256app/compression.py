@@ -0,0 +1,225 @@
+"""
+Compressed uploads.
+
+Bodies sent with Content-Encoding: gzip (or zstd, if the zstandard
+package is installed) are decoded while they are read, either for the
+whole request body or per file part of a multipart upload. Hashes are
+always taken over the decoded bytes, so they match a hash of the
+original file, and data is decoded in DECODE_CHUNK pieces so memory
+stays bounded however well the data compresses.
+"""
+
+from flask import request, jsonify
+from werkzeug.exceptions import BadRequest, RequestEntityTooLarge, UnsupportedMediaType
+from werkzeug.formparser import FormDataParser, MultiPartParser
+import gzip
+import io
+import zlib
+
+try:
+    import zstandard  # Optional: pip install zstandard
+except ImportError:
+    zstandard = None
+
+from .config import app
+
+DECODE_CHUNK = 256 * 1024
+
+DECODE_ERRORS = (OSError, EOFError, zlib.error) + ((zstandard.ZstdError,) if zstandard else ())
+
+
+def supported_encodings():
+    """Content-Encoding values that can be decoded."""
+    return ('gzip', 'x-gzip') + (('zstd',) if zstandard is not None else ())
+
+
+def check_content_encoding(value):
+    """
+    Normalise a Content-Encoding header value.
+    
+    Returns:
+        str: The encoding, or None for no encoding (absent or 'identity')
+    
+    Raises:
+        UnsupportedMediaType: If the encoding cannot be decoded
+    """
+    encoding = (value or '').strip().lower()
+    if encoding in ('', 'identity'):
+        return None
+    if encoding not in supported_encodings():
+        raise UnsupportedMediaType(
+            f"Unsupported Content-Encoding '{encoding}' (use {', '.join(supported_encodings())})")
+    return encoding
+
+
+class CorruptEncodingError(BadRequest):
+    """Raised when a compressed body or part cannot be decoded."""
+
+
+class DecodedTooLargeError(RequestEntityTooLarge):
+    """Raised when decoded data grows past MAX_DECOMPRESSED_LENGTH."""
+
+
+# Error handler (registered in routes.py)
+
+def _decode_error_response(e):
+    return jsonify({'success': False, 'error': e.description}), e.code
+
+
+class DecompressingReader(io.RawIOBase):
+    """
+    Readable stream that decodes a compressed request body.
+    
+    Args:
+        raw: Stream with the compressed bytes
+        encoding (str): 'gzip', 'x-gzip' or 'zstd'
+        limit (int): Maximum decoded size, or None for no limit
+    """
+    
+    def __init__(self, raw, encoding, limit=None):
+        if encoding == 'zstd':
+            self._reader = zstandard.ZstdDecompressor().stream_reader(
+                raw, read_size=DECODE_CHUNK, closefd=False)
+        else:
+            self._reader = gzip.GzipFile(fileobj=raw, mode='rb')
+        self.limit = limit
+        self.decoded = 0
+    
+    def readable(self):
+        return True
+    
+    def readinto(self, buffer):
+        try:
+            data = self._reader.read(min(len(buffer), DECODE_CHUNK))
+        except DECODE_ERRORS as e:
+            raise CorruptEncodingError(f"Corrupt compressed body: {e}")
+        self.decoded += len(data)
+        if self.limit is not None and self.decoded > self.limit:
+            raise DecodedTooLargeError(f"Decompressed body exceeds {self.limit} bytes")
+        buffer[:len(data)] = data
+        return len(data)
+
+
+class DecompressingWriter:
+    """
+    Decodes a compressed file part while it is written.
+    
+    Werkzeug's form parser writes each file part into the stream its
+    factory returns; wrapping that stream in one of these decodes the
+    part on the way in. Everything else (hexdigest(), size, read(),
+    close() ...) is forwarded to the wrapped stream, so the views use it
+    exactly as they would use the stream itself.
+    
+    Args:
+        target: Stream the decoded bytes are written to
+        encoding (str): 'gzip', 'x-gzip' or 'zstd'
+        limit (int): Maximum decoded size, or None for no limit
+    """
+    
+    def __init__(self, target, encoding, limit=None):
+        self.target = target
+        self.limit = limit
+        self.decoded = 0
+        self.finished = False
+        self._zstd = None
+        self._zlib = None
+        if encoding == 'zstd':
+            self._zstd = zstandard.ZstdDecompressor().stream_writer(
+                _CallbackWriter(self._emit), write_size=DECODE_CHUNK, closefd=False)
+        else:
+            self._zlib = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    
+    def _emit(self, data):
+        self.decoded += len(data)
+        if self.limit is not None and self.decoded > self.limit:
+            raise DecodedTooLargeError(f"Decompressed upload exceeds {self.limit} bytes")
+        self.target.write(data)
+    
+    def write(self, data):
+        try:
+            if self._zstd is not None:
+                self._zstd.write(data)
+            else:
+                self._write_gzip(data)
+        except DECODE_ERRORS as e:
+            raise CorruptEncodingError(f"Corrupt compressed upload: {e}")
+        return len(data)
+    
+    def _write_gzip(self, data):
+        while True:
+            if self._zlib.eof:
+                if not data:
+                    return
+                # Concatenated gzip members decode to concatenated data
+                self._zlib = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            out = self._zlib.decompress(data, DECODE_CHUNK)
+            if out:
+                self._emit(out)
+            data = self._zlib.unused_data if self._zlib.eof else self._zlib.unconsumed_tail
+            # A full chunk may mean more output is pending inside zlib
+            if not data and not self._zlib.eof and len(out) < DECODE_CHUNK:
+                return
+    
+    def finish(self):
+        """Check that the compressed data was complete."""
+        if self.finished:
+            return
+        self.finished = True
+        if self._zstd is not None:
+            self._zstd.flush()
+        elif not self._zlib.eof:
+            raise CorruptEncodingError('Truncated compressed upload')
+    
+    def seek(self, offset, whence=0):
+        # The form parser rewinds each part once it is complete
+        self.finish()
+        return self.target.seek(offset, whence)
+    
+    def __getattr__(self, name):
+        return getattr(self.target, name)
+
+
+class _CallbackWriter:
+    """Minimal writable object that passes every write to a function."""
+    
+    def __init__(self, callback):
+        self.write = callback
+
+
+class DecodingMultiPartParser(MultiPartParser):
+    """Multipart parser that decodes file parts with a Content-Encoding."""
+    
+    def start_file_streaming(self, event, total_content_length):
+        container = super().start_file_streaming(event, total_content_length)
+        encoding = check_content_encoding(event.headers.get('content-encoding'))
+        if encoding is None:
+            return container
+        return DecompressingWriter(container, encoding, app.config['MAX_DECOMPRESSED_LENGTH'])
+
+
+class DecodingFormDataParser(FormDataParser):
+    """Form parser using DecodingMultiPartParser for multipart bodies."""
+    
+    def _parse_multipart(self, stream, mimetype, content_length, options):
+        parser = DecodingMultiPartParser(
+            stream_factory=self.stream_factory,
+            max_form_memory_size=self.max_form_memory_size,
+            max_form_parts=self.max_form_parts,
+            cls=self.cls)
+        boundary = options.get('boundary', '').encode('ascii')
+        if not boundary:
+            raise ValueError('Missing boundary')
+        form, files = parser.parse(stream, boundary, content_length)
+        return stream, form, files
+
+
+# Request hook (registered in routes.py)
+
+def _check_request_encoding():
+    # Reject unknown encodings up front with a clear error instead of
+    # failing halfway through parsing the body
+    try:
+        check_content_encoding(request.headers.get('Content-Encoding'))
+    except UnsupportedMediaType as e:
+        return jsonify({'success': False, 'error': e.description}), 415
+    return None
@@ -0,0 +1,72 @@
+"""
+Flask application, CORS and configuration.
+
+Every setting is in app.config; most can be overridden with an SHA256_*
+environment variable.
+"""
+
+from flask import Flask
+from flask_cors import CORS
+import os
+
+# Initialize Flask application
+app = Flask('sha256app')
+
+# NEW: Enable CORS so JavaScript can call this API
+CORS_ORIGINS = ["http://127.0.0.1:5500", "http://localhost:5500"]  # Your JS dev server
+
+CORS(app, resources={
+    r"/api/*": {
+        "origins": CORS_ORIGINS,
+        "methods": ["GET", "POST", "PUT", "DELETE"],
+        "allow_headers": ["Content-Type", "Content-Encoding", "X-Chunk-SHA256"]
+    }
+})
+
+# Configure upload folder (created on first use, see SQLiteDatabase.setup())
+UPLOAD_FOLDER = 'uploads'
+
+app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+app.config['MAX_DECOMPRESSED_LENGTH'] = 256 * 1024 * 1024  # Max decoded size of a compressed body or part
+app.config['HASH_WORKERS'] = min(32, (os.cpu_count() or 1) + 4)  # Threads of the shared hashing pool (batch parts, Merkle chunks, range hashes)
+app.config['BATCH_MAX_FILES'] = 1000  # Max files per batch request
+app.config['VERIFY_MANIFEST_MAX_LENGTH'] = 1024 * 1024 * 1024  # Max manifest body for bulk verification
+app.config['MERKLE_MAX_CHUNKS'] = 100000  # Max chunk hashes or chunk numbers per /api/merkle-verify request
+app.config['RANGE_MAX_RANGES'] = 1000  # Max byte ranges per /api/range-hash request
+app.config['RANGE_HASHES_ON_UPLOAD'] = os.environ.get('SHA256_RANGE_HASHES', '') == '1'  # Record range hashes of new uploads
+app.config['DELTA_MAX_OUTPUT'] = 4 * 1024 * 1024 * 1024  # Max size of a file rebuilt from a delta
+app.config['LOOKUP_MAX_HASHES'] = 10000  # Max hashes per catalog lookup
+app.config['RESUMABLE_CHUNK_SIZE'] = 8 * 1024 * 1024  # Default chunk size for resumable uploads
+app.config['RESUMABLE_MAX_SIZE'] = int(os.environ.get('SHA256_RESUMABLE_MAX_SIZE', 16 * 1024 ** 3))  # Largest resumable upload
+app.config['RESUMABLE_SESSION_TTL'] = int(os.environ.get('SHA256_RESUMABLE_TTL', 24 * 3600))  # Idle seconds before a session is deleted
+app.config['DEBUG_SERVER'] = os.environ.get('SHA256_DEBUG', '') == '1'  # Single-process debug server with reloader
+app.config['SERVER_WORKERS'] = int(os.environ.get('SHA256_WORKERS', 0)) or os.cpu_count() or 1  # Server processes
+app.config['SERVER_THREADS'] = int(os.environ.get('SHA256_THREADS', 8))  # Request threads per process
+app.config['SERVER_MAX_REQUESTS'] = int(os.environ.get('SHA256_MAX_REQUESTS', 0))  # Recycle workers (0 = never)
+app.config['SERVER_MAX_REQUESTS_JITTER'] = int(os.environ.get('SHA256_MAX_REQUESTS_JITTER', 0))
+app.config['SERVER_GRACEFUL_TIMEOUT'] = 30  # Seconds workers get to finish on shutdown/reload
+app.config['METRICS_DIR'] = os.environ.get('SHA256_METRICS_DIR')  # Shared metrics of all server processes
+# Admission control for hashing requests (0 = unlimited)
+app.config['ADMISSION_MAX_CONCURRENT'] = int(os.environ.get('SHA256_MAX_CONCURRENT_HASHES',
+                                                            2 * (os.cpu_count() or 1)))
+app.config['ADMISSION_MAX_BYTES'] = int(os.environ.get('SHA256_MAX_INFLIGHT_BYTES', 256 * 1024 * 1024))
+app.config['ADMISSION_QUEUE_SIZE'] = 64  # Requests that may wait for admission before 503s
+app.config['ADMISSION_QUEUE_TIMEOUT'] = 2.0  # Max seconds a request waits for admission
+app.config['ADMISSION_PROCESSES'] = int(os.environ.get('SHA256_ADMISSION_PROCESSES', 1))  # Processes sharing the limits
+app.config['JOB_WORKERS'] = int(os.environ.get('SHA256_JOB_WORKERS', 2))  # In-process job workers (0 = external only)
+app.config['JOB_RETENTION'] = int(os.environ.get('SHA256_JOB_RETENTION', 7 * 24 * 3600))  # Seconds finished jobs are kept
+app.config['JOB_EVENTS_MAX_SECONDS'] = 300  # Longest job event stream; clients reconnect after it
+app.config['JOB_EVENTS_MAX_STREAMS'] = max(1, app.config['SERVER_THREADS'] // 2)  # Event streams per process
+app.config['SCRUB_ENABLED'] = os.environ.get('SHA256_SCRUB', '') == '1'  # Scrub from server start
+app.config['SCRUB_MAX_BYTES_PER_SEC'] = 50 * 1024 * 1024  # Scrubber read bandwidth limit
+app.config['SCRUB_MAX_IOPS'] = 200  # Scrubber read operations per second
+app.config['SCRUB_PASS_INTERVAL'] = 6 * 3600  # Seconds between full scrub passes
+app.config['ADMIN_TOKEN'] = os.environ.get('SHA256_ADMIN_TOKEN')  # Bearer token for admin endpoints
+app.config['PROFILE_DIR'] = os.environ.get('SHA256_PROFILE_DIR')  # Where request profiles go (None = off)
+app.config['PROFILE_EVERY_N'] = int(os.environ.get('SHA256_PROFILE_EVERY_N', 0))  # cProfile every Nth request
+app.config['PROFILE_SLOW_MS'] = float(os.environ.get('SHA256_PROFILE_SLOW_MS', 0))  # Keep samples of slower requests
+app.config['DIGEST_CACHE_PATH'] = os.environ.get('SHA256_DIGEST_CACHE')  # Opt-in digest cache (SQLite file)
+app.config['DIGEST_CACHE_MAX_ENTRIES'] = 100000
+app.config['HASH_BACKEND'] = os.environ.get('SHA256_HASH_BACKEND')  # Force hash backends (None = fastest)
+app.config['HASH_BACKEND_BENCHMARK'] = os.environ.get('SHA256_HASH_BENCHMARK', '1') == '1'  # Time backends at startup
@@ -0,0 +1,60 @@
+"""
+Base class for the SQLite databases kept in the upload folder.
+"""
+
+import os
+import sqlite3
+import threading
+
+
+class SQLiteDatabase:
+    """
+    Base class for the small SQLite databases kept next to the uploads.
+    
+    Hands out one connection per thread and per process, since the
+    hashing pools may call in from worker threads or forked processes.
+    
+    Nothing is created on disk until the database is first used: then
+    setup() creates its directory, and the subclass's _setup() its
+    tables. Importing this module therefore leaves the filesystem alone.
+    
+    Args:
+        db_path (str): SQLite database file
+    """
+    
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._setup_lock = threading.Lock()
+        self._ready = False
+    
+    def setup(self):
+        """Create the database, its directory and tables unless done already."""
+        if self._ready:
+            return
+        with self._setup_lock:
+            if self._ready:
+                return
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                with conn:
+                    self._setup(conn)
+            finally:
+                conn.close()
+            self._ready = True
+    
+    def _setup(self, conn):
+        """Create the tables; run once, by setup()."""
+    
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            self.setup()
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
@@ -0,0 +1,337 @@
+"""
+Block signatures and delta uploads.
+
+rsync-style re-uploads. The client fetches the block signature of the
+version the server already has (an Adler-32 weak checksum and a SHA-256
+per block), finds the blocks it can reuse with a rolling checksum over
+its new file, and sends only a delta: "copy block i" instructions plus
+the literal bytes in between. The server rebuilds the file from the
+stored blob and the literals and hashes the result, so an edit of a
+few bytes in a large file costs a few blocks of upload.
+"""
+
+import base64
+import math
+import os
+import time
+import zlib
+
+from .config import UPLOAD_FOLDER, app
+from .metrics import record_hash
+from .backends import new_hash
+from .database import SQLiteDatabase
+from .hashing import HASH_BLOCK_SIZE, _bounded_map, get_hash_executor
+from .store import content_store
+from .merkle import MERKLE_CHUNK_SIZE
+
+DELTA_MIN_BLOCK_SIZE = 512
+DELTA_MAX_BLOCK_SIZE = 8 * 1024 * 1024
+ADLER_MOD = 65521
+
+
+def default_delta_block_size(file_size):
+    """
+    Pick a block size for a file's signature, as rsync does.
+    
+    Blocks of about sqrt(size) balance the signature size (one entry per
+    block) against the literal data sent around each change (up to one
+    block). The result is a power of two between 2KB and 1MB.
+    """
+    target = max(1, math.isqrt(file_size))
+    return min(1024 * 1024, max(2048, 1 << (target - 1).bit_length()))
+
+
+class RollingChecksum:
+    """
+    Adler-32 of a sliding window, moved one byte at a time in O(1).
+    
+    Values are the same as zlib.adler32() of the window, so the server can
+    compute signatures at C speed and clients can roll the same checksum.
+    
+    Args:
+        window (bytes): The initial window; its length is kept while rolling
+    """
+    
+    def __init__(self, window):
+        self.length = len(window)
+        value = zlib.adler32(window)
+        self.a = value & 0xffff
+        self.b = value >> 16
+    
+    def roll(self, out_byte, in_byte):
+        """Drop ``out_byte`` from the front of the window and append ``in_byte``."""
+        self.a = (self.a - out_byte + in_byte) % ADLER_MOD
+        self.b = (self.b - self.length * out_byte + self.a - 1) % ADLER_MOD
+    
+    @property
+    def value(self):
+        return (self.b << 16) | self.a
+
+
+def _signature_blocks(fd, first, count, block_size):
+    """Weak and strong checksums of ``count`` blocks starting at block ``first``."""
+    weak, strong = [], []
+    for index in range(first, first + count):
+        block = os.pread(fd, block_size, index * block_size)
+        if not block and index:
+            break
+        weak.append(zlib.adler32(block))
+        strong.append(new_hash('sha256', block).hexdigest())
+    return weak, strong
+
+
+def block_signature(file_path, block_size):
+    """
+    Calculate the rsync-style block signature of a file.
+    
+    Blocks are read with os.pread() and checksummed in parallel, several
+    blocks per task so small blocks don't drown in scheduling overhead.
+    The last block may be short; an empty file has one empty block.
+    
+    Args:
+        file_path (str): Path to the file
+        block_size (int): Bytes per block
+    
+    Returns:
+        tuple: (list of Adler-32 weak checksums, list of hex SHA-256s)
+    """
+    fd = os.open(file_path, os.O_RDONLY)
+    try:
+        file_size = os.fstat(fd).st_size
+        block_count = max(1, -(-file_size // block_size))
+        per_task = max(1, MERKLE_CHUNK_SIZE // block_size)
+        tasks = ((fd, first, min(per_task, block_count - first), block_size)
+                 for first in range(0, block_count, per_task))
+        weak, strong = [], []
+        start = time.perf_counter()
+        for _, (task_weak, task_strong) in _bounded_map(
+                get_hash_executor(), _signature_blocks, tasks, app.config['HASH_WORKERS'] * 2):
+            weak += task_weak
+            strong += task_strong
+        record_hash(file_size, time.perf_counter() - start)
+        return weak, strong
+    finally:
+        os.close(fd)
+
+
+def make_delta(signature, data):
+    """
+    Build a delta that turns the signed file into ``data``.
+    
+    This is the client half of the protocol, for Python clients and as a
+    reference for the JavaScript one. A rolling Adler-32 finds candidate
+    blocks at every byte offset and the SHA-256 confirms them. After a
+    match the checksum restarts with zlib, so unchanged stretches are
+    matched at C speed and only changed bytes are rolled in Python.
+    
+    Args:
+        signature (dict): size, block_size, weak and strong as returned by
+            /api/signature
+        data (bytes): The new file contents (bytes, or an mmap)
+    
+    Returns:
+        list: Instructions for /api/delta: {"copy": i, "count": n} to reuse
+            n blocks starting at block i, {"data": base64} for new bytes
+    """
+    block_size = signature['block_size']
+    weak, strong = signature['weak'], signature['strong']
+    candidates = {}
+    for index, value in enumerate(weak):
+        candidates.setdefault(value, []).append(index)
+    
+    instructions = []
+    literal_start = 0
+    
+    def emit_literal(end):
+        if end > literal_start:
+            instructions.append({'data': base64.b64encode(data[literal_start:end]).decode('ascii')})
+    
+    def emit_copy(index):
+        last = instructions[-1] if instructions else None
+        if last and 'copy' in last and last['copy'] + last['count'] == index:
+            last['count'] += 1
+        else:
+            instructions.append({'copy': index, 'count': 1})
+    
+    position = 0
+    rolling = None
+    while position + block_size <= len(data):
+        if rolling is None:
+            rolling = RollingChecksum(data[position:position + block_size])
+        index = None
+        for candidate in candidates.get(rolling.value, ()):
+            if new_hash('sha256', data[position:position + block_size]).hexdigest() == strong[candidate]:
+                index = candidate
+                break
+        if index is not None:
+            emit_literal(position)
+            emit_copy(index)
+            position += block_size
+            literal_start = position
+            rolling = None
+            continue
+        if position + block_size < len(data):
+            rolling.roll(data[position], data[position + block_size])
+        position += 1
+    
+    # A short last block of the old file can only match the new file's end
+    tail = len(weak) - 1
+    tail_length = signature['size'] - tail * block_size
+    start = len(data) - tail_length
+    if 0 < tail_length < block_size and start >= literal_start \
+            and zlib.adler32(data[start:]) == weak[tail] \
+            and new_hash('sha256', data[start:]).hexdigest() == strong[tail]:
+        emit_literal(start)
+        emit_copy(tail)
+        literal_start = len(data)
+    emit_literal(len(data))
+    return instructions
+
+
+class DeltaError(Exception):
+    """Raised for a delta that cannot be applied; carries the HTTP status."""
+    
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_delta(instructions, base_size, block_size, max_output=None):
+    """
+    Check and decode delta instructions.
+    
+    Every copy is checked against the base file, and the size of the
+    result against ``max_output``, before anything is written, so a bad
+    delta never leaves a half-built file behind and a small request can't
+    expand into a huge one.
+    
+    Returns:
+        list: ('copy', offset, length) and ('data', bytes) tuples
+    
+    Raises:
+        DeltaError: 400 for a malformed instruction, 413 if the rebuilt
+            file would be larger than ``max_output``
+    """
+    if not isinstance(instructions, list):
+        raise DeltaError('instructions must be a list')
+    block_count = max(1, -(-base_size // block_size))
+    ops = []
+    output_size = 0
+    for number, op in enumerate(instructions):
+        try:
+            if not isinstance(op, dict):
+                raise DeltaError(f'Instruction {number}: expected an object')
+            if 'copy' in op:
+                index, count = int(op['copy']), int(op.get('count', 1))
+                if index < 0 or count < 1 or index + count > block_count:
+                    raise DeltaError(f'Instruction {number}: blocks {index}..{index + count - 1} '
+                                     f'are outside the base file ({block_count} blocks)')
+                offset = index * block_size
+                ops.append(('copy', offset, min(count * block_size, base_size - offset)))
+            elif 'data' in op:
+                ops.append(('data', base64.b64decode(op['data'], validate=True)))
+            else:
+                raise DeltaError(f'Instruction {number}: expected "copy" or "data"')
+        except (TypeError, ValueError) as e:
+            raise DeltaError(f'Instruction {number}: {e}')
+        output_size += ops[-1][2] if ops[-1][0] == 'copy' else len(ops[-1][1])
+        if max_output is not None and output_size > max_output:
+            raise DeltaError(f'Rebuilt file would be larger than {max_output} bytes', 413)
+    return ops
+
+
+def apply_delta(base_path, ops, out_file):
+    """
+    Rebuild a file from a base file and parsed delta instructions.
+    
+    Copied ranges are read with os.pread() in HASH_BLOCK_SIZE pieces, and
+    everything written is hashed on the way out, so the new file's
+    SHA-256 is known without reading it back.
+    
+    Args:
+        base_path (str): The stored base file
+        ops (list): Output of parse_delta()
+        out_file: Binary file object to write the new file to
+    
+    Returns:
+        dict: sha256, size, copied_bytes and literal_bytes
+    """
+    sha256_hash = new_hash()
+    copied = literal = 0
+    start = time.perf_counter()
+    fd = os.open(base_path, os.O_RDONLY)
+    try:
+        for op in ops:
+            if op[0] == 'data':
+                sha256_hash.update(op[1])
+                out_file.write(op[1])
+                literal += len(op[1])
+                continue
+            _, offset, length = op
+            end = offset + length
+            while offset < end:
+                block = os.pread(fd, min(HASH_BLOCK_SIZE, end - offset), offset)
+                if not block:
+                    raise DeltaError('Base file is shorter than recorded', 409)
+                sha256_hash.update(block)
+                out_file.write(block)
+                offset += len(block)
+                copied += len(block)
+    finally:
+        os.close(fd)
+    record_hash(copied + literal, time.perf_counter() - start)
+    return {'sha256': sha256_hash.hexdigest(), 'size': copied + literal,
+            'copied_bytes': copied, 'literal_bytes': literal}
+
+
+class SignatureCache(SQLiteDatabase):
+    """
+    Block signatures of stored blobs, kept in signatures.db.
+    
+    A signature only depends on the blob's content and the block size, so
+    it is computed once per (sha256, block_size) and served from here for
+    every later re-upload of that version.
+    
+    Args:
+        db_path (str): SQLite database file
+        store (ContentStore): Store the blobs live in
+    """
+    
+    def __init__(self, db_path, store):
+        super().__init__(db_path)
+        self.store = store
+    
+    def _setup(self, conn):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS signatures (
+                sha256 TEXT NOT NULL,
+                block_size INTEGER NOT NULL,
+                weak BLOB NOT NULL,
+                strong BLOB NOT NULL,
+                PRIMARY KEY (sha256, block_size)
+            )""")
+    
+    def get(self, sha256_hex, block_size):
+        """
+        Return a blob's signature, computing and storing it if needed.
+        
+        Returns:
+            tuple: (list of weak checksums, list of hex SHA-256s)
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT weak, strong FROM signatures WHERE sha256 = ? AND block_size = ?",
+                               (sha256_hex, block_size)).fetchone()
+        if row is not None:
+            weak, strong = row
+            return ([int.from_bytes(weak[i:i + 4], 'big') for i in range(0, len(weak), 4)],
+                    [strong[i:i + 32].hex() for i in range(0, len(strong), 32)])
+        
+        weak, strong = block_signature(self.store.blob_path(sha256_hex), block_size)
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO signatures VALUES (?, ?, ?, ?)",
+                         (sha256_hex, block_size, b''.join(w.to_bytes(4, 'big') for w in weak),
+                          b''.join(bytes.fromhex(s) for s in strong)))
+        return weak, strong
+
+
+signature_cache = SignatureCache(os.path.join(UPLOAD_FOLDER, 'signatures.db'), content_store)
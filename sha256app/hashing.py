@@ -0,0 +1,567 @@
+"""
+File, bytes and stream hashing.
+
+The read strategies behind calculate_sha256(), single-pass hashing of
+several digests, the persistent digest cache and the shared thread pools.
+"""
+
+import mmap
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+
+from .config import app
+from .metrics import record_hash
+from .backends import DIGEST_ALGORITHMS, new_hash
+from .database import SQLiteDatabase
+
+# Hashing engine tuning. Large blocks cut per-call overhead; files above
+# the mmap threshold are hashed straight from the page cache.
+HASH_BLOCK_SIZE = 1024 * 1024             # 1MB per read
+HASH_MMAP_THRESHOLD = 64 * 1024 * 1024    # mmap files of 64MB and up
+HASH_STRATEGIES = ('read', 'readinto', 'mmap')
+
+
+def choose_hash_strategy(file_size, block_size=HASH_BLOCK_SIZE):
+    """
+    Pick the cheapest way to read a file of the given size.
+    
+    Args:
+        file_size (int): Size of the file in bytes
+        block_size (int): Read size used by the chunked strategies
+    
+    Returns:
+        str: 'read' for files that fit in one block, 'mmap' for big files,
+             'readinto' for everything in between
+    """
+    if file_size <= block_size:
+        return 'read'
+    if file_size >= HASH_MMAP_THRESHOLD:
+        return 'mmap'
+    return 'readinto'
+
+
+def feed_file(file_path, update, strategy='auto', block_size=HASH_BLOCK_SIZE):
+    """
+    Read a file and pass its contents to ``update`` block by block.
+    
+    This is the read loop behind every file-hashing function, so they all
+    share the same strategies.
+    
+    Args:
+        file_path (str): Path to the file
+        update (callable): Called with each block (bytes or memoryview);
+            the block is only valid for the duration of the call
+        strategy (str): 'auto', 'read', 'readinto' or 'mmap'
+        block_size (int): Bytes per block
+    
+    Returns:
+        int: Number of bytes read
+    
+    Strategies:
+        read     - plain f.read() of block_size bytes (one call for small files)
+        readinto - reads into one preallocated buffer that is reused
+        mmap     - maps the file and hands out slices, no copies at all
+    """
+    with open(file_path, "rb", buffering=0) as f:
+        file_size = os.fstat(f.fileno()).st_size
+        if strategy == 'auto':
+            strategy = choose_hash_strategy(file_size, block_size)
+        elif strategy not in HASH_STRATEGIES:
+            raise ValueError(f"Unknown hash strategy: {strategy}")
+        
+        # mmap cannot map an empty file
+        if strategy == 'mmap' and file_size > 0:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                with memoryview(mm) as view:
+                    for start in range(0, len(view), block_size):
+                        update(view[start:start + block_size])
+                return len(mm)
+        
+        if strategy == 'readinto':
+            total = 0
+            buffer = bytearray(block_size)
+            with memoryview(buffer) as view:
+                while True:
+                    n = f.readinto(buffer)
+                    if not n:
+                        break
+                    update(view[:n])
+                    total += n
+            return total
+        
+        total = 0
+        for byte_block in iter(lambda: f.read(block_size), b""):
+            update(byte_block)
+            total += len(byte_block)
+        return total
+
+
+def calculate_sha256(file_path, strategy='auto', block_size=HASH_BLOCK_SIZE, use_cache=True,
+                     throttle=None):
+    """
+    Calculate SHA-256 hash of a file.
+    
+    This function reads the file in chunks (to handle large files efficiently)
+    and calculates its SHA-256 hash.
+    
+    Args:
+        file_path (str): Path to the file
+        strategy (str): Read strategy, see feed_file() ('auto' picks by size)
+        block_size (int): Bytes per read
+        use_cache (bool): Consult the digest cache if one is enabled
+        throttle (callable): Called with the size of each block before it
+            is hashed; may sleep to limit the read rate
+    
+    Returns:
+        str: Hexadecimal SHA-256 hash string
+    
+    How it works:
+        1. Returns the cached digest if the file is unchanged since last time
+        2. Otherwise creates a SHA-256 hash object
+        3. Reads file in large blocks (or maps it into memory)
+        4. Updates hash with each block and caches the result
+    """
+    cache = _digest_cache if use_cache else None
+    if cache is not None:
+        st = os.stat(file_path)
+        cached_hash = cache.get(file_path, st)
+        if cached_hash is not None:
+            return cached_hash
+    
+    sha256_hash = new_hash()  # Create hash object
+    update = sha256_hash.update
+    if throttle is not None:
+        def update(block):
+            throttle(len(block))
+            sha256_hash.update(block)
+    
+    start = time.perf_counter()
+    size = feed_file(file_path, update, strategy, block_size)
+    file_hash = sha256_hash.hexdigest()
+    record_hash(size, time.perf_counter() - start)
+    
+    if cache is not None:
+        cache.put(file_path, st, file_hash)
+    
+    # Return hash as hexadecimal string
+    return file_hash
+
+
+def calculate_sha256_from_bytes(file_bytes):
+    """
+    Calculate SHA-256 hash directly from file bytes.
+    
+    Useful when you have file data in memory (like from web uploads).
+    
+    Args:
+        file_bytes (bytes): File content as bytes
+    
+    Returns:
+        str: Hexadecimal SHA-256 hash string
+    """
+    sha256_hash = new_hash()
+    start = time.perf_counter()
+    sha256_hash.update(file_bytes)
+    record_hash(len(file_bytes), time.perf_counter() - start)
+    return sha256_hash.hexdigest()
+
+
+def calculate_sha256_from_stream(stream, block_size=HASH_BLOCK_SIZE):
+    """
+    Calculate SHA-256 hash of an open binary stream.
+    
+    Useful for uploaded files that Werkzeug has already spooled, without
+    loading the whole file into one bytes object.
+    
+    Args:
+        stream: Readable binary file-like object
+        block_size (int): Bytes per read
+    
+    Returns:
+        tuple: (hexadecimal SHA-256 hash string, number of bytes read)
+    """
+    sha256_hash = new_hash()
+    size = 0
+    start = time.perf_counter()
+    for byte_block in iter(lambda: stream.read(block_size), b""):
+        sha256_hash.update(byte_block)
+        size += len(byte_block)
+    record_hash(size, time.perf_counter() - start)
+    return sha256_hash.hexdigest(), size
+
+
+# MULTI-DIGEST HASHING
+
+# Blocks at least this big are fed to the digests on separate threads
+PARALLEL_DIGEST_MIN = 1024 * 1024
+
+
+def parse_algorithms(value):
+    """
+    Parse a comma-separated list of digest algorithms.
+    
+    SHA-256 is always included (and always first), since every route
+    still reports it.
+    
+    Args:
+        value (str): e.g. "md5,sha512" (None or "" means SHA-256 only)
+    
+    Returns:
+        list: Algorithm names
+    
+    Raises:
+        ValueError: If an algorithm is not supported
+    """
+    algorithms = ['sha256']
+    for name in (value or '').split(','):
+        name = name.strip().lower().replace('-', '_')
+        if not name:
+            continue
+        if name not in DIGEST_ALGORITHMS:
+            raise ValueError(f"Unsupported algorithm: {name}")
+        if name not in algorithms:
+            algorithms.append(name)
+    return algorithms
+
+
+class MultiHasher:
+    """
+    Feeds the same data to several digests at once.
+    
+    With more than one algorithm, large blocks are hashed on the digest
+    thread pool, one algorithm per thread. hashlib releases the GIL for
+    big updates, so the digests run on separate cores.
+    
+    Args:
+        algorithms (list): Algorithm names, e.g. ['sha256', 'md5']
+    """
+    
+    def __init__(self, algorithms=('sha256',)):
+        self.hashes = {name: new_hash(name) for name in algorithms}
+        self._objects = list(self.hashes.values())
+    
+    def update(self, data):
+        if len(self._objects) == 1 or len(data) < PARALLEL_DIGEST_MIN:
+            for hash_object in self._objects:
+                hash_object.update(data)
+            return
+        executor = get_digest_executor()
+        futures = [executor.submit(h.update, data) for h in self._objects[1:]]
+        self._objects[0].update(data)
+        for future in futures:
+            future.result()
+    
+    def hexdigest(self, algorithm='sha256'):
+        return self.hashes[algorithm].hexdigest()
+    
+    def hexdigests(self):
+        """Return {algorithm: hex digest} for every algorithm."""
+        return {name: h.hexdigest() for name, h in self.hashes.items()}
+
+
+def calculate_digests(file_path, algorithms, strategy='auto', block_size=HASH_BLOCK_SIZE):
+    """
+    Calculate several digests of a file with a single read.
+    
+    Args:
+        file_path (str): Path to the file
+        algorithms (list): Algorithm names (see parse_algorithms())
+        strategy (str): Read strategy, see feed_file()
+        block_size (int): Bytes per read
+    
+    Returns:
+        dict: {algorithm: hexadecimal digest}
+    """
+    hasher = MultiHasher(algorithms)
+    start = time.perf_counter()
+    size = feed_file(file_path, hasher.update, strategy, block_size)
+    record_hash(size, time.perf_counter() - start)
+    return hasher.hexdigests()
+
+
+def calculate_digests_from_bytes(file_bytes, algorithms):
+    """
+    Calculate several digests of in-memory data.
+    
+    Args:
+        file_bytes (bytes): File content as bytes
+        algorithms (list): Algorithm names
+    
+    Returns:
+        dict: {algorithm: hexadecimal digest}
+    """
+    hasher = MultiHasher(algorithms)
+    start = time.perf_counter()
+    hasher.update(file_bytes)
+    record_hash(len(file_bytes), time.perf_counter() - start)
+    return hasher.hexdigests()
+
+
+def calculate_digests_from_stream(stream, algorithms, block_size=HASH_BLOCK_SIZE):
+    """
+    Calculate several digests of an open binary stream with a single read.
+    
+    Returns:
+        tuple: ({algorithm: hexadecimal digest}, number of bytes read)
+    """
+    hasher = MultiHasher(algorithms)
+    size = 0
+    start = time.perf_counter()
+    for byte_block in iter(lambda: stream.read(block_size), b""):
+        hasher.update(byte_block)
+        size += len(byte_block)
+    record_hash(size, time.perf_counter() - start)
+    return hasher.hexdigests(), size
+
+
+def verify_file_integrity(file_path, expected_hash, use_cache=True, throttle=None):
+    """
+    Verify if a file's hash matches the expected hash.
+    
+    This is the core of integrity checking - if even one bit changes,
+    the hash will be completely different.
+    
+    Args:
+        file_path (str): Path to file to check
+        expected_hash (str): The hash we expect
+        use_cache (bool): Accept a cached digest for an unchanged file.
+            Pass False to force a full read, e.g. when looking for bit rot
+            that does not change the file's metadata.
+        throttle (callable): Rate limiter, see calculate_sha256()
+    
+    Returns:
+        bool: True if hashes match, False otherwise
+    """
+    current_hash = calculate_sha256(file_path, use_cache=use_cache, throttle=throttle)
+    return current_hash == expected_hash
+
+# DIGEST CACHE
+
+class DigestCache(SQLiteDatabase):
+    """
+    Persistent cache of file digests, stored in SQLite.
+    
+    Entries are keyed by absolute path and remember the file's device,
+    inode, size and mtime_ns. A lookup only hits if all of them still
+    match, so any rewrite, replace or truncate invalidates the entry.
+    The least recently used entries are evicted once the cache grows
+    past max_entries.
+    
+    Files modified in the last couple of seconds are not cached, since a
+    second write within the same mtime tick would go unnoticed.
+    
+    Args:
+        db_path (str): SQLite database file
+        max_entries (int): Maximum number of cached digests
+    """
+    
+    # Files younger than this are not cached (filesystem mtime granularity)
+    MIN_AGE_NS = 2 * 1000 ** 3
+    
+    def __init__(self, db_path, max_entries=100000):
+        super().__init__(db_path)
+        self.max_entries = max_entries
+        self._puts_since_trim = 0
+    
+    def _setup(self, conn):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS digests (
+                path TEXT PRIMARY KEY,
+                dev INTEGER NOT NULL,
+                ino INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                sha256 TEXT NOT NULL,
+                last_used INTEGER NOT NULL
+            )""")
+        conn.execute("CREATE INDEX IF NOT EXISTS digests_last_used ON digests (last_used)")
+    
+    def get(self, file_path, st):
+        """
+        Look up the digest of a file.
+        
+        Args:
+            file_path (str): Path to the file
+            st (os.stat_result): Current stat of the file
+        
+        Returns:
+            str: Cached SHA-256 hex digest, or None on a miss
+        """
+        path = os.path.abspath(file_path)
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT dev, ino, size, mtime_ns, sha256 FROM digests WHERE path = ?",
+                (path,)).fetchone()
+            if row is None:
+                return None
+            if row[:4] != (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns):
+                conn.execute("DELETE FROM digests WHERE path = ?", (path,))
+                return None
+            conn.execute("UPDATE digests SET last_used = ? WHERE path = ?",
+                         (time.time_ns(), path))
+            return row[4]
+    
+    def put(self, file_path, st, sha256_hex):
+        """
+        Store the digest of a file.
+        
+        ``st`` must be the stat taken before the file was read. If the
+        file changed while it was being hashed, nothing is stored.
+        
+        Args:
+            file_path (str): Path to the file
+            st (os.stat_result): Stat of the file taken before hashing
+            sha256_hex (str): Digest of the file
+        """
+        now = time.time_ns()
+        if now - st.st_mtime_ns < self.MIN_AGE_NS:
+            return
+        after = os.stat(file_path)
+        identity = (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+        if (after.st_dev, after.st_ino, after.st_size, after.st_mtime_ns) != identity:
+            return
+        
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO digests VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (os.path.abspath(file_path),) + identity + (sha256_hex, now))
+        
+        # Trim in batches rather than counting rows on every insert
+        self._puts_since_trim += 1
+        if self._puts_since_trim >= max(1, self.max_entries // 10):
+            self._puts_since_trim = 0
+            self.trim()
+    
+    def trim(self):
+        """Evict least recently used entries beyond max_entries."""
+        with self._connect() as conn:
+            conn.execute("""
+                DELETE FROM digests WHERE path IN (
+                    SELECT path FROM digests ORDER BY last_used DESC
+                    LIMIT -1 OFFSET ?
+                )""", (self.max_entries,))
+    
+    def clear(self):
+        """Remove every cached digest."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM digests")
+
+
+_digest_cache = None
+
+
+def enable_digest_cache(db_path, max_entries=100000):
+    """
+    Turn on the persistent digest cache for calculate_sha256().
+    
+    The cache is off by default. Once enabled, unchanged files are
+    answered with a stat() call instead of a full read.
+    
+    Args:
+        db_path (str): SQLite database file (created if missing)
+        max_entries (int): Maximum number of cached digests
+    
+    Returns:
+        DigestCache: The active cache
+    """
+    global _digest_cache
+    _digest_cache = DigestCache(db_path, max_entries)
+    return _digest_cache
+
+
+def disable_digest_cache():
+    """Turn the digest cache off again."""
+    global _digest_cache
+    _digest_cache = None
+
+
+if app.config['DIGEST_CACHE_PATH']:
+    enable_digest_cache(app.config['DIGEST_CACHE_PATH'], app.config['DIGEST_CACHE_MAX_ENTRIES'])
+
+# THREAD POOL
+
+_hash_executor = None
+_hash_executor_lock = threading.Lock()
+
+
+def get_hash_executor():
+    """
+    Return the shared thread pool used for concurrent hashing.
+    
+    The pool is created on first use with app.config['HASH_WORKERS']
+    threads, so every request shares one bounded set of workers.
+    hashlib releases the GIL while hashing large buffers, which lets
+    the threads run on several cores at once.
+    
+    Returns:
+        ThreadPoolExecutor: The shared executor
+    """
+    global _hash_executor
+    if _hash_executor is None:
+        with _hash_executor_lock:
+            if _hash_executor is None:
+                _hash_executor = ThreadPoolExecutor(
+                    max_workers=app.config['HASH_WORKERS'],
+                    thread_name_prefix='sha256')
+    return _hash_executor
+
+
+_digest_executor = None
+
+
+def get_digest_executor():
+    """
+    Return the thread pool MultiHasher uses to run digests side by side.
+    
+    This is separate from the hash pool because MultiHasher is itself
+    called from hash pool tasks, and waiting on the same pool from inside
+    it could deadlock.
+    """
+    global _digest_executor
+    if _digest_executor is None:
+        with _hash_executor_lock:
+            if _digest_executor is None:
+                _digest_executor = ThreadPoolExecutor(
+                    max_workers=max(2, os.cpu_count() or 1),
+                    thread_name_prefix='sha256-digest')
+    return _digest_executor
+
+
+def _bounded_map(executor, fn, arg_tuples, window):
+    """
+    Like executor.map(), but keeps at most ``window`` tasks in flight.
+    
+    Executor.map() submits every item up front, which is not an option
+    for trees with millions of files. Results are yielded in input order
+    together with the arguments that produced them.
+    """
+    pending = deque()
+    for args in arg_tuples:
+        pending.append((args, executor.submit(fn, *args)))
+        if len(pending) >= window:
+            done_args, future = pending.popleft()
+            yield done_args, future.result()
+    while pending:
+        done_args, future = pending.popleft()
+        yield done_args, future.result()
+
+
+def _bounded_map_as_completed(executor, fn, arg_tuples, window):
+    """
+    Like _bounded_map(), but yields each result as soon as it is done.
+    
+    One slow item does not hold back the results behind it, at the cost
+    of the output order no longer matching the input order.
+    """
+    pending = {}
+    for args in arg_tuples:
+        pending[executor.submit(fn, *args)] = args
+        if len(pending) >= window:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future.result()
+    for future in as_completed(pending):
+        yield pending[future], future.result()
@@ -0,0 +1,194 @@
+"""
+Streaming ingest: request bodies are hashed while they are received.
+"""
+
+from flask import Request
+from werkzeug.utils import cached_property
+from werkzeug.wsgi import get_input_stream
+import io
+import os
+import tempfile
+import time
+
+from .config import app
+from .metrics import record_hash
+from .hashing import MultiHasher
+from .compression import (DECODE_CHUNK, DecodingFormDataParser, DecompressingReader,
+                          check_content_encoding)
+
+
+class HashingStream:
+    """
+    File-like object that hashes upload data as it arrives.
+
+    Werkzeug's form parser writes every uploaded file part into the
+    object returned by the request's stream factory. Giving it one of
+    these instead of a temporary file means the SHA-256 is ready as soon
+    as the body has been parsed, without reading anything back from disk.
+
+    Args:
+        sink_path (str): File to write the bytes to, or None to keep
+            nothing and only hash them
+        algorithms (list): Digests to compute (SHA-256 must be one of them)
+        executor (Executor): Hash on this pool instead of the caller's
+            thread, so the parser can read on while a block is hashed
+
+    How it works:
+        1. Each write() updates the hash and the byte count
+        2. The same bytes are written to sink_path (if any)
+        3. commit() renames the sink to its final name
+        4. close() deletes the sink if it was never committed
+
+    With an executor, each block is handed to the pool and write()
+    returns at once; the next write() first waits for the previous
+    block, so a part has at most one block in flight and its blocks are
+    hashed in order. wait() blocks until everything written is hashed.
+    """
+
+    def __init__(self, sink_path=None, algorithms=('sha256',), executor=None):
+        self.hasher = MultiHasher(algorithms)
+        self.executor = executor
+        self.size = 0
+        self.hash_seconds = 0.0
+        self.sink_path = sink_path
+        self.sink = open(sink_path, 'wb') if sink_path else None
+        self.committed = False
+        self._pending = None
+
+    def write(self, data):
+        if self.executor is None:
+            return self._write(data)
+        data = bytes(data)
+        self.wait()
+        self._pending = self.executor.submit(self._write, data)
+        return len(data)
+
+    def wait(self):
+        """Wait until every block written so far has been hashed."""
+        pending, self._pending = self._pending, None
+        if pending is not None:
+            pending.result()
+
+    def _write(self, data):
+        start = time.perf_counter()
+        self.hasher.update(data)
+        self.hash_seconds += time.perf_counter() - start
+        self.size += len(data)
+        if self.sink is not None:
+            self.sink.write(data)
+        return len(data)
+
+    def seek(self, offset, whence=0):
+        # The parser rewinds each part once it is complete; there is
+        # nothing to rewind because the data was never kept for reading.
+        return 0
+
+    def tell(self):
+        return self.size
+
+    def read(self, size=-1):
+        return b''
+
+    def readline(self, size=-1):
+        return b''
+
+    def hexdigest(self):
+        """Return the SHA-256 of everything written so far."""
+        self.wait()
+        return self.hasher.hexdigest('sha256')
+    
+    def hexdigests(self):
+        """Return every requested digest of everything written so far."""
+        self.wait()
+        return self.hasher.hexdigests()
+
+    def commit(self, final_path):
+        """
+        Move the streamed file to its final location.
+
+        This is a rename inside the upload folder, so no data is copied.
+
+        Args:
+            final_path (str): Where the file should end up
+        """
+        self.wait()
+        self.sink.close()
+        os.replace(self.sink_path, final_path)
+        self.sink_path = final_path
+        self.committed = True
+
+    def close(self):
+        try:
+            self.wait()
+        except Exception:
+            pass  # The request has already failed; only clean up
+        if self.size and self.hash_seconds >= 0:
+            record_hash(self.size, self.hash_seconds)
+            self.hash_seconds = -1.0  # Only record once
+        if self.sink is not None and not self.sink.closed:
+            self.sink.close()
+        if self.sink_path and not self.committed and os.path.exists(self.sink_path):
+            os.remove(self.sink_path)
+
+
+class HashingRequest(Request):
+    """
+    Request class that can hash uploaded files while they stream in.
+
+    A view opts in by setting ``stream_hashing = True`` before it touches
+    ``request.files``. Every file part then becomes a HashingStream. If
+    ``ingest_folder`` is also set, the bytes are written to a temporary
+    file in that folder during the same pass; otherwise nothing touches
+    disk. ``ingest_algorithms`` lists the digests to compute. With
+    ``ingest_executor`` set, parts are hashed on that pool, at most
+    HASH_WORKERS of them at a time. Views that do not opt in get
+    Werkzeug's default behaviour.
+    
+    Compressed bodies and file parts (Content-Encoding) are decoded
+    while they are read, see COMPRESSED UPLOADS.
+    """
+
+    stream_hashing = False
+    ingest_folder = None
+    ingest_algorithms = ('sha256',)
+    ingest_executor = None
+    form_data_parser_class = DecodingFormDataParser
+
+    @cached_property
+    def stream(self):
+        stream = get_input_stream(self.environ, max_content_length=self.max_content_length)
+        encoding = check_content_encoding(self.headers.get('Content-Encoding'))
+        if encoding is None:
+            return stream
+        return io.BufferedReader(
+            DecompressingReader(stream, encoding, app.config['MAX_DECOMPRESSED_LENGTH']),
+            DECODE_CHUNK)
+
+    def _get_file_stream(self, total_content_length, content_type,
+                         filename=None, content_length=None):
+        if not self.stream_hashing:
+            return super()._get_file_stream(
+                total_content_length, content_type, filename, content_length)
+
+        streams = self.__dict__.setdefault('hashing_streams', [])
+        if self.ingest_executor is not None and len(streams) >= app.config['HASH_WORKERS']:
+            # Bound the parts in flight; the oldest one is usually done
+            streams[-app.config['HASH_WORKERS']].wait()
+
+        sink_path = None
+        if self.ingest_folder:
+            fd, sink_path = tempfile.mkstemp(dir=self.ingest_folder, prefix='.ingest-')
+            os.close(fd)
+
+        stream = HashingStream(sink_path, self.ingest_algorithms, self.ingest_executor)
+        # Keep our own list so partial uploads are cleaned up even when
+        # parsing fails before request.files is populated
+        streams.append(stream)
+        return stream
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            for stream in self.__dict__.get('hashing_streams', ()):
+                stream.close()
@@ -0,0 +1,379 @@
+"""
+Persistent queue of hashing and verification jobs.
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+from .config import UPLOAD_FOLDER, app
+from .metrics import record_hash
+from .database import SQLiteDatabase
+from .hashing import MultiHasher, feed_file, parse_algorithms
+from .admission import admitted_update
+from .store import content_store, hash_catalog
+
+JOB_TYPES = ('hash', 'verify')
+
+
+class JobError(Exception):
+    """Raised for invalid job requests; carries the HTTP status."""
+    
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class JobCancelled(Exception):
+    """Raised inside a worker when its job was cancelled."""
+
+
+class JobQueue(SQLiteDatabase):
+    """
+    Persistent queue of hash and verify jobs on stored files.
+    
+    Submitting a job only writes a row to jobs.db and returns its ID, so
+    the HTTP request is quick however large the file is. Worker threads
+    claim queued jobs, hash the stored blob and write progress (bytes
+    processed) back to the row a few times a second; clients poll the
+    row or follow it as server-sent events. The progress write doubles
+    as the job's heartbeat and comes from a timer, so a job that is
+    waiting (for admission, or on a slow disk) still shows it is alive.
+    
+    The database is the queue, so workers can also run in separate
+    processes (``python SHA256.py jobs-worker``) and scale independently
+    of the web server. A running job whose heartbeat stops (the worker
+    died or the server restarted) is claimed again by the next worker,
+    so no job is lost across restarts.
+    
+    Finished jobs are kept for ``retention`` seconds; the workers purge
+    older ones every PURGE_INTERVAL seconds.
+    
+    Args:
+        db_path (str): SQLite database file
+        store (ContentStore): Store the jobs' files live in
+        workers (int): Worker threads started by start()
+        stale_after (float): Seconds without a heartbeat before a running
+            job is considered abandoned
+        retention (float): Seconds finished jobs are kept (0 = forever)
+    """
+    
+    POLL_INTERVAL = 1.0
+    HEARTBEAT_INTERVAL = 0.5
+    PURGE_INTERVAL = 600
+    
+    def __init__(self, db_path, store, workers=2, stale_after=30, retention=7 * 24 * 3600):
+        super().__init__(db_path)
+        self.store = store
+        self.workers = workers
+        self.stale_after = stale_after
+        self.retention = retention
+        self._last_purge = 0.0
+        self._threads = []
+        self._stop = threading.Event()
+        self._wakeup = threading.Condition()
+        self._start_lock = threading.Lock()
+    
+    def _setup(self, conn):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                type TEXT NOT NULL,
+                params TEXT NOT NULL,
+                status TEXT NOT NULL,
+                created REAL NOT NULL,
+                started REAL,
+                finished REAL,
+                heartbeat REAL,
+                total_bytes INTEGER,
+                processed_bytes INTEGER NOT NULL DEFAULT 0,
+                result TEXT,
+                error TEXT
+            )""")
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created)")
+    
+    # -- client side --
+    
+    def submit(self, job_type, params):
+        """
+        Queue a job.
+        
+        Args:
+            job_type (str): 'hash' or 'verify'
+            params (dict): filename, plus expected_hash for verify jobs and
+                optionally algorithms (list of extra digests)
+        
+        Returns:
+            str: Job ID
+        
+        Raises:
+            JobError: If the job is invalid or the file is not stored
+        """
+        if job_type not in JOB_TYPES:
+            raise JobError(f"Unknown job type: {job_type} (use {', '.join(JOB_TYPES)})")
+        filename = params.get('filename')
+        if not filename:
+            raise JobError('Missing filename')
+        if not isinstance(filename, str):
+            raise JobError('filename must be a string')
+        expected_hash = params.get('expected_hash')
+        if expected_hash is not None and not isinstance(expected_hash, str):
+            raise JobError('expected_hash must be a string')
+        if job_type == 'verify' and not expected_hash:
+            raise JobError('Missing expected_hash')
+        algorithms = params.get('algorithms') or []
+        if not isinstance(algorithms, list) or not all(isinstance(a, str) for a in algorithms):
+            raise JobError('algorithms must be a list of strings')
+        try:
+            algorithms = parse_algorithms(','.join(algorithms))
+        except ValueError as e:
+            raise JobError(str(e))
+        ref = self.store.resolve(filename)
+        if ref is None:
+            raise JobError('File not found', 404)
+        
+        job_id = uuid.uuid4().hex
+        params = {'filename': filename, 'algorithms': algorithms,
+                  'expected_hash': (expected_hash or '').strip().lower() or None}
+        with self._connect() as conn:
+            conn.execute("INSERT INTO jobs (id, type, params, status, created, total_bytes) "
+                         "VALUES (?, ?, ?, 'queued', ?, ?)",
+                         (job_id, job_type, json.dumps(params), time.time(), ref['size']))
+        with self._wakeup:
+            self._wakeup.notify()
+        return job_id
+    
+    def get(self, job_id):
+        """
+        Return a job's state, or None if there is no such job.
+        
+        Returns:
+            dict: id, type, status, params, bytes processed/total, percent,
+                rate and ETA while running, and the result or error
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT id, type, params, status, created, started, finished, "
+                               "total_bytes, processed_bytes, result, error FROM jobs WHERE id = ?",
+                               (job_id,)).fetchone()
+        if row is None:
+            return None
+        (job_id, job_type, params, status, created, started, finished,
+         total, processed, result, error) = row
+        job = {
+            'id': job_id, 'type': job_type, 'status': status, 'params': json.loads(params),
+            'created': datetime.fromtimestamp(created).isoformat(),
+            'total_bytes': total, 'processed_bytes': processed,
+            'percent': round(100.0 * processed / total, 1) if total else 100.0,
+            'result': json.loads(result) if result else None, 'error': error
+        }
+        if started:
+            job['started'] = datetime.fromtimestamp(started).isoformat()
+            elapsed = (finished or time.time()) - started
+            if status == 'running' and processed and elapsed > 0:
+                job['bytes_per_sec'] = processed / elapsed
+                job['eta_seconds'] = round((total - processed) / job['bytes_per_sec'], 1)
+        if finished:
+            job['finished'] = datetime.fromtimestamp(finished).isoformat()
+        return job
+    
+    def cancel(self, job_id):
+        """
+        Cancel a queued or running job.
+        
+        Returns:
+            bool: False if the job does not exist or has already finished
+        """
+        with self._connect() as conn:
+            cursor = conn.execute("UPDATE jobs SET status = 'cancelled', finished = ? "
+                                  "WHERE id = ? AND status IN ('queued', 'running')",
+                                  (time.time(), job_id))
+        return cursor.rowcount == 1
+    
+    def counts(self):
+        """Return the number of jobs per status."""
+        with self._connect() as conn:
+            return dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"))
+    
+    def purge(self, older_than=None):
+        """
+        Delete finished jobs.
+        
+        Args:
+            older_than (float): Seconds since finishing (default: retention)
+        
+        Returns:
+            int: Number of jobs deleted
+        """
+        cutoff = time.time() - (self.retention if older_than is None else older_than)
+        with self._connect() as conn:
+            cursor = conn.execute("DELETE FROM jobs WHERE status IN ('done', 'failed', 'cancelled') "
+                                  "AND finished < ?", (cutoff,))
+        return cursor.rowcount
+    
+    # -- worker side --
+    
+    def claim(self):
+        """
+        Take the oldest queued (or abandoned) job and mark it running.
+        
+        Returns:
+            tuple: (job_id, type, params dict), or None if there is no work
+        """
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            # BEGIN IMMEDIATE takes the write lock, so two workers (or two
+            # processes) can never claim the same job
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT id, type, params FROM jobs WHERE status = 'queued' "
+                               "OR (status = 'running' AND heartbeat < ?) "
+                               "ORDER BY created LIMIT 1", (now - self.stale_after,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE jobs SET status = 'running', started = ?, heartbeat = ?, "
+                         "processed_bytes = 0 WHERE id = ?", (now, now, row[0]))
+        return row[0], row[1], json.loads(row[2])
+    
+    def run_job(self, job_id, job_type, params):
+        """Run one claimed job and store its result."""
+        try:
+            result = self._execute(job_id, job_type, params)
+        except JobCancelled:
+            return
+        except Exception as e:
+            with self._connect() as conn:
+                conn.execute("UPDATE jobs SET status = 'failed', error = ?, finished = ? "
+                             "WHERE id = ? AND status = 'running'", (str(e), time.time(), job_id))
+            return
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET status = 'done', result = ?, finished = ?, "
+                         "processed_bytes = total_bytes WHERE id = ? AND status = 'running'",
+                         (json.dumps(result), time.time(), job_id))
+    
+    def _execute(self, job_id, job_type, params):
+        ref = self.store.resolve(params['filename'])
+        if ref is None:
+            raise FileNotFoundError(f"File not found: {params['filename']}")
+        
+        hasher = MultiHasher(params['algorithms'])
+        progress = {'bytes': 0, 'cancelled': False}
+        
+        hasher_update = admitted_update(hasher.update)
+        
+        def update(block):
+            if progress['cancelled']:
+                raise JobCancelled(job_id)
+            hasher_update(block)
+            progress['bytes'] += len(block)
+        
+        start = time.perf_counter()
+        with self._heartbeating(job_id, progress):
+            size = feed_file(ref['path'], update)
+        record_hash(size, time.perf_counter() - start)
+        
+        digests = hasher.hexdigests()
+        hash_catalog.record(digests['sha256'], size, params['filename'])
+        result = {'filename': params['filename'], 'hash': digests['sha256'], 'size': size}
+        if len(params['algorithms']) > 1:
+            result['digests'] = digests
+        if job_type == 'verify':
+            result['expected_hash'] = params['expected_hash']
+            result['verified'] = digests['sha256'] == params['expected_hash']
+        return result
+    
+    @contextmanager
+    def _heartbeating(self, job_id, progress):
+        # Write progress every HEARTBEAT_INTERVAL from a separate thread,
+        # however long the job is stuck on one block
+        done = threading.Event()
+        
+        def beat():
+            while not done.wait(self.HEARTBEAT_INTERVAL):
+                try:
+                    self._heartbeat(job_id, progress['bytes'])
+                except JobCancelled:
+                    progress['cancelled'] = True
+                    return
+                except sqlite3.Error as e:
+                    print(f"job queue error: {e}", file=sys.stderr)
+        
+        thread = threading.Thread(target=beat, name='sha256-job-heartbeat', daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            done.set()
+            thread.join()
+        if progress['cancelled']:
+            raise JobCancelled(job_id)
+    
+    def _heartbeat(self, job_id, processed):
+        with self._connect() as conn:
+            cursor = conn.execute("UPDATE jobs SET processed_bytes = ?, heartbeat = ? "
+                                  "WHERE id = ? AND status = 'running'",
+                                  (processed, time.time(), job_id))
+        if cursor.rowcount == 0:
+            raise JobCancelled(job_id)
+    
+    def _worker(self):
+        while not self._stop.is_set():
+            if self.retention and time.monotonic() - self._last_purge >= self.PURGE_INTERVAL:
+                self._last_purge = time.monotonic()
+                try:
+                    self.purge()
+                except sqlite3.Error as e:
+                    print(f"job queue error: {e}", file=sys.stderr)
+            try:
+                job = self.claim()
+            except sqlite3.Error as e:
+                print(f"job queue error: {e}", file=sys.stderr)
+                job = None
+            if job is None:
+                with self._wakeup:
+                    self._wakeup.wait(self.POLL_INTERVAL)
+                continue
+            self.run_job(*job)
+    
+    def start(self, workers=None):
+        """Start the worker threads (once; later calls do nothing)."""
+        with self._start_lock:
+            if self._threads:
+                return
+            self._stop.clear()
+            for i in range(workers if workers is not None else self.workers):
+                thread = threading.Thread(target=self._worker, name=f'sha256-job-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+    
+    def stop(self, timeout=None):
+        """Stop the workers after their current jobs."""
+        self._stop.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+    
+    @property
+    def running(self):
+        return bool(self._threads)
+
+
+job_queue = JobQueue(os.path.join(UPLOAD_FOLDER, 'jobs.db'), content_store,
+                     workers=app.config['JOB_WORKERS'],
+                     retention=app.config['JOB_RETENTION'])
+
+
+# Request hook (registered in routes.py)
+
+def _start_job_workers():
+    # Started with the first request rather than at import, so scripts
+    # that import this module do not get worker threads
+    if app.config['JOB_WORKERS'] and not job_queue.running:
+        job_queue.start()
@@ -0,0 +1,330 @@
+"""
+Directory tree manifests and bulk verification of stored files.
+
+Trees are hashed in parallel (processes or threads) into a manifest that
+verify_manifest() checks later; read_stored_manifest() and
+verify_stored_entry() do the same for files in the content store.
+"""
+
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from .hashing import _bounded_map, calculate_sha256, verify_file_integrity
+from .store import content_store
+
+MANIFEST_HEADER = '# sha256-manifest v1\n'
+MANIFEST_ESCAPES = {'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'}
+MANIFEST_UNESCAPES = {'\\': '\\', 't': '\t', 'n': '\n', 'r': '\r'}
+
+
+def _escape_manifest_path(path):
+    return ''.join(MANIFEST_ESCAPES.get(ch, ch) for ch in path)
+
+
+def _unescape_manifest_path(text):
+    if '\\' not in text:
+        return text
+    out = []
+    chars = iter(text)
+    for ch in chars:
+        out.append(MANIFEST_UNESCAPES.get(next(chars, ''), '') if ch == '\\' else ch)
+    return ''.join(out)
+
+
+def iter_tree_files(root):
+    """
+    Walk a directory tree and yield every regular file in it.
+    
+    Uses os.scandir so the stat information comes from the directory
+    listing where the OS provides it. Symlinks are not followed.
+    
+    Args:
+        root (str): Directory to walk
+    
+    Yields:
+        tuple: (path relative to root, size in bytes, mtime in nanoseconds)
+    """
+    stack = ['']
+    while stack:
+        rel_dir = stack.pop()
+        try:
+            entries = sorted(os.scandir(os.path.join(root, rel_dir)), key=lambda e: e.name)
+        except OSError as e:
+            print(f"warning: cannot list {os.path.join(root, rel_dir)}: {e}", file=sys.stderr)
+            continue
+        subdirs = []
+        for entry in entries:
+            rel_path = os.path.join(rel_dir, entry.name) if rel_dir else entry.name
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(rel_path)
+                elif entry.is_file(follow_symlinks=False):
+                    st = entry.stat(follow_symlinks=False)
+                    yield rel_path, st.st_size, st.st_mtime_ns
+            except OSError as e:
+                print(f"warning: cannot stat {rel_path}: {e}", file=sys.stderr)
+        # Reversed so subdirectories are visited in name order
+        stack.extend(reversed(subdirs))
+
+
+def _hash_tree_entry(root, rel_path, size, mtime_ns):
+    """Pool worker for hash_tree(): returns (hash, error) for one file."""
+    try:
+        return calculate_sha256(os.path.join(root, rel_path)), None
+    except OSError as e:
+        return None, str(e)
+
+
+def _make_tree_executor(workers, use_processes):
+    if use_processes:
+        return ProcessPoolExecutor(max_workers=workers)
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix='sha256-tree')
+
+
+def hash_tree(root, workers=None, use_processes=True, exclude=()):
+    """
+    Hash every file under a directory in parallel.
+    
+    Args:
+        root (str): Directory to hash
+        workers (int): Number of pool workers (default: CPU count)
+        use_processes (bool): Use a process pool (True) or a thread pool
+        exclude (set): Relative paths to leave out
+    
+    Yields:
+        tuple: (relative path, size, mtime_ns, sha256 hex or None, error or None)
+    """
+    workers = workers or os.cpu_count() or 1
+    files = ((root, rel_path, size, mtime_ns)
+             for rel_path, size, mtime_ns in iter_tree_files(root)
+             if rel_path not in exclude)
+    
+    with _make_tree_executor(workers, use_processes) as executor:
+        for (_, rel_path, size, mtime_ns), (file_hash, error) in _bounded_map(
+                executor, _hash_tree_entry, files, workers * 4):
+            yield rel_path, size, mtime_ns, file_hash, error
+
+
+def _manifest_self_path(root, stream):
+    """Return {path of the manifest file relative to root}, or an empty set."""
+    name = getattr(stream, 'name', None)
+    if not isinstance(name, str):
+        return set()
+    return {os.path.relpath(os.path.abspath(name), os.path.abspath(root))}
+
+
+def write_manifest(root, out, workers=None, use_processes=True):
+    """
+    Hash a directory tree and write a manifest as results arrive.
+    
+    Manifest format (one file per line, tab separated, UTF-8):
+        sha256  size  mtime_ns  path
+    
+    Paths are relative to root, with backslash, tab and newline escaped.
+    The first line is a version header. If ``out`` is a file inside the
+    tree, it is left out of the manifest.
+    
+    Args:
+        root (str): Directory to hash
+        out: Text stream to write the manifest to
+        workers (int): Number of pool workers
+        use_processes (bool): Use a process pool (True) or a thread pool
+    
+    Returns:
+        dict: Counts of files hashed, bytes hashed and errors
+    """
+    stats = {'files': 0, 'bytes': 0, 'errors': 0}
+    out.write(MANIFEST_HEADER)
+    exclude = _manifest_self_path(root, out)
+    for rel_path, size, mtime_ns, file_hash, error in hash_tree(root, workers, use_processes,
+                                                                 exclude):
+        if error:
+            print(f"error: {rel_path}: {error}", file=sys.stderr)
+            stats['errors'] += 1
+            continue
+        out.write(f"{file_hash}\t{size}\t{mtime_ns}\t{_escape_manifest_path(rel_path)}\n")
+        stats['files'] += 1
+        stats['bytes'] += size
+    return stats
+
+
+def read_manifest(manifest):
+    """
+    Parse a manifest written by write_manifest().
+    
+    Args:
+        manifest: Text stream positioned at the start of the manifest
+    
+    Yields:
+        tuple: (relative path, size, mtime_ns, sha256 hex)
+    """
+    for line_no, line in enumerate(manifest, 1):
+        line = line.rstrip('\n')
+        if not line or line.startswith('#'):
+            continue
+        try:
+            file_hash, size, mtime_ns, path = line.split('\t', 3)
+            yield _unescape_manifest_path(path), int(size), int(mtime_ns), file_hash
+        except ValueError:
+            raise ValueError(f"Malformed manifest line {line_no}: {line!r}")
+
+
+def _verify_tree_entry(root, rel_path, size, expected_hash):
+    """Pool worker for verify_manifest(): returns (status, detail) for one file."""
+    file_path = os.path.join(root, rel_path)
+    try:
+        # A size change is a mismatch without reading a single byte
+        if os.stat(file_path).st_size != size:
+            return 'MISMATCH', 'size changed'
+        if not verify_file_integrity(file_path, expected_hash):
+            return 'MISMATCH', 'hash changed'
+        return 'OK', None
+    except FileNotFoundError:
+        return 'MISSING', None
+    except OSError as e:
+        return 'ERROR', str(e)
+
+
+def verify_manifest(root, manifest, workers=None, use_processes=True, report=None):
+    """
+    Check a directory tree against a manifest.
+    
+    Every problem is written to ``report`` as one tab-separated line:
+    status, path and (for mismatches and errors) a short detail. Once
+    the manifest is checked, the tree is walked for files it does not
+    list, which are reported as EXTRA (the manifest file itself is
+    skipped if it lives inside the tree).
+    
+    Args:
+        root (str): Directory the manifest paths are relative to
+        manifest: Text stream with the manifest
+        workers (int): Number of pool workers
+        use_processes (bool): Use a process pool (True) or a thread pool
+        report: Text stream for problem lines (default: stdout)
+    
+    Returns:
+        dict: Counts per status (OK, MISSING, MISMATCH, ERROR, EXTRA)
+    """
+    workers = workers or os.cpu_count() or 1
+    report = report or sys.stdout
+    stats = {'OK': 0, 'MISSING': 0, 'MISMATCH': 0, 'ERROR': 0, 'EXTRA': 0}
+    listed = _manifest_self_path(root, manifest)
+    
+    def entries():
+        for rel_path, size, _, file_hash in read_manifest(manifest):
+            listed.add(os.path.normpath(rel_path))
+            yield root, rel_path, size, file_hash
+    
+    def problem(status, rel_path, detail=None):
+        fields = [status, _escape_manifest_path(rel_path)] + ([detail] if detail else [])
+        report.write('\t'.join(fields) + '\n')
+    
+    with _make_tree_executor(workers, use_processes) as executor:
+        for (_, rel_path, _, _), (status, detail) in _bounded_map(
+                executor, _verify_tree_entry, entries(), workers * 4):
+            stats[status] += 1
+            if status != 'OK':
+                problem(status, rel_path, detail)
+    
+    for rel_path, _, _ in iter_tree_files(root):
+        if rel_path not in listed:
+            stats['EXTRA'] += 1
+            problem('EXTRA', rel_path)
+    return stats
+
+
+def read_stored_manifest(lines):
+    """
+    Parse a list of stored filenames and their expected hashes.
+    
+    Each line is either a JSON object or sha256sum output:
+        {"filename": "a.txt", "hash": "<sha256>", "size": 123}
+        <sha256>  a.txt
+    
+    "size" is optional; a number in a string ("123") is accepted, anything
+    else that is not a non-negative integer makes the line malformed.
+    Blank lines and lines starting with '#' are skipped. Malformed lines
+    are yielded with the error instead of raising, so one bad line does
+    not abort a long audit.
+    
+    Args:
+        lines: Iterable of lines (bytes or str)
+    
+    Yields:
+        tuple: (line number, filename, expected sha256, size or None, error or None)
+    """
+    for line_no, line in enumerate(lines, 1):
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', 'replace')
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        try:
+            if line.startswith('{'):
+                entry = json.loads(line)
+                filename, expected_hash = entry['filename'], entry['hash']
+                size = entry.get('size')
+                if size is not None:
+                    size = _manifest_size(size)
+                    if size is None:
+                        yield (line_no, None, None, None,
+                               f"Malformed manifest line {line_no}: size must be a "
+                               f"non-negative integer, got {entry['size']!r}")
+                        continue
+            else:
+                expected_hash, filename = line.split(None, 1)
+                filename = filename[1:] if filename.startswith('*') else filename
+                size = None
+            yield line_no, filename, str(expected_hash).strip().lower(), size, None
+        except (ValueError, KeyError, TypeError, AttributeError):
+            yield line_no, None, None, None, f"Malformed manifest line {line_no}"
+
+
+def _manifest_size(value):
+    """Return a manifest size as an int, or None if it is not a valid one."""
+    # bool is an int subclass, and int() would truncate 12.5 or accept "1_0"
+    if isinstance(value, int) and not isinstance(value, bool):
+        size = value
+    elif isinstance(value, str) and value.strip().isascii() and value.strip().isdigit():
+        size = int(value)
+    else:
+        return None
+    return size if size >= 0 else None
+
+
+def verify_stored_entry(line_no, filename, expected_hash, size, error):
+    """
+    Check one stored file against its expected hash.
+    
+    Pool worker for the bulk verification route; takes the tuples from
+    read_stored_manifest().
+    
+    Returns:
+        dict: line, filename, status (OK, MISSING, MISMATCH, ERROR) and,
+            unless OK, a detail
+    """
+    result = {'line': line_no, 'filename': filename, 'status': 'OK'}
+    if error:
+        return dict(result, status='ERROR', detail=error)
+    
+    ref = content_store.resolve(filename)
+    if ref is None:
+        return dict(result, status='MISSING')
+    
+    # Blobs are named by content, so a different recorded hash or size is
+    # a mismatch without reading a single byte
+    if ref['sha256'] != expected_hash:
+        return dict(result, status='MISMATCH', detail='stored content differs',
+                    actual=ref['sha256'])
+    if size is not None and ref['size'] != size:
+        return dict(result, status='MISMATCH', detail='size differs', actual_size=ref['size'])
+    try:
+        if not verify_file_integrity(ref['path'], expected_hash):
+            return dict(result, status='MISMATCH', detail='stored data corrupted')
+    except FileNotFoundError:
+        return dict(result, status='MISSING', detail='blob missing')
+    except OSError as e:
+        return dict(result, status='ERROR', detail=str(e))
+    return result
@@ -0,0 +1,178 @@
+"""
+Merkle-tree chunked hashing and partial verification.
+"""
+
+import os
+import time
+
+from .config import app
+from .metrics import record_hash
+from .backends import new_hash
+from .hashing import _bounded_map, get_hash_executor
+
+# Leaves and inner nodes are hashed with different prefixes (as in
+# RFC 6962) so a leaf can never be passed off as an inner node.
+MERKLE_CHUNK_SIZE = 4 * 1024 * 1024   # 4MB leaves
+MERKLE_MIN_CHUNK_SIZE = 4096
+MERKLE_MAX_CHUNK_SIZE = 64 * 1024 * 1024
+MERKLE_LEAF_PREFIX = b'\x00'
+MERKLE_NODE_PREFIX = b'\x01'
+
+
+def merkle_leaf_hash(chunk):
+    """Return the hex leaf hash of one chunk of data."""
+    leaf = new_hash('sha256', MERKLE_LEAF_PREFIX)
+    leaf.update(chunk)
+    return leaf.hexdigest()
+
+
+def merkle_root(leaf_hashes):
+    """
+    Combine leaf hashes into a Merkle root.
+    
+    Pairs of nodes are hashed together level by level; an odd node at
+    the end of a level is carried up unchanged.
+    
+    Args:
+        leaf_hashes (list): Hex leaf hashes in chunk order
+    
+    Returns:
+        str: Hex root hash (the leaf hash of empty data for an empty list)
+    """
+    if not leaf_hashes:
+        return merkle_leaf_hash(b'')
+    level = [bytes.fromhex(h) for h in leaf_hashes]
+    while len(level) > 1:
+        next_level = [
+            new_hash('sha256', MERKLE_NODE_PREFIX + level[i] + level[i + 1]).digest()
+            for i in range(0, len(level) - 1, 2)
+        ]
+        if len(level) % 2:
+            next_level.append(level[-1])
+        level = next_level
+    return level[0].hex()
+
+
+def _hash_file_chunk(fd, index, chunk_size):
+    """Pool worker: leaf hash of chunk ``index`` using a positioned read."""
+    return merkle_leaf_hash(os.pread(fd, chunk_size, index * chunk_size))
+
+
+def merkle_chunk_hashes(file_path, chunk_size=MERKLE_CHUNK_SIZE, indices=None):
+    """
+    Hash chunks of a file independently, in parallel.
+    
+    Each chunk is read with os.pread(), so the workers share one file
+    descriptor and never seek.
+    
+    Args:
+        file_path (str): Path to the file
+        chunk_size (int): Bytes per chunk
+        indices (iterable): Chunk numbers to hash (default: all of them)
+    
+    Returns:
+        list: Hex leaf hashes, in the order of ``indices``
+    """
+    fd = os.open(file_path, os.O_RDONLY)
+    try:
+        if indices is None:
+            file_size = os.fstat(fd).st_size
+            indices = range(max(1, -(-file_size // chunk_size)))
+        executor = get_hash_executor()
+        tasks = ((fd, index, chunk_size) for index in indices)
+        start = time.perf_counter()
+        leaves = [leaf for _, leaf in _bounded_map(
+            executor, _hash_file_chunk, tasks, app.config['HASH_WORKERS'] * 2)]
+        record_hash(min(len(leaves) * chunk_size, os.fstat(fd).st_size), time.perf_counter() - start)
+        return leaves
+    finally:
+        os.close(fd)
+
+
+def merkle_chunk_hashes_from_stream(stream, chunk_size=MERKLE_CHUNK_SIZE):
+    """
+    Hash chunks of a stream in parallel, plus its flat SHA-256.
+    
+    The stream is read once, sequentially. Each chunk is handed to the
+    thread pool for its leaf hash while the flat SHA-256 is updated on
+    the calling thread, so both come out of the same read.
+    
+    Args:
+        stream: Readable binary file-like object
+        chunk_size (int): Bytes per chunk
+    
+    Returns:
+        tuple: (list of hex leaf hashes, flat SHA-256 hex, size in bytes)
+    """
+    sha256_hash = new_hash()
+    size = 0
+    
+    def chunks():
+        nonlocal size
+        for chunk in iter(lambda: stream.read(chunk_size), b""):
+            sha256_hash.update(chunk)
+            size += len(chunk)
+            yield (chunk,)
+    
+    executor = get_hash_executor()
+    start = time.perf_counter()
+    leaves = [leaf for _, leaf in _bounded_map(
+        executor, merkle_leaf_hash, chunks(), app.config['HASH_WORKERS'] * 2)]
+    record_hash(size, time.perf_counter() - start)
+    if not leaves:
+        leaves = [merkle_leaf_hash(b'')]
+    return leaves, sha256_hash.hexdigest(), size
+
+
+def calculate_merkle_tree(file_path, chunk_size=MERKLE_CHUNK_SIZE):
+    """
+    Calculate the Merkle tree of a file.
+    
+    This is an alternative to calculate_sha256(): chunks are hashed on
+    all cores, and the chunk hashes let a later check pinpoint which part
+    of the file is damaged.
+    
+    Args:
+        file_path (str): Path to the file
+        chunk_size (int): Bytes per chunk
+    
+    Returns:
+        dict: root, chunk_size, size and the list of chunk hashes
+    """
+    chunks = merkle_chunk_hashes(file_path, chunk_size)
+    return {
+        'root': merkle_root(chunks),
+        'chunk_size': chunk_size,
+        'size': os.path.getsize(file_path),
+        'chunks': chunks
+    }
+
+
+def chunks_for_range(offset, length, chunk_size=MERKLE_CHUNK_SIZE):
+    """Return the chunk numbers that cover ``length`` bytes from ``offset``."""
+    if length <= 0:
+        return range(0)
+    return range(offset // chunk_size, (offset + length - 1) // chunk_size + 1)
+
+
+def verify_merkle_chunks(file_path, chunk_hashes, chunk_size=MERKLE_CHUNK_SIZE, indices=None):
+    """
+    Re-check selected chunks of a file against known chunk hashes.
+    
+    Only the selected chunks are read, so checking a damaged region does
+    not require reading the whole file.
+    
+    Args:
+        file_path (str): Path to file to check
+        chunk_hashes (list): Expected hex leaf hashes for every chunk
+        chunk_size (int): Bytes per chunk the hashes were made with
+        indices (iterable): Chunk numbers to check (default: all)
+    
+    Returns:
+        list: Chunk numbers whose hash does not match
+    """
+    if indices is None:
+        indices = range(len(chunk_hashes))
+    indices = [i for i in indices if 0 <= i < len(chunk_hashes)]
+    actual = merkle_chunk_hashes(file_path, chunk_size, indices)
+    return [i for i, leaf in zip(indices, actual) if leaf != chunk_hashes[i].lower()]
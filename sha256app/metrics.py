@@ -0,0 +1,309 @@
+"""
+Prometheus metrics and the request hooks that record them.
+"""
+
+from flask import g, request
+import bisect
+import fcntl
+import json
+import os
+import threading
+import time
+import weakref
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = tuple(1024 * 4 ** i for i in range(11))             # 1KB .. 1GB
+RATE_BUCKETS = tuple(1024 ** 2 * 2 ** i for i in range(14))         # 1MB/s .. 8GB/s
+
+
+class Metrics:
+    """
+    Low-overhead metrics with Prometheus text output.
+    
+    Every thread records into its own shard (plain dicts), so the hot
+    path takes no locks. Shards are only summed when /metrics is
+    scraped. Shards of threads that have exited are folded into one
+    retired shard at scrape time, so per-request threads do not pile up.
+    
+    A server with several processes shares one directory between them
+    (enable_multiprocess()), in the spirit of prometheus_client's
+    multiprocess mode: every process writes its totals to <pid>.json in
+    it about once a second, and a scrape of any process sums the files
+    of all of them. Counters and histograms of processes that have
+    exited are folded into archive.json so totals never go backwards;
+    their gauges are dropped.
+    
+    Usage:
+        metrics.describe('jobs_total', 'counter', 'Jobs run')
+        metrics.inc('jobs_total', (('kind', 'hash'),))
+        metrics.observe('job_seconds', 0.42)
+    """
+    
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []                 # (weakref to thread, shard)
+        self._retired = self._new_shard()
+        self._meta = {}                   # name -> (type, help, buckets)
+        self._scrape_lock = threading.Lock()
+        self.multiprocess_dir = None
+    
+    @staticmethod
+    def _new_shard():
+        return {'counters': {}, 'histograms': {}}
+    
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = self._new_shard()
+            # list.append is atomic, so registering needs no lock either
+            self._shards.append((weakref.ref(threading.current_thread()), shard))
+        return shard
+    
+    def describe(self, name, metric_type, help_text, buckets=None):
+        """Register a metric's type, help text and (for histograms) buckets."""
+        self._meta[name] = (metric_type, help_text, buckets)
+    
+    def inc(self, name, labels=(), value=1):
+        """Add ``value`` to a counter (or gauge)."""
+        counters = self._shard()['counters']
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + value
+    
+    def observe(self, name, value, labels=()):
+        """Record one observation in a histogram."""
+        histograms = self._shard()['histograms']
+        key = (name, labels)
+        entry = histograms.get(key)
+        if entry is None:
+            entry = histograms[key] = [[0] * (len(self._meta[name][2]) + 1), 0.0, 0]
+        entry[0][bisect.bisect_left(self._meta[name][2], value)] += 1
+        entry[1] += value
+        entry[2] += 1
+    
+    @staticmethod
+    def _merge(into, shard):
+        for key, value in list(shard['counters'].items()):
+            into['counters'][key] = into['counters'].get(key, 0) + value
+        for key, (buckets, total, count) in list(shard['histograms'].items()):
+            entry = into['histograms'].get(key)
+            if entry is None:
+                into['histograms'][key] = [list(buckets), total, count]
+            else:
+                entry[0] = [a + b for a, b in zip(entry[0], buckets)]
+                entry[1] += total
+                entry[2] += count
+    
+    def snapshot(self):
+        """Sum all shards into one {'counters': ..., 'histograms': ...} dict."""
+        with self._scrape_lock:
+            live = []
+            for thread_ref, shard in self._shards:
+                if thread_ref() is None or not thread_ref().is_alive():
+                    self._merge(self._retired, shard)
+                else:
+                    live.append((thread_ref, shard))
+            self._shards[:] = live
+            total = self._new_shard()
+            self._merge(total, self._retired)
+            for _, shard in live:
+                self._merge(total, shard)
+            return total
+    
+    # Seconds between writes of a process's totals to the shared directory
+    FLUSH_INTERVAL = 1.0
+    ARCHIVE = 'archive.json'
+    
+    def enable_multiprocess(self, directory):
+        """
+        Share metrics with the other server processes through ``directory``.
+        
+        Called in each server process once it is started. Anything the
+        process inherited from its parent is dropped first, so it is not
+        counted twice.
+        """
+        with self._scrape_lock:
+            self._local = threading.local()
+            self._shards = []
+            self._retired = self._new_shard()
+        self.multiprocess_dir = directory
+        os.makedirs(directory, exist_ok=True)
+        
+        def flush_loop():
+            while True:
+                time.sleep(self.FLUSH_INTERVAL)
+                self.flush()
+        
+        threading.Thread(target=flush_loop, daemon=True, name='sha256-metrics').start()
+    
+    @staticmethod
+    def _dump(shard):
+        return {
+            'counters': [[name, labels, value] for (name, labels), value in shard['counters'].items()],
+            'histograms': [[name, labels, entry] for (name, labels), entry in shard['histograms'].items()]
+        }
+    
+    @staticmethod
+    def _load(data):
+        def key(name, labels):
+            return name, tuple(tuple(label) for label in labels)
+        return {
+            'counters': {key(name, labels): value for name, labels, value in data['counters']},
+            'histograms': {key(name, labels): entry for name, labels, entry in data['histograms']}
+        }
+    
+    def _write(self, path, shard):
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self._dump(shard), f)
+        os.replace(tmp_path, path)
+    
+    def flush(self, snap=None):
+        """Write this process's totals to the shared directory."""
+        if self.multiprocess_dir is None:
+            return
+        self._write(os.path.join(self.multiprocess_dir, f'{os.getpid()}.json'),
+                    snap if snap is not None else self.snapshot())
+    
+    def collect(self):
+        """
+        Sum the totals of every server process.
+        
+        Without a shared directory this is snapshot(). Otherwise this
+        process's own totals are current and the others' are at most
+        FLUSH_INTERVAL old.
+        """
+        own = self.snapshot()
+        directory = self.multiprocess_dir
+        if directory is None:
+            return own
+        self.flush(own)
+        
+        total = self._new_shard()
+        archive_path = os.path.join(directory, self.ARCHIVE)
+        with open(os.path.join(directory, '.lock'), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            archive = self._new_shard()
+            if os.path.exists(archive_path):
+                with open(archive_path) as f:
+                    archive = self._load(json.load(f))
+            archived = False
+            for name in os.listdir(directory):
+                pid = name[:-len('.json')]
+                if not name.endswith('.json') or not pid.isdigit():
+                    continue
+                if int(pid) == os.getpid():
+                    self._merge(total, own)
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    with open(path) as f:
+                        shard = self._load(json.load(f))
+                except (OSError, ValueError):
+                    continue
+                if _pid_alive(int(pid)):
+                    self._merge(total, shard)
+                else:
+                    shard['counters'] = {key: value for key, value in shard['counters'].items()
+                                         if self._meta.get(key[0], ('counter',))[0] != 'gauge'}
+                    self._merge(archive, shard)
+                    os.remove(path)
+                    archived = True
+            if archived:
+                self._write(archive_path, archive)
+        self._merge(total, archive)
+        return total
+    
+    @staticmethod
+    def _format_labels(labels):
+        if not labels:
+            return ''
+        escaped = (f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+                   for k, v in labels)
+        return '{' + ','.join(escaped) + '}'
+    
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format."""
+        snap = self.collect()
+        lines = []
+        for name, (metric_type, help_text, buckets) in self._meta.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            if metric_type == 'histogram':
+                for (key_name, labels), (counts, total, count) in sorted(snap['histograms'].items()):
+                    if key_name != name:
+                        continue
+                    cumulative = 0
+                    for bound, bucket_count in zip(buckets + (float('inf'),), counts):
+                        cumulative += bucket_count
+                        le = '+Inf' if bound == float('inf') else repr(bound)
+                        lines.append(f"{name}_bucket{self._format_labels(labels + (('le', le),))} {cumulative}")
+                    lines.append(f"{name}_sum{self._format_labels(labels)} {total}")
+                    lines.append(f"{name}_count{self._format_labels(labels)} {count}")
+            else:
+                for (key_name, labels), value in sorted(snap['counters'].items()):
+                    if key_name == name:
+                        lines.append(f"{name}{self._format_labels(labels)} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+def _pid_alive(pid):
+    """True if a process with this pid exists."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+metrics = Metrics()
+metrics.describe('sha256_http_requests_total', 'counter', 'HTTP requests by route, method and status')
+metrics.describe('sha256_http_request_duration_seconds', 'histogram',
+                 'HTTP request latency by route', LATENCY_BUCKETS)
+metrics.describe('sha256_http_requests_in_flight', 'gauge', 'HTTP requests currently being served')
+metrics.describe('sha256_http_errors_total', 'counter', 'HTTP requests that failed with a 5xx status')
+metrics.describe('sha256_http_request_size_bytes', 'histogram',
+                 'Request body size by route', SIZE_BUCKETS)
+metrics.describe('sha256_bytes_hashed_total', 'counter', 'Bytes fed to SHA-256')
+metrics.describe('sha256_hash_rate_bytes_per_second', 'histogram',
+                 'Hashing throughput per hashing call', RATE_BUCKETS)
+
+
+def record_hash(nbytes, seconds):
+    """Record one hashing call of ``nbytes`` that took ``seconds``."""
+    metrics.inc('sha256_bytes_hashed_total', value=nbytes)
+    if seconds > 0 and nbytes:
+        metrics.observe('sha256_hash_rate_bytes_per_second', nbytes / seconds)
+
+
+def record_request(route, method, status, seconds, size):
+    """Record one finished HTTP request."""
+    labels = (('route', route),)
+    metrics.inc('sha256_http_requests_total', labels + (('method', method), ('status', str(status))))
+    metrics.observe('sha256_http_request_duration_seconds', seconds, labels)
+    if size:
+        metrics.observe('sha256_http_request_size_bytes', size, labels)
+    if status >= 500:
+        metrics.inc('sha256_http_errors_total', labels)
+
+
+# Request hooks (registered in routes.py)
+
+def _metrics_start_request():
+    g.metrics_start = time.perf_counter()
+    metrics.inc('sha256_http_requests_in_flight')
+
+
+def _metrics_finish_request(response):
+    if 'metrics_start' not in g:
+        return response  # An earlier before_request hook answered the request
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    record_request(route, request.method, response.status_code,
+                   time.perf_counter() - g.metrics_start, request.content_length)
+    return response
+
+
+def _metrics_teardown_request(exc):
+    if 'metrics_start' in g:
+        metrics.inc('sha256_http_requests_in_flight', value=-1)
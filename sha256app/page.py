@@ -0,0 +1,348 @@
+"""
+The web interface page.
+"""
+
+from flask import Response, request
+import gzip
+
+from .backends import new_hash
+
+try:
+    import brotli  # Optional: pip install brotli
+except ImportError:
+    brotli = None
+
+# HTML Template for the web interface
+HTML_TEMPLATE = """
+<!DOCTYPE html>
+<html>
+<head>
+    <title>SHA-256 File Integrity Checker</title>
+    <style>
+        * { margin: 0; padding: 0; box-sizing: border-box; }
+        body {
+            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
+            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            min-height: 100vh;
+            padding: 20px;
+        }
+        .container {
+            max-width: 800px;
+            margin: 0 auto;
+            background: white;
+            padding: 40px;
+            border-radius: 15px;
+            box-shadow: 0 10px 40px rgba(0,0,0,0.2);
+        }
+        h1 {
+            color: #667eea;
+            margin-bottom: 10px;
+        }
+        .subtitle {
+            color: #666;
+            margin-bottom: 30px;
+        }
+        .section {
+            margin: 30px 0;
+            padding: 20px;
+            background: #f8f9fa;
+            border-radius: 10px;
+            border-left: 4px solid #667eea;
+        }
+        .section h2 {
+            color: #333;
+            margin-bottom: 15px;
+            font-size: 20px;
+        }
+        .demo-item {
+            margin: 15px 0;
+            padding: 15px;
+            background: white;
+            border-radius: 8px;
+        }
+        .hash-display {
+            font-family: monospace;
+            font-size: 12px;
+            word-break: break-all;
+            background: #333;
+            color: #0f0;
+            padding: 10px;
+            border-radius: 5px;
+            margin-top: 5px;
+        }
+        input[type="file"] {
+            margin: 10px 0;
+            padding: 10px;
+            border: 2px solid #ddd;
+            border-radius: 5px;
+            width: 100%;
+        }
+        button {
+            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            color: white;
+            border: none;
+            padding: 12px 30px;
+            border-radius: 8px;
+            cursor: pointer;
+            font-size: 16px;
+            font-weight: 600;
+            margin-top: 10px;
+        }
+        button:hover {
+            transform: translateY(-2px);
+            box-shadow: 0 5px 15px rgba(102, 126, 234, 0.4);
+        }
+        .result {
+            margin-top: 20px;
+            padding: 15px;
+            border-radius: 8px;
+            display: none;
+        }
+        .result.success {
+            background: #d4edda;
+            border: 1px solid #c3e6cb;
+            color: #155724;
+        }
+        .result.error {
+            background: #f8d7da;
+            border: 1px solid #f5c6cb;
+            color: #721c24;
+        }
+        .badge {
+            display: inline-block;
+            padding: 5px 10px;
+            border-radius: 5px;
+            font-size: 12px;
+            font-weight: 600;
+            margin-left: 10px;
+        }
+        .badge.match {
+            background: #28a745;
+            color: white;
+        }
+        .badge.different {
+            background: #dc3545;
+            color: white;
+        }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <h1>🔐 SHA-256 File Integrity Checker</h1>
+        <p class="subtitle">Demonstration of SHA-256 hashing for file integrity verification</p>
+
+        <!-- Demo Section -->
+        <div class="section">
+            <h2>📚 How SHA-256 Works</h2>
+            <p style="margin-bottom: 15px;">SHA-256 creates a unique "fingerprint" for any data. Even tiny changes produce completely different hashes:</p>
+            
+            <div class="demo-item">
+                <strong>Original:</strong> "Hello World"
+                <div class="hash-display">2c74fd17edafd80e8447b0d46741ee243b7eb74dd2149a0ab1b9246fb30382f2</div>
+            </div>
+            
+            <div class="demo-item">
+                <strong>Added "!":</strong> "Hello World!"
+                <div class="hash-display">7f83b1657ff1fc53b92dc18148a1d65dfc2d4b1fa3d677284addd200126d9069</div>
+                <span class="badge different">Completely Different!</span>
+            </div>
+            
+            <div class="demo-item">
+                <strong>Lowercase:</strong> "hello world"
+                <div class="hash-display">b94d27b9934d3e08a52e52d7da7dabfac484efe37a5380ee9088f7ace2efcde9</div>
+                <span class="badge different">Completely Different!</span>
+            </div>
+        </div>
+
+        <!-- Upload and Hash Section -->
+        <div class="section">
+            <h2>📁 Upload File & Calculate Hash</h2>
+            <p style="margin-bottom: 15px;">Upload any file to calculate its SHA-256 hash:</p>
+            
+            <form id="uploadForm" enctype="multipart/form-data">
+                <input type="file" id="fileInput" name="file" required>
+                <button type="submit">Calculate SHA-256 Hash</button>
+            </form>
+            
+            <div id="uploadResult" class="result"></div>
+        </div>
+
+        <!-- Verify Section -->
+        <div class="section">
+            <h2>✅ Verify File Integrity</h2>
+            <p style="margin-bottom: 15px;">Upload a file and its expected hash to verify integrity:</p>
+            
+            <form id="verifyForm" enctype="multipart/form-data">
+                <input type="file" id="verifyFileInput" name="file" required>
+                <input type="text" id="expectedHash" name="expected_hash" 
+                       placeholder="Enter expected SHA-256 hash" 
+                       style="width: 100%; padding: 10px; margin: 10px 0; border: 2px solid #ddd; border-radius: 5px;">
+                <button type="submit">Verify Integrity</button>
+            </form>
+            
+            <div id="verifyResult" class="result"></div>
+        </div>
+
+        <!-- Connection to Your System -->
+        <div class="section" style="border-left-color: #28a745;">
+            <h2>🔗 How This Relates to Your Cloud Storage</h2>
+            <p style="line-height: 1.8;">
+                Your JavaScript system does this <strong>client-side</strong> (in the browser):<br><br>
+                
+                <strong>1. Upload:</strong> Calculate hash of original file → Encrypt file → Store both<br>
+                <strong>2. Download:</strong> Decrypt file → Calculate hash → Compare with stored hash<br>
+                <strong>3. Match?</strong> ✅ File is intact | ❌ File corrupted/tampered<br><br>
+                
+                This Python demo shows the <strong>same concept</strong> but on the server side!
+            </p>
+        </div>
+    </div>
+
+    <script>
+        // Handle file upload and hash calculation
+        document.getElementById('uploadForm').addEventListener('submit', async (e) => {
+            e.preventDefault();
+            
+            const formData = new FormData();
+            const fileInput = document.getElementById('fileInput');
+            formData.append('file', fileInput.files[0]);
+            
+            const resultDiv = document.getElementById('uploadResult');
+            resultDiv.style.display = 'block';
+            resultDiv.className = 'result';
+            resultDiv.innerHTML = '⏳ Calculating hash...';
+            
+            try {
+                const response = await fetch('/upload', {
+                    method: 'POST',
+                    body: formData
+                });
+                
+                const data = await response.json();
+                
+                if (data.success) {
+                    resultDiv.className = 'result success';
+                    resultDiv.innerHTML = `
+                        <strong>✅ Hash Calculated Successfully!</strong><br><br>
+                        <strong>File:</strong> ${data.filename}<br>
+                        <strong>Size:</strong> ${data.size} bytes<br>
+                        <strong>Uploaded:</strong> ${data.timestamp}<br><br>
+                        <strong>SHA-256 Hash:</strong>
+                        <div class="hash-display">${data.hash}</div>
+                        <br>
+                        <small>💡 This hash is unique to this file. If the file changes even slightly, the hash will be completely different.</small>
+                    `;
+                } else {
+                    resultDiv.className = 'result error';
+                    resultDiv.innerHTML = `❌ Error: ${data.error}`;
+                }
+            } catch (error) {
+                resultDiv.className = 'result error';
+                resultDiv.innerHTML = `❌ Upload failed: ${error.message}`;
+            }
+        });
+
+        // Handle file integrity verification
+        document.getElementById('verifyForm').addEventListener('submit', async (e) => {
+            e.preventDefault();
+            
+            const formData = new FormData();
+            const fileInput = document.getElementById('verifyFileInput');
+            const expectedHash = document.getElementById('expectedHash').value;
+            
+            formData.append('file', fileInput.files[0]);
+            formData.append('expected_hash', expectedHash);
+            
+            const resultDiv = document.getElementById('verifyResult');
+            resultDiv.style.display = 'block';
+            resultDiv.className = 'result';
+            resultDiv.innerHTML = '⏳ Verifying integrity...';
+            
+            try {
+                const response = await fetch('/verify', {
+                    method: 'POST',
+                    body: formData
+                });
+                
+                const data = await response.json();
+                
+                if (data.verified) {
+                    resultDiv.className = 'result success';
+                    resultDiv.innerHTML = `
+                        <strong>✅ FILE INTEGRITY VERIFIED!</strong><br><br>
+                        <strong>File:</strong> ${data.filename}<br>
+                        <strong>Calculated Hash:</strong><br>
+                        <div class="hash-display">${data.calculated_hash}</div>
+                        <strong>Expected Hash:</strong><br>
+                        <div class="hash-display">${data.expected_hash}</div>
+                        <br>
+                        <span class="badge match">✅ MATCH</span>
+                        <br><br>
+                        <small>✅ The file has not been modified or corrupted!</small>
+                    `;
+                } else {
+                    resultDiv.className = 'result error';
+                    resultDiv.innerHTML = `
+                        <strong>❌ INTEGRITY CHECK FAILED!</strong><br><br>
+                        <strong>File:</strong> ${data.filename}<br>
+                        <strong>Calculated Hash:</strong><br>
+                        <div class="hash-display">${data.calculated_hash}</div>
+                        <strong>Expected Hash:</strong><br>
+                        <div class="hash-display">${data.expected_hash}</div>
+                        <br>
+                        <span class="badge different">❌ NO MATCH</span>
+                        <br><br>
+                        <small>⚠️ The file may have been modified, corrupted, or the hash is incorrect!</small>
+                    `;
+                }
+            } catch (error) {
+                resultDiv.className = 'result error';
+                resultDiv.innerHTML = `❌ Verification failed: ${error.message}`;
+            }
+        });
+    </script>
+</body>
+</html>
+"""
+
+class StaticPage:
+    """
+    A fixed response body, encoded and tagged once, served from memory.
+    
+    The body is compressed with gzip (and brotli, if the ``brotli``
+    package is installed) when the page is built. Each variant gets a
+    strong ETag derived from the SHA-256 of the content, so a client that
+    already has the page gets an empty 304 response.
+    
+    Args:
+        body (str): Page content
+        mimetype (str): Content type of the page
+    """
+    
+    def __init__(self, body, mimetype='text/html'):
+        raw = body.encode('utf-8')
+        digest = new_hash('sha256', raw).hexdigest()[:32]
+        self.mimetype = mimetype
+        self.variants = {None: (raw, f'"{digest}"')}
+        self.variants['gzip'] = (gzip.compress(raw, compresslevel=9, mtime=0), f'"{digest}-gzip"')
+        if brotli is not None:
+            self.variants['br'] = (brotli.compress(raw, quality=11), f'"{digest}-br"')
+    
+    def response(self):
+        """Build the response for the current request."""
+        encoding = None
+        for candidate in ('br', 'gzip'):
+            if candidate in self.variants and request.accept_encodings[candidate]:
+                encoding = candidate
+                break
+        body, etag = self.variants[encoding]
+        
+        headers = {'ETag': etag, 'Vary': 'Accept-Encoding', 'Cache-Control': 'no-cache'}
+        if encoding:
+            headers['Content-Encoding'] = encoding
+        
+        # Only the variant this request would get; a 304 tells the client
+        # its copy is that variant, with this Content-Encoding
+        if request.if_none_match.contains(etag.strip('"')) or '*' in request.if_none_match:
+            return Response(status=304, headers=headers)
+        return Response(body, mimetype=self.mimetype, headers=headers)
@@ -0,0 +1,171 @@
+"""
+Per-phase request timing (Server-Timing header) and request profiling.
+"""
+
+from flask import g, request
+import cProfile
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+from .config import app
+
+
+@contextmanager
+def timed_phase(name):
+    """
+    Time a block of a request handler as one Server-Timing phase.
+    
+    Usage:
+        with timed_phase('store'):
+            content_store.add_stream(file.stream)
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_phase(name, time.perf_counter() - start)
+
+
+def add_phase(name, seconds):
+    """Add ``seconds`` to phase ``name`` of the current request."""
+    phases = g.setdefault('phases', {})
+    phases[name] = phases.get(name, 0.0) + seconds
+
+
+def receive_files():
+    """
+    Parse the request body and return request.files.
+    
+    Records the time as a 'receive' phase. When the files were hashed
+    while streaming in (see HashingRequest), the hashing time is split
+    out into its own 'hash' phase. Parts still being hashed on a pool
+    are waited for, so every digest is ready when this returns.
+    """
+    start = time.perf_counter()
+    files = request.files
+    streams = request.__dict__.get('hashing_streams', ())
+    for stream in streams:
+        stream.wait()
+    elapsed = time.perf_counter() - start
+    hash_seconds = sum(max(stream.hash_seconds, 0.0) for stream in streams)
+    # Parts hashed on a pool are hashed while the body is still being read
+    add_phase('receive', max(elapsed - hash_seconds, 0.0))
+    if hash_seconds:
+        add_phase('hash', hash_seconds)
+    return files
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler for slow requests.
+    
+    A single background thread samples the stacks of every thread that is
+    currently inside a request. When a request finishes, its samples can
+    be kept (it was slow) or thrown away, so there is no need to know in
+    advance which requests will be worth profiling. Samples are written
+    in the collapsed-stack format used by flamegraph tools.
+    
+    Args:
+        interval (float): Seconds between samples
+    """
+    
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self._active = {}   # thread ident -> Counter of collapsed stacks
+        self._thread = None
+    
+    def _ensure_running(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='sha256-profiler', daemon=True)
+            self._thread.start()
+    
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            if not self._active:
+                continue
+            frames = sys._current_frames()
+            for ident, samples in list(self._active.items()):
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                if stack:
+                    samples[';'.join(reversed(stack))] += 1
+    
+    def start(self):
+        """Start collecting samples for the calling thread."""
+        self._ensure_running()
+        self._active[threading.get_ident()] = Counter()
+    
+    def stop(self):
+        """Stop sampling the calling thread and return its samples."""
+        return self._active.pop(threading.get_ident(), Counter())
+
+
+sampling_profiler = SamplingProfiler()
+_profile_request_counter = itertools.count(1)
+
+
+def _profile_filename(route, elapsed, extension):
+    safe_route = ''.join(c if c.isalnum() else '_' for c in route).strip('_') or 'root'
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+    return os.path.join(app.config['PROFILE_DIR'],
+                        f"{stamp}-{safe_route}-{elapsed * 1000:.0f}ms{extension}")
+
+
+# Request hooks (registered in routes.py)
+
+def _timing_start_request():
+    g.request_start = time.perf_counter()
+    if not app.config['PROFILE_DIR']:
+        return
+    every_n = app.config['PROFILE_EVERY_N']
+    if every_n and next(_profile_request_counter) % every_n == 0:
+        g.cprofile = cProfile.Profile()
+        g.cprofile.enable()
+    elif app.config['PROFILE_SLOW_MS']:
+        sampling_profiler.start()
+        g.sampling = True
+
+
+def _timing_finish_request(response):
+    if 'request_start' not in g:
+        return response  # An earlier before_request hook answered the request
+    elapsed = time.perf_counter() - g.request_start
+    phases = g.get('phases', {})
+    timings = [f"{name};dur={seconds * 1000:.3f}" for name, seconds in phases.items()]
+    timings.append(f"total;dur={elapsed * 1000:.3f}")
+    response.headers['Server-Timing'] = ', '.join(timings)
+    
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    if 'cprofile' in g:
+        g.cprofile.disable()
+        os.makedirs(app.config['PROFILE_DIR'], exist_ok=True)
+        g.cprofile.dump_stats(_profile_filename(route, elapsed, '.prof'))
+    elif g.get('sampling'):
+        samples = sampling_profiler.stop()
+        g.sampling = False
+        if elapsed * 1000 >= app.config['PROFILE_SLOW_MS'] and samples:
+            os.makedirs(app.config['PROFILE_DIR'], exist_ok=True)
+            with open(_profile_filename(route, elapsed, '.folded'), 'w') as f:
+                for stack, count in samples.most_common():
+                    f.write(f"{stack} {count}\n")
+    return response
+
+
+def _timing_teardown_request(exc):
+    # after_request is skipped when a view raises; do not leave the
+    # thread registered with the sampler
+    if g.get('sampling'):
+        sampling_profiler.stop()
+    if 'cprofile' in g:
+        g.cprofile.disable()
@@ -0,0 +1,261 @@
+"""
+Byte-range and sampled hashing of stored files.
+
+Plain SHA-256 hashes of byte ranges of a stored file, read with
+positioned reads (or mmap for big ranges) so nothing before the range
+is touched. A file's "recorded" range hashes cover it in a fixed grid
+of range_size pieces; a sampled verification re-hashes a random few of
+them, which finds damage with high probability at a small fraction of
+the I/O of a full read.
+"""
+
+import mmap
+import os
+import random
+import time
+from datetime import datetime
+
+from .config import UPLOAD_FOLDER, app
+from .metrics import record_hash
+from .backends import new_hash
+from .database import SQLiteDatabase
+from .hashing import (HASH_BLOCK_SIZE, _bounded_map, choose_hash_strategy, feed_file,
+                      get_hash_executor)
+from .store import content_store
+
+RANGE_HASH_SIZE = 1024 * 1024   # Grid size for recorded range hashes
+RANGE_MIN_HASH_SIZE = 4096
+RANGE_MAX_HASH_SIZE = 64 * 1024 * 1024
+RANGE_SAMPLES = 16              # Ranges re-hashed by a sampled verification
+
+
+def _hash_range(fd, offset, length, strategy='auto'):
+    """
+    SHA-256 of ``length`` bytes at ``offset`` of an open file.
+    
+    The range is cut short at the end of the file.
+    
+    Returns:
+        tuple: (hex digest, number of bytes hashed)
+    """
+    length = max(0, min(length, os.fstat(fd).st_size - offset))
+    sha256_hash = new_hash()
+    if strategy == 'auto':
+        strategy = 'mmap' if choose_hash_strategy(length) == 'mmap' else 'pread'
+    
+    if strategy == 'mmap' and length:
+        # mmap offsets must be a multiple of the allocation granularity
+        start = offset - offset % mmap.ALLOCATIONGRANULARITY
+        with mmap.mmap(fd, offset + length - start, access=mmap.ACCESS_READ, offset=start) as mm:
+            with memoryview(mm) as view:
+                end = offset - start + length
+                for pos in range(offset - start, end, HASH_BLOCK_SIZE):
+                    sha256_hash.update(view[pos:min(pos + HASH_BLOCK_SIZE, end)])
+    else:
+        pos, end = offset, offset + length
+        while pos < end:
+            block = os.pread(fd, min(HASH_BLOCK_SIZE, end - pos), pos)
+            if not block:
+                break
+            sha256_hash.update(block)
+            pos += len(block)
+    return sha256_hash.hexdigest(), length
+
+
+def calculate_range_sha256(file_path, offset, length, strategy='auto'):
+    """
+    Calculate the SHA-256 of one byte range of a file.
+    
+    Only the range itself is read, with os.pread() (or mmap for ranges of
+    at least HASH_MMAP_THRESHOLD), so the cost does not depend on where
+    in the file the range is.
+    
+    Args:
+        file_path (str): Path to the file
+        offset (int): First byte of the range
+        length (int): Bytes in the range (cut short at the end of the file)
+        strategy (str): 'auto', 'pread' or 'mmap'
+    
+    Returns:
+        str: Hexadecimal SHA-256 hash of the range
+    """
+    fd = os.open(file_path, os.O_RDONLY)
+    try:
+        start = time.perf_counter()
+        digest, nbytes = _hash_range(fd, offset, length, strategy)
+        record_hash(nbytes, time.perf_counter() - start)
+        return digest
+    finally:
+        os.close(fd)
+
+
+def calculate_range_hashes(file_path, ranges):
+    """
+    Hash many byte ranges of a file in parallel.
+    
+    Args:
+        file_path (str): Path to the file
+        ranges (list): (offset, length) tuples
+    
+    Returns:
+        list: dicts with offset, length (as hashed) and sha256, in order
+    """
+    fd = os.open(file_path, os.O_RDONLY)
+    try:
+        tasks = ((fd, offset, length) for offset, length in ranges)
+        start = time.perf_counter()
+        results = [{'offset': offset, 'length': nbytes, 'sha256': digest}
+                   for (_, offset, _), (digest, nbytes) in _bounded_map(
+                       get_hash_executor(), _hash_range, tasks, app.config['HASH_WORKERS'] * 2)]
+        record_hash(sum(r['length'] for r in results), time.perf_counter() - start)
+        return results
+    finally:
+        os.close(fd)
+
+
+def grid_range_hashes(file_path, range_size=RANGE_HASH_SIZE):
+    """
+    Hash a file as consecutive ranges of ``range_size``, plus its SHA-256.
+    
+    One sequential read feeds both the whole-file hash and the range
+    hashes, so the whole-file hash can confirm the data the range hashes
+    were made from.
+    
+    Returns:
+        tuple: (list of hex range hashes, whole-file SHA-256 hex, size)
+    """
+    whole = new_hash()
+    ranges = []
+    state = {'current': new_hash(), 'filled': 0}
+    
+    def update(block):
+        whole.update(block)
+        with memoryview(block) as view:
+            while len(view):
+                take = min(len(view), range_size - state['filled'])
+                state['current'].update(view[:take])
+                state['filled'] += take
+                view = view[take:]
+                if state['filled'] == range_size:
+                    ranges.append(state['current'].hexdigest())
+                    state['current'] = new_hash()
+                    state['filled'] = 0
+    
+    start = time.perf_counter()
+    size = feed_file(file_path, update)
+    record_hash(size, time.perf_counter() - start)
+    if state['filled'] or not ranges:
+        ranges.append(state['current'].hexdigest())
+    return ranges, whole.hexdigest(), size
+
+
+def sampled_verify(file_path, range_hashes, range_size, samples=RANGE_SAMPLES, seed=None):
+    """
+    Spot-check a file by re-hashing a random sample of its grid ranges.
+    
+    If a fraction f of the ranges is damaged, checking k random ranges
+    misses all of them with probability (1 - f) ** k, so a few dozen
+    samples catch widespread damage almost surely while reading only a
+    small part of the file.
+    
+    Args:
+        file_path (str): Path to the file
+        range_hashes (list): Recorded hex hashes of every grid range
+        range_size (int): Grid size the hashes were recorded with
+        samples (int): Ranges to check (all of them if there are fewer)
+        seed (int): Seed for choosing ranges (default: unpredictable)
+    
+    Returns:
+        dict: checked (range numbers), mismatched (range numbers),
+            bytes_read and coverage (fraction of the file read)
+    """
+    rng = random.Random(seed) if seed is not None else random.SystemRandom()
+    indices = sorted(rng.sample(range(len(range_hashes)), min(samples, len(range_hashes))))
+    results = calculate_range_hashes(file_path, [(i * range_size, range_size) for i in indices])
+    size = os.path.getsize(file_path)
+    bytes_read = sum(r['length'] for r in results)
+    return {
+        'checked': indices,
+        'mismatched': [i for i, r in zip(indices, results) if r['sha256'] != range_hashes[i]],
+        'bytes_read': bytes_read,
+        'coverage': bytes_read / size if size else 1.0
+    }
+
+
+class RangeHashIndex(SQLiteDatabase):
+    """
+    Recorded grid range hashes of stored blobs, kept in ranges.db.
+    
+    Entries are keyed by the blob's SHA-256, so every filename that
+    points at the same content shares them. Digests are stored as one
+    BLOB of 32-byte values per file.
+    
+    Args:
+        db_path (str): SQLite database file
+        store (ContentStore): Store the blobs live in
+    """
+    
+    def __init__(self, db_path, store):
+        super().__init__(db_path)
+        self.store = store
+    
+    def _setup(self, conn):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS range_hashes (
+                sha256 TEXT PRIMARY KEY,
+                range_size INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                hashes BLOB NOT NULL,
+                recorded TEXT NOT NULL
+            )""")
+    
+    def record_blob(self, sha256_hex, range_size=RANGE_HASH_SIZE):
+        """
+        Hash a stored blob in ranges and record the range hashes.
+        
+        Returns:
+            dict: The recorded entry, see get()
+        
+        Raises:
+            ValueError: If the blob no longer matches its SHA-256, in which
+                case nothing is recorded
+        """
+        hashes, whole, size = grid_range_hashes(self.store.blob_path(sha256_hex), range_size)
+        if whole != sha256_hex:
+            raise ValueError(f"Stored data for {sha256_hex} is corrupted; range hashes not recorded")
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO range_hashes VALUES (?, ?, ?, ?, ?)",
+                         (sha256_hex, range_size, size, b''.join(bytes.fromhex(h) for h in hashes),
+                          datetime.now().isoformat()))
+        return self.get(sha256_hex)
+    
+    def get(self, sha256_hex):
+        """
+        Return the recorded range hashes of a blob, or None.
+        
+        Returns:
+            dict: range_size, size, recorded time and the list of hex hashes
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT range_size, size, hashes, recorded FROM range_hashes "
+                               "WHERE sha256 = ?", (sha256_hex,)).fetchone()
+        if row is None:
+            return None
+        range_size, size, blob, recorded = row
+        return {'range_size': range_size, 'size': size, 'recorded': recorded,
+                'hashes': [blob[i:i + 32].hex() for i in range(0, len(blob), 32)]}
+
+
+range_index = RangeHashIndex(os.path.join(UPLOAD_FOLDER, 'ranges.db'), content_store)
+
+
+def blob_stored(sha256_hex, is_new):
+    """
+    Post-store hook of the upload routes.
+    
+    With RANGE_HASHES_ON_UPLOAD, a new blob's range hashes are recorded
+    on the hash thread pool, off the request, while the blob is still in
+    the page cache.
+    """
+    if is_new and app.config['RANGE_HASHES_ON_UPLOAD']:
+        get_hash_executor().submit(range_index.record_blob, sha256_hex)
@@ -0,0 +1,1511 @@
+"""
+Flask routes: the web interface and the JSON API.
+
+The request hooks of the other modules are registered here too, in one
+place, because their order matters.
+"""
+
+from flask import Response, request, jsonify, stream_with_context
+from werkzeug.exceptions import RequestEntityTooLarge
+import hmac
+import itertools
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from .config import app
+from .metrics import (metrics, _metrics_finish_request, _metrics_start_request,
+                      _metrics_teardown_request)
+from .backends import hash_backends, new_hash
+from .hashing import _bounded_map_as_completed, get_hash_executor, parse_algorithms
+from .compression import (CorruptEncodingError, DecodedTooLargeError, _check_request_encoding,
+                          _decode_error_response)
+from .profiling import (receive_files, timed_phase, _timing_finish_request, _timing_start_request,
+                        _timing_teardown_request)
+from .admission import admission, _admission_start_request, _admission_teardown_request
+from .ingest import HashingRequest
+from .store import content_store, hash_catalog
+from .uploads import UploadSessionError, upload_sessions
+from .scrubber import scrubber
+from .jobs import JobError, JobQueue, job_queue, _start_job_workers
+from .merkle import (MERKLE_CHUNK_SIZE, MERKLE_MAX_CHUNK_SIZE, MERKLE_MIN_CHUNK_SIZE,
+                     chunks_for_range, merkle_chunk_hashes_from_stream, merkle_root,
+                     verify_merkle_chunks)
+from .ranges import (RANGE_HASH_SIZE, RANGE_MAX_HASH_SIZE, RANGE_MIN_HASH_SIZE, RANGE_SAMPLES,
+                     blob_stored, calculate_range_hashes, range_index, sampled_verify)
+from .delta import (DELTA_MAX_BLOCK_SIZE, DELTA_MIN_BLOCK_SIZE, DeltaError, apply_delta,
+                    default_delta_block_size, parse_delta, signature_cache)
+from .manifest import read_stored_manifest, verify_stored_entry
+from .page import HTML_TEMPLATE, StaticPage
+
+# Flask runs before_request hooks in the order they are registered and
+# after_request and teardown hooks in reverse: encoding errors are
+# rejected first, metrics and timing wrap everything after them, and
+# admission control runs last, next to the view.
+
+app.register_error_handler(CorruptEncodingError, _decode_error_response)
+app.register_error_handler(DecodedTooLargeError, _decode_error_response)
+app.before_request(_check_request_encoding)
+app.request_class = HashingRequest
+app.before_request(_metrics_start_request)
+app.after_request(_metrics_finish_request)
+app.teardown_request(_metrics_teardown_request)
+app.before_request(_timing_start_request)
+app.after_request(_timing_finish_request)
+app.teardown_request(_timing_teardown_request)
+app.before_request(_admission_start_request)
+app.teardown_request(_admission_teardown_request)
+app.before_request(_start_job_workers)
+
+
+# DEMONSTRATION FUNCTIONS
+
+def demonstrate_sha256():
+    """
+    Demonstrate how SHA-256 works with sample data.
+    Shows how even tiny changes produce completely different hashes.
+    
+    Returns:
+        dict: Dictionary with demonstration results
+    """
+    # Sample text data
+    text1 = "Hello World"
+    text2 = "Hello World!"  # Just added one character
+    text3 = "hello world"   # Just changed case
+    
+    # Calculate hashes
+    hash1 = new_hash('sha256', text1.encode()).hexdigest()
+    hash2 = new_hash('sha256', text2.encode()).hexdigest()
+    hash3 = new_hash('sha256', text3.encode()).hexdigest()
+    
+    return {
+        'original': {'text': text1, 'hash': hash1},
+        'added_char': {'text': text2, 'hash': hash2},
+        'case_change': {'text': text3, 'hash': hash3},
+        'explanation': 'Notice how tiny changes produce completely different hashes!'
+    }
+
+
+def requested_algorithms():
+    """
+    Digest algorithms asked for with ``?algorithms=md5,sha512``.
+    
+    Hashing routes always compute SHA-256; any extra algorithms are
+    computed in the same pass and returned under 'digests'.
+    
+    Raises:
+        ValueError: If an algorithm is not supported
+    """
+    return parse_algorithms(request.args.get('algorithms'))
+
+
+def is_sha256_hex(value):
+    """True if ``value`` is a SHA-256 hex digest (either case)."""
+    return isinstance(value, str) and len(value) == 64 and \
+        all(c in '0123456789abcdef' for c in value.lower())
+
+
+# FLASK ROUTES (WEB INTERFACE)
+
+# Rendered once at startup; HTML_TEMPLATE has no template variables
+index_page = StaticPage(app.jinja_env.from_string(HTML_TEMPLATE).render())
+
+
+@app.route('/')
+def index():
+    """
+    Main page route - displays the web interface.
+    
+    The page is pre-rendered and pre-compressed, and conditional requests
+    get a 304, so health checks and dashboards cost almost nothing.
+    
+    Returns:
+        HTML page with SHA-256 demonstration and file upload interface
+    """
+    return index_page.response()
+
+@app.route('/upload', methods=['POST'])
+def upload_file():
+    """
+    Handle file upload and calculate SHA-256 hash.
+    
+    This endpoint:
+    1. Receives uploaded file
+    2. Hashes it while writing it to the upload folder (one pass)
+    3. Stores it as a blob named by its hash (skipped if already stored)
+    4. Points the filename at that blob
+    5. Returns hash and file info
+    
+    Returns:
+        JSON response with file hash and metadata
+    """
+    try:
+        algorithms = requested_algorithms()
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    # Hash file parts as they arrive and write them straight to disk
+    request.stream_hashing = True
+    content_store.setup()
+    request.ingest_folder = app.config['UPLOAD_FOLDER']
+    request.ingest_algorithms = algorithms
+
+    files = receive_files()
+    
+    # Check if file was uploaded
+    if 'file' not in files:
+        return jsonify({'success': False, 'error': 'No file uploaded'}), 400
+    
+    file = files['file']
+    
+    # Check if filename is empty
+    if file.filename == '':
+        return jsonify({'success': False, 'error': 'No file selected'}), 400
+    
+    try:
+        # Hash and size were computed while the body streamed in
+        filename = file.filename
+        file_hash = file.stream.hexdigest()
+        file_size = file.stream.size
+        
+        # Keep one copy per content; duplicates are dropped here
+        with timed_phase('store'):
+            is_new = content_store.add_stream(file.stream)
+            content_store.set_ref(filename, file_hash, file_size)
+            hash_catalog.record(file_hash, file_size, filename)
+        blob_stored(file_hash, is_new)
+        
+        # Get current timestamp
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        
+        # Return success response
+        result = {
+            'success': True,
+            'filename': filename,
+            'hash': file_hash,
+            'size': file_size,
+            'duplicate': not is_new,
+            'timestamp': timestamp
+        }
+        if len(algorithms) > 1:
+            result['digests'] = file.stream.hexdigests()
+        
+        with timed_phase('serialize'):
+            return jsonify(result)
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/verify', methods=['POST'])
+def verify_file():
+    """
+    Verify file integrity by comparing hashes.
+    
+    This endpoint:
+    1. Receives file and expected hash
+    2. Calculates actual hash while the upload streams in (nothing is saved)
+    3. Compares with expected hash
+    4. Returns verification result
+    
+    Returns:
+        JSON response with verification status
+    """
+    try:
+        algorithms = requested_algorithms()
+    except ValueError as e:
+        return jsonify({'verified': False, 'error': str(e)}), 400
+    
+    # Only hash the upload; the bytes are never written to disk
+    request.stream_hashing = True
+    request.ingest_algorithms = algorithms
+
+    files = receive_files()
+    
+    # Check if file and hash were provided
+    if 'file' not in files or 'expected_hash' not in request.form:
+        return jsonify({'verified': False, 'error': 'Missing file or hash'}), 400
+    
+    file = files['file']
+    expected_hash = request.form['expected_hash'].strip().lower()
+    
+    if file.filename == '':
+        return jsonify({'verified': False, 'error': 'No file selected'}), 400
+    
+    try:
+        filename = file.filename
+        
+        # Hash was calculated while the body streamed in
+        calculated_hash = file.stream.hexdigest()
+        hash_catalog.record(calculated_hash, file.stream.size, filename)
+        
+        # Compare hashes
+        is_verified = (calculated_hash == expected_hash)
+        
+        # Return verification result
+        result = {
+            'verified': is_verified,
+            'filename': filename,
+            'calculated_hash': calculated_hash,
+            'expected_hash': expected_hash
+        }
+        if len(algorithms) > 1:
+            result['digests'] = file.stream.hexdigests()
+        
+        with timed_phase('serialize'):
+            return jsonify(result)
+        
+    except Exception as e:
+        return jsonify({'verified': False, 'error': str(e)}), 500
+
+
+@app.route('/api/verify-hash', methods=['POST'])
+def api_verify_hash():
+    """
+    NEW API ENDPOINT: For JavaScript integration
+    
+    This allows your JavaScript app to send:
+    - File
+    - Client-side calculated hash
+    
+    Server will:
+    - Calculate its own hash
+    - Compare with client hash
+    - Return verification result
+    
+    Usage from JavaScript:
+        const formData = new FormData();
+        formData.append('file', fileBlob);
+        formData.append('client_hash', clientCalculatedHash);
+        
+        const response = await fetch('http://localhost:5000/api/verify-hash', {
+            method: 'POST',
+            body: formData
+        });
+        
+        const data = await response.json();
+    
+    Returns:
+        JSON with verification result and both hashes
+    """
+    try:
+        try:
+            algorithms = requested_algorithms()
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        # Hash the upload while it streams in instead of reading it into memory
+        request.stream_hashing = True
+        request.ingest_algorithms = algorithms
+        
+        # Get file and client hash
+        files = receive_files()
+        
+        if 'file' not in files or 'client_hash' not in request.form:
+            return jsonify({
+                'success': False,
+                'error': 'Missing file or client_hash'
+            }), 400
+        
+        file = files['file']
+        client_hash = request.form['client_hash'].strip().lower()
+        
+        if file.filename == '':
+            return jsonify({'success': False, 'error': 'No file selected'}), 400
+        
+        # Server-side hash was calculated while the body streamed in
+        digests = file.stream.hexdigests()
+        server_hash = digests['sha256']
+        hash_catalog.record(server_hash, file.stream.size, file.filename)
+        
+        # Compare hashes
+        hashes_match = (client_hash == server_hash)
+        
+        result = {
+            'success': True,
+            'verified': hashes_match,
+            'client_hash': client_hash,
+            'server_hash': server_hash,
+            'filename': file.filename,
+            'timestamp': datetime.now().isoformat(),
+            'message': 'Hashes match! File integrity verified.' if hashes_match else 'Hash mismatch! Possible corruption.'
+        }
+        if len(algorithms) > 1:
+            result['digests'] = digests
+        
+        with timed_phase('serialize'):
+            return jsonify(result)
+        
+    except (CorruptEncodingError, DecodedTooLargeError):
+        raise  # Answered by _decode_error_response()
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@app.route('/api/calculate-hash', methods=['POST'])
+def api_calculate_hash():
+    """
+    NEW API ENDPOINT: Calculate hash server-side
+    
+    Allows JavaScript to upload file and get server-calculated hash.
+    
+    Usage from JavaScript:
+        const formData = new FormData();
+        formData.append('file', fileBlob);
+        
+        const response = await fetch('http://localhost:5000/api/calculate-hash', {
+            method: 'POST',
+            body: formData
+        });
+        
+        const data = await response.json();
+        console.log('Server hash:', data.hash);
+    
+    POST to /api/calculate-hash?algorithms=md5,sha512 to also get those
+    digests (under 'digests') from the same read.
+    
+    Returns:
+        JSON with calculated hash
+    """
+    try:
+        try:
+            algorithms = requested_algorithms()
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        # Hash the upload while it streams in instead of reading it into memory
+        request.stream_hashing = True
+        request.ingest_algorithms = algorithms
+        
+        files = receive_files()
+        
+        if 'file' not in files:
+            return jsonify({'success': False, 'error': 'No file uploaded'}), 400
+        
+        file = files['file']
+        
+        if file.filename == '':
+            return jsonify({'success': False, 'error': 'No file selected'}), 400
+        
+        # Hash was calculated while the body streamed in
+        digests = file.stream.hexdigests()
+        hash_catalog.record(digests['sha256'], file.stream.size, file.filename)
+        
+        result = {
+            'success': True,
+            'hash': digests['sha256'],
+            'filename': file.filename,
+            'size': file.stream.size,
+            'timestamp': datetime.now().isoformat()
+        }
+        if len(algorithms) > 1:
+            result['digests'] = digests
+        
+        with timed_phase('serialize'):
+            return jsonify(result)
+        
+    except (CorruptEncodingError, DecodedTooLargeError):
+        raise  # Answered by _decode_error_response()
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/calculate-hash-batch', methods=['POST'])
+def api_calculate_hash_batch():
+    """
+    NEW API ENDPOINT: Calculate hashes for many files in one request
+    
+    Saves one HTTP round trip per file when the client has a batch to hash.
+    Every file part is hashed while it streams in (see HashingRequest),
+    so nothing is spooled to disk or read back. The parts are hashed
+    concurrently on the shared thread pool: while one part is hashed,
+    the next one is already being parsed.
+    
+    Usage from JavaScript:
+        const formData = new FormData();
+        for (const file of fileList) {
+            formData.append('files', file);
+        }
+        
+        const response = await fetch('http://localhost:5000/api/calculate-hash-batch', {
+            method: 'POST',
+            body: formData
+        });
+        
+        const data = await response.json();
+        data.results.forEach(r => console.log(r.filename, r.hash));
+    
+    Add ?algorithms=md5,sha512 to also get those digests for every file.
+    
+    Returns:
+        JSON with one result (filename, size, hash) per file, in upload order
+    """
+    try:
+        try:
+            algorithms = requested_algorithms()
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        # Hash the uploads on the thread pool while they stream in, and
+        # stop parsing as soon as there are too many of them
+        request.stream_hashing = True
+        request.ingest_algorithms = algorithms
+        request.ingest_executor = get_hash_executor()
+        request.max_form_parts = app.config['BATCH_MAX_FILES']
+        
+        try:
+            files = [f for f in receive_files().getlist('files') if f.filename != '']
+        except DecodedTooLargeError:
+            raise
+        except RequestEntityTooLarge:
+            if (request.max_content_length is not None
+                    and (request.content_length or 0) > request.max_content_length):
+                raise
+            return jsonify({
+                'success': False,
+                'error': f"Too many files (max {app.config['BATCH_MAX_FILES']})"
+            }), 400
+        
+        if not files:
+            return jsonify({'success': False, 'error': 'No files uploaded'}), 400
+        
+        results = []
+        for f in files:
+            file_digests = f.stream.hexdigests()
+            results.append({'filename': f.filename, 'size': f.stream.size,
+                            'hash': file_digests['sha256']})
+            if len(algorithms) > 1:
+                results[-1]['digests'] = file_digests
+        hash_catalog.record_many([(r['hash'], r['size'], r['filename']) for r in results])
+        
+        return jsonify({
+            'success': True,
+            'count': len(results),
+            'results': results,
+            'timestamp': datetime.now().isoformat()
+        })
+        
+    except (CorruptEncodingError, DecodedTooLargeError):
+        raise  # Answered by _decode_error_response()
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/merkle-hash', methods=['POST'])
+def api_merkle_hash():
+    """
+    NEW API ENDPOINT: Chunked Merkle-tree hash of an uploaded file
+    
+    Returns the Merkle root and every chunk hash, plus the usual flat
+    SHA-256, all from one read of the upload. Keep the chunk hashes to
+    re-check parts of the stored file later with /api/merkle-verify.
+    
+    Usage from JavaScript:
+        const formData = new FormData();
+        formData.append('file', fileBlob);
+        formData.append('chunk_size', 4 * 1024 * 1024);   // optional
+        
+        const response = await fetch('http://localhost:5000/api/merkle-hash', {
+            method: 'POST',
+            body: formData
+        });
+        
+        const data = await response.json();
+        console.log('Merkle root:', data.root);
+    
+    Returns:
+        JSON with root, chunk_size, chunks, hash (flat SHA-256) and size
+    """
+    try:
+        if 'file' not in request.files:
+            return jsonify({'success': False, 'error': 'No file uploaded'}), 400
+        
+        file = request.files['file']
+        
+        if file.filename == '':
+            return jsonify({'success': False, 'error': 'No file selected'}), 400
+        
+        chunk_size = request.form.get('chunk_size', MERKLE_CHUNK_SIZE, type=int)
+        if not MERKLE_MIN_CHUNK_SIZE <= chunk_size <= MERKLE_MAX_CHUNK_SIZE:
+            return jsonify({
+                'success': False,
+                'error': f'chunk_size must be between {MERKLE_MIN_CHUNK_SIZE} and {MERKLE_MAX_CHUNK_SIZE}'
+            }), 400
+        
+        chunks, file_hash, size = merkle_chunk_hashes_from_stream(file.stream, chunk_size)
+        hash_catalog.record(file_hash, size, file.filename)
+        
+        return jsonify({
+            'success': True,
+            'filename': file.filename,
+            'root': merkle_root(chunks),
+            'chunk_size': chunk_size,
+            'chunks': chunks,
+            'hash': file_hash,
+            'size': size,
+            'timestamp': datetime.now().isoformat()
+        })
+        
+    except (CorruptEncodingError, DecodedTooLargeError):
+        raise  # Answered by _decode_error_response()
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/merkle-verify', methods=['POST'])
+def api_merkle_verify():
+    """
+    NEW API ENDPOINT: Re-check chunks of a stored file
+    
+    Takes a JSON body with the filename of a stored upload and the chunk
+    hashes from /api/merkle-hash. Only the chunks covering the requested
+    byte range (or the listed chunk numbers) are read; with neither, the
+    whole file is checked.
+    
+    Request JSON:
+        {
+            "filename": "backup.tar",
+            "chunk_size": 4194304,
+            "chunks": ["...", "..."],
+            "root": "...",               // optional, checked against chunks
+            "offset": 0, "length": 1024, // optional byte range
+            "indices": [3, 7]            // optional chunk numbers
+        }
+    
+    Returns:
+        JSON with verified flag, the chunks checked and the corrupt ones
+    """
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'success': False, 'error': 'Expected a JSON object'}), 400
+        filename = data.get('filename')
+        chunk_hashes = data.get('chunks')
+        max_chunks = app.config['MERKLE_MAX_CHUNKS']
+        
+        try:
+            chunk_size = int(data.get('chunk_size', MERKLE_CHUNK_SIZE))
+        except (TypeError, ValueError):
+            chunk_size = 0
+        if not isinstance(filename, str) or not filename or not isinstance(chunk_hashes, list) \
+                or not all(isinstance(h, str) for h in chunk_hashes):
+            return jsonify({'success': False, 'error': 'Missing filename or chunks'}), 400
+        if not MERKLE_MIN_CHUNK_SIZE <= chunk_size <= MERKLE_MAX_CHUNK_SIZE:
+            return jsonify({
+                'success': False,
+                'error': f'chunk_size must be between {MERKLE_MIN_CHUNK_SIZE} and {MERKLE_MAX_CHUNK_SIZE}'
+            }), 400
+        if not isinstance(data.get('indices', []), list):
+            return jsonify({'success': False, 'error': 'indices must be a list'}), 400
+        if len(chunk_hashes) > max_chunks or len(data.get('indices', [])) > max_chunks:
+            return jsonify({'success': False, 'error': f'Too many chunks (max {max_chunks})'}), 400
+        
+        if not all(is_sha256_hex(h) for h in chunk_hashes):
+            return jsonify({'success': False, 'error': 'chunks must be SHA-256 hex digests'}), 400
+        
+        # The chunk list must be consistent with the root the client holds
+        root = data.get('root')
+        if root:
+            if not isinstance(root, str) or not is_sha256_hex(root.strip()):
+                return jsonify({'success': False, 'error': 'root must be a SHA-256 hex digest'}), 400
+            if merkle_root(chunk_hashes) != root.strip().lower():
+                return jsonify({'success': False, 'error': 'chunks do not match root'}), 400
+        
+        ref = content_store.resolve(filename)
+        if ref is None:
+            return jsonify({'success': False, 'error': 'File not found'}), 404
+        
+        try:
+            if 'indices' in data:
+                indices = [int(i) for i in data['indices']]
+            elif 'offset' in data or 'length' in data:
+                offset = max(0, int(data.get('offset', 0)))
+                length = int(data.get('length', ref['size'] - offset))
+                indices = list(itertools.islice(chunks_for_range(offset, length, chunk_size),
+                                                len(chunk_hashes)))
+            else:
+                indices = list(range(len(chunk_hashes)))
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'indices, offset and length must be integers'}), 400
+        
+        corrupt = verify_merkle_chunks(ref['path'], chunk_hashes, chunk_size, indices)
+        
+        return jsonify({
+            'success': True,
+            'verified': not corrupt,
+            'filename': filename,
+            'checked': [i for i in indices if 0 <= i < len(chunk_hashes)],
+            'corrupt_chunks': corrupt,
+            'timestamp': datetime.now().isoformat()
+        })
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/lookup', methods=['GET', 'POST'])
+def api_lookup():
+    """
+    NEW API ENDPOINT: Check which hashes the server already has
+    
+    Call this before uploading: any hash reported as stored does not need
+    to be sent again (just upload under the new name if you need one, or
+    keep using the hash). Hashes the server has calculated or verified
+    without storing are reported as known but not stored.
+    
+    Usage from JavaScript:
+        const response = await fetch('http://localhost:5000/api/lookup', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({hashes: [hash1, hash2]})
+        });
+        
+        const data = await response.json();
+        const toUpload = files.filter(f => data.missing.includes(f.hash));
+    
+    A single hash can also be checked with GET /api/lookup?hash=<sha256>
+    (several may be given, comma-separated).
+    
+    Returns:
+        JSON with the stored and missing hashes and, per known hash,
+        its size, filenames and first/last seen times
+    """
+    try:
+        if request.method == 'POST':
+            hashes = (request.get_json(silent=True) or {}).get('hashes')
+            if not isinstance(hashes, list):
+                return jsonify({'success': False, 'error': 'Expected JSON body with "hashes" list'}), 400
+        else:
+            hashes = [h for h in request.args.get('hash', '').split(',') if h]
+        
+        hashes = [str(h).strip().lower() for h in hashes]
+        if not hashes:
+            return jsonify({'success': False, 'error': 'No hashes given'}), 400
+        if len(hashes) > app.config['LOOKUP_MAX_HASHES']:
+            return jsonify({
+                'success': False,
+                'error': f"Too many hashes (max {app.config['LOOKUP_MAX_HASHES']})"
+            }), 400
+        
+        known = hash_catalog.lookup(hashes)
+        stored, missing = [], []
+        for sha256_hex in dict.fromkeys(hashes):
+            # Only well-formed digests may be turned into blob paths
+            is_sha256 = is_sha256_hex(sha256_hex) and sha256_hex == sha256_hex.lower()
+            is_stored = is_sha256 and content_store.has_blob(sha256_hex)
+            (stored if is_stored else missing).append(sha256_hex)
+            if sha256_hex in known:
+                known[sha256_hex]['stored'] = is_stored
+        
+        return jsonify({
+            'success': True,
+            'stored': stored,
+            'missing': missing,
+            'known': known,
+            'timestamp': datetime.now().isoformat()
+        })
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/verify-manifest', methods=['POST'])
+def api_verify_manifest():
+    """
+    NEW API ENDPOINT: Verify many stored files in one request
+    
+    The request body is a manifest of stored filenames and the hashes
+    they should have, one per line, either as JSON objects or as
+    sha256sum output:
+        {"filename": "a.txt", "hash": "<sha256>", "size": 123}
+        <sha256>  a.txt
+    
+    Files are checked in parallel on the shared thread pool and each
+    result is streamed back as one line of JSON (NDJSON) as soon as it is
+    done, so results are not in manifest order; use "line" to match them
+    up. The manifest is read while results are sent and only a bounded
+    number of files are in flight, so memory stays flat for manifests of
+    any length. The last line is a summary with counts per status.
+    
+    Usage from JavaScript:
+        const response = await fetch('http://localhost:5000/api/verify-manifest', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/x-ndjson'},
+            body: manifestLines.join('\n')
+        });
+        
+        const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+        // each line: {"line": 1, "filename": "a.txt", "status": "OK"}
+    
+    Add ?problems_only=1 to leave OK files out of the output.
+    
+    Returns:
+        NDJSON stream of per-file results followed by {"summary": {...}}
+    """
+    # Manifests can be far bigger than a single upload
+    request.max_content_length = app.config['VERIFY_MANIFEST_MAX_LENGTH']
+    problems_only = request.args.get('problems_only', '') in ('1', 'true')
+    workers = app.config['HASH_WORKERS']
+    
+    def generate():
+        stats = {'OK': 0, 'MISSING': 0, 'MISMATCH': 0, 'ERROR': 0}
+        entries = read_stored_manifest(request.stream)
+        try:
+            for _, result in _bounded_map_as_completed(
+                    get_hash_executor(), verify_stored_entry, entries, workers * 4):
+                stats[result['status']] += 1
+                if not (problems_only and result['status'] == 'OK'):
+                    yield json.dumps(result) + '\n'
+        except Exception as e:
+            stats['ERROR'] += 1
+            yield json.dumps({'status': 'ERROR', 'detail': str(e)}) + '\n'
+        yield json.dumps({'summary': dict(stats, total=sum(stats.values()),
+                                          timestamp=datetime.now().isoformat())}) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+@app.route('/api/range-hash', methods=['GET', 'POST'])
+def api_range_hash():
+    """
+    NEW API ENDPOINT: SHA-256 of byte ranges of a stored file
+    
+    Only the requested bytes are read (positioned reads, or mmap for big
+    ranges), so hashing the last megabyte of a huge file costs the same
+    as hashing the first. The hash of a range equals calculateSHA256()
+    of the same slice on the client (e.g. file.slice(offset, offset + length)).
+    
+    GET /api/range-hash?filename=a.bin&offset=0&length=1048576
+    
+    Request JSON (POST, many ranges in parallel):
+        {
+            "filename": "backup.tar",
+            "ranges": [{"offset": 0, "length": 1048576}, ...]
+        }
+    
+    Returns:
+        JSON with one {offset, length, sha256} per range; length is cut
+        short at the end of the file
+    """
+    try:
+        if request.method == 'POST':
+            data = request.get_json(silent=True)
+            if not isinstance(data, dict):
+                return jsonify({'success': False, 'error': 'Expected a JSON object'}), 400
+            filename = data.get('filename')
+            ranges = data.get('ranges')
+        else:
+            filename = request.args.get('filename')
+            ranges = [{'offset': request.args.get('offset', 0),
+                       'length': request.args.get('length', 0)}]
+        
+        if not filename or not isinstance(filename, str) or not isinstance(ranges, list) or not ranges:
+            return jsonify({'success': False, 'error': 'Missing filename or ranges'}), 400
+        if len(ranges) > app.config['RANGE_MAX_RANGES']:
+            return jsonify({
+                'success': False,
+                'error': f"Too many ranges (max {app.config['RANGE_MAX_RANGES']})"
+            }), 400
+        try:
+            ranges = [(int(r['offset']), int(r['length'])) for r in ranges]
+        except (KeyError, TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'Each range needs an integer offset and length'}), 400
+        if any(offset < 0 or length < 0 for offset, length in ranges):
+            return jsonify({'success': False, 'error': 'offset and length must not be negative'}), 400
+        
+        ref = content_store.resolve(filename)
+        if ref is None:
+            return jsonify({'success': False, 'error': 'File not found'}), 404
+        
+        return jsonify({
+            'success': True,
+            'filename': filename,
+            'size': ref['size'],
+            'ranges': calculate_range_hashes(ref['path'], ranges),
+            'timestamp': datetime.now().isoformat()
+        })
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/range-hashes', methods=['POST'])
+def api_record_range_hashes():
+    """
+    NEW API ENDPOINT: Record range hashes of a stored file
+    
+    Hashes the file once in fixed-size ranges (default 1MB) and stores
+    the range hashes for later sampled verification. The whole-file
+    SHA-256 is checked in the same read, so hashes are never recorded
+    from damaged data.
+    
+    Request JSON:
+        {"filename": "backup.tar", "range_size": 1048576}
+    
+    range_size must be between RANGE_MIN_HASH_SIZE (4KB) and
+    RANGE_MAX_HASH_SIZE (64MB).
+    
+    Returns:
+        JSON with range_size and the number of ranges recorded
+    """
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'success': False, 'error': 'Expected a JSON object'}), 400
+        if not data.get('filename') or not isinstance(data['filename'], str):
+            return jsonify({'success': False, 'error': 'Missing filename'}), 400
+        try:
+            range_size = int(data.get('range_size', RANGE_HASH_SIZE))
+        except (TypeError, ValueError):
+            range_size = 0
+        if not RANGE_MIN_HASH_SIZE <= range_size <= RANGE_MAX_HASH_SIZE:
+            return jsonify({
+                'success': False,
+                'error': f'range_size must be between {RANGE_MIN_HASH_SIZE} and {RANGE_MAX_HASH_SIZE}'
+            }), 400
+        
+        ref = content_store.resolve(data['filename'])
+        if ref is None:
+            return jsonify({'success': False, 'error': 'File not found'}), 404
+        
+        try:
+            entry = range_index.record_blob(ref['sha256'], range_size)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 409
+        
+        return jsonify({
+            'success': True,
+            'filename': data['filename'],
+            'hash': ref['sha256'],
+            'range_size': entry['range_size'],
+            'ranges': len(entry['hashes']),
+            'timestamp': datetime.now().isoformat()
+        })
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/sampled-verify', methods=['POST'])
+def api_sampled_verify():
+    """
+    NEW API ENDPOINT: Probabilistic spot check of a stored file
+    
+    Re-hashes a random set of the file's recorded ranges (see
+    /api/range-hashes) and compares them with the recorded hashes.
+    
+    Request JSON:
+        {
+            "filename": "backup.tar",
+            "samples": 16,        // optional, ranges to check
+            "seed": 42            // optional, for a repeatable choice
+        }
+    
+    Returns:
+        JSON with verified flag, the ranges checked, the mismatched ones,
+        bytes read and the fraction of the file that was read
+    """
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'success': False, 'error': 'Expected a JSON object'}), 400
+        try:
+            samples = int(data.get('samples', RANGE_SAMPLES))
+        except (TypeError, ValueError):
+            samples = 0
+        if not data.get('filename') or not isinstance(data['filename'], str) or samples <= 0:
+            return jsonify({'success': False, 'error': 'Missing filename or bad samples'}), 400
+        
+        ref = content_store.resolve(data['filename'])
+        if ref is None:
+            return jsonify({'success': False, 'error': 'File not found'}), 404
+        
+        entry = range_index.get(ref['sha256'])
+        if entry is None:
+            return jsonify({
+                'success': False,
+                'error': 'No range hashes recorded for this file (POST /api/range-hashes first)'
+            }), 409
+        
+        if os.path.getsize(ref['path']) != entry['size']:
+            result = {'checked': [], 'mismatched': [], 'bytes_read': 0, 'coverage': 0.0,
+                      'size_changed': True}
+        else:
+            result = sampled_verify(ref['path'], entry['hashes'], entry['range_size'],
+                                    samples, data.get('seed'))
+        
+        return jsonify(dict(
+            result,
+            success=True,
+            verified=not result['mismatched'] and not result.get('size_changed'),
+            filename=data['filename'],
+            range_size=entry['range_size'],
+            mismatched_ranges=[{'offset': i * entry['range_size'], 'length': entry['range_size']}
+                               for i in result['mismatched']],
+            timestamp=datetime.now().isoformat()
+        ))
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/signature', methods=['GET'])
+def api_block_signature():
+    """
+    NEW API ENDPOINT: rsync-style block signature of a stored file
+    
+    First half of a delta re-upload (see /api/delta). Signatures are
+    cached per content and block size, so repeated edits of the same
+    version cost no hashing.
+    
+    GET /api/signature?filename=big.iso&block_size=65536
+    
+    block_size is optional; by default it is about sqrt(file size).
+    
+    Returns:
+        JSON with the file's hash, size, block_size and two parallel
+        lists: weak (Adler-32 as zlib.adler32() computes it) and strong
+        (hex SHA-256) per block. The last block may be short.
+    """
+    try:
+        filename = request.args.get('filename')
+        if not filename:
+            return jsonify({'success': False, 'error': 'Missing filename'}), 400
+        
+        ref = content_store.resolve(filename)
+        if ref is None:
+            return jsonify({'success': False, 'error': 'File not found'}), 404
+        
+        try:
+            block_size = int(request.args.get('block_size') or default_delta_block_size(ref['size']))
+        except ValueError:
+            return jsonify({'success': False, 'error': 'block_size must be an integer'}), 400
+        if not DELTA_MIN_BLOCK_SIZE <= block_size <= DELTA_MAX_BLOCK_SIZE:
+            return jsonify({
+                'success': False,
+                'error': f'block_size must be between {DELTA_MIN_BLOCK_SIZE} and {DELTA_MAX_BLOCK_SIZE}'
+            }), 400
+        
+        weak, strong = signature_cache.get(ref['sha256'], block_size)
+        return jsonify({
+            'success': True,
+            'filename': filename,
+            'hash': ref['sha256'],
+            'size': ref['size'],
+            'block_size': block_size,
+            'weak': weak,
+            'strong': strong
+        })
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/delta', methods=['POST'])
+def api_apply_delta():
+    """
+    NEW API ENDPOINT: Store a new version of a file from a delta
+    
+    Rebuilds the file from a stored base version plus the client's delta,
+    stores it like an upload and returns its SHA-256. The body can be
+    sent with Content-Encoding: gzip or zstd to shrink the literals too.
+    
+    Request JSON:
+        {
+            "base": "big.iso",               // stored file the delta is against
+            "base_hash": "a1b2...",          // optional, signature's hash (409 if stale)
+            "filename": "big.iso",           // optional, name to store as (default: base)
+            "block_size": 65536,             // block size of the signature used
+            "expected_hash": "c3d4...",      // optional, SHA-256 of the new file
+            "instructions": [
+                {"copy": 0, "count": 12},    // reuse base blocks 0..11
+                {"data": "<base64>"},        // new bytes
+                {"copy": 13}
+            ]
+        }
+    
+    Returns:
+        JSON with filename, hash, size, duplicate, and how many bytes were
+        copied from the base vs sent as literals; 422 if expected_hash
+        doesn't match, 413 if the result would exceed DELTA_MAX_OUTPUT
+    """
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'success': False, 'error': 'Expected a JSON object'}), 400
+        for field in ('base', 'base_hash', 'filename', 'expected_hash'):
+            if data.get(field) is not None and not isinstance(data[field], str):
+                return jsonify({'success': False, 'error': f'{field} must be a string'}), 400
+        
+        base = data.get('base')
+        filename = data.get('filename') or base
+        try:
+            block_size = int(data.get('block_size', 0))
+        except (TypeError, ValueError):
+            block_size = 0
+        if not base or not DELTA_MIN_BLOCK_SIZE <= block_size <= DELTA_MAX_BLOCK_SIZE:
+            return jsonify({'success': False, 'error': 'Missing base or bad block_size'}), 400
+        
+        ref = content_store.resolve(base)
+        if ref is None:
+            return jsonify({'success': False, 'error': 'Base file not found'}), 404
+        if data.get('base_hash') and data['base_hash'].lower() != ref['sha256']:
+            return jsonify({
+                'success': False,
+                'error': 'Base file has changed since the signature was taken',
+                'hash': ref['sha256']
+            }), 409
+        
+        try:
+            ops = parse_delta(data.get('instructions'), ref['size'], block_size,
+                              app.config['DELTA_MAX_OUTPUT'])
+        except DeltaError as e:
+            return jsonify({'success': False, 'error': str(e)}), e.status
+        
+        fd, tmp_path = tempfile.mkstemp(dir=app.config['UPLOAD_FOLDER'], prefix='.delta-')
+        try:
+            with os.fdopen(fd, 'wb') as out_file:
+                result = apply_delta(ref['path'], ops, out_file)
+            
+            expected_hash = (data.get('expected_hash') or '').strip().lower()
+            if expected_hash and result['sha256'] != expected_hash:
+                raise DeltaError('Rebuilt file does not match expected_hash', 422)
+            
+            is_new = content_store.add_file(tmp_path, result['sha256'])
+        except DeltaError as e:
+            os.remove(tmp_path)
+            return jsonify({'success': False, 'error': str(e)}), e.status
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        
+        content_store.set_ref(filename, result['sha256'], result['size'])
+        hash_catalog.record(result['sha256'], result['size'], filename)
+        blob_stored(result['sha256'], is_new)
+        
+        return jsonify({
+            'success': True,
+            'filename': filename,
+            'hash': result['sha256'],
+            'size': result['size'],
+            'duplicate': not is_new,
+            'copied_bytes': result['copied_bytes'],
+            'literal_bytes': result['literal_bytes'],
+            'timestamp': datetime.now().isoformat()
+        })
+        
+    except (CorruptEncodingError, DecodedTooLargeError):
+        raise
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/uploads', methods=['POST'])
+def api_create_upload():
+    """
+    NEW API ENDPOINT: Start a resumable upload
+    
+    Large files are sent as numbered chunks, each with its own SHA-256,
+    so a dropped connection only costs the chunk in flight. The total
+    size is not limited by MAX_CONTENT_LENGTH, only each chunk is.
+    
+    Usage from JavaScript:
+        // 1. Create the session
+        let res = await fetch('http://localhost:5000/api/uploads', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({filename: file.name, size: file.size, sha256: fileHash})
+        });
+        const session = await res.json();
+        
+        // 2. PUT every chunk listed in session.missing
+        for (const i of session.missing) {
+            const chunk = file.slice(i * session.chunk_size, (i + 1) * session.chunk_size);
+            await fetch(`http://localhost:5000/api/uploads/${session.upload_id}/chunks/${i}`, {
+                method: 'PUT',
+                headers: {'X-Chunk-SHA256': await calculateSHA256(chunk)},
+                body: chunk
+            });
+        }
+        
+        // 3. Finalize
+        res = await fetch(`http://localhost:5000/api/uploads/${session.upload_id}/complete`,
+                          {method: 'POST'});
+    
+    To resume, GET /api/uploads/<upload_id> and send the chunks in 'missing'.
+    
+    Request JSON:
+        filename, size, and optionally chunk_size and sha256 (expected hash)
+    
+    Returns:
+        JSON with upload_id, chunk_size, chunk_count and missing chunks
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        try:
+            size = int(data.get('size', -1))
+            chunk_size = int(data.get('chunk_size', app.config['RESUMABLE_CHUNK_SIZE']))
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'size and chunk_size must be integers'}), 400
+        expected_hash = data.get('sha256')
+        if expected_hash is not None and not isinstance(expected_hash, str):
+            return jsonify({'success': False, 'error': 'sha256 must be a string'}), 400
+        session = upload_sessions.create(data.get('filename'), size, chunk_size, expected_hash)
+        return jsonify(dict(session, success=True)), 201
+    
+    except UploadSessionError as e:
+        return jsonify({'success': False, 'error': str(e)}), e.status
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+def api_upload_status(upload_id):
+    """
+    NEW API ENDPOINT: Which chunks of a resumable upload have arrived
+    
+    Returns:
+        JSON with the session state and 'received'/'missing' chunk lists
+    """
+    try:
+        return jsonify(dict(upload_sessions.status(upload_id), success=True))
+    except UploadSessionError as e:
+        return jsonify({'success': False, 'error': str(e)}), e.status
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/uploads/<upload_id>/chunks/<int:index>', methods=['PUT'])
+def api_upload_chunk(upload_id, index):
+    """
+    NEW API ENDPOINT: Upload one chunk of a resumable upload
+    
+    The raw request body is the chunk. Its SHA-256 goes in the
+    X-Chunk-SHA256 header; a chunk that does not match is rejected with
+    422 and can simply be sent again.
+    
+    Returns:
+        JSON with the updated session state
+    """
+    try:
+        session = upload_sessions.write_chunk(
+            upload_id, index, request.stream, request.headers.get('X-Chunk-SHA256'))
+        return jsonify(dict(session, success=True))
+    except UploadSessionError as e:
+        return jsonify({'success': False, 'error': str(e)}), e.status
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/uploads/<upload_id>/complete', methods=['POST'])
+def api_complete_upload(upload_id):
+    """
+    NEW API ENDPOINT: Finalize a resumable upload
+    
+    Checks that every chunk has arrived and that the whole-file SHA-256
+    matches the hash given when the session was created, then stores the
+    file like a normal /upload.
+    
+    Returns:
+        JSON with filename, hash, size and duplicate flag
+    """
+    try:
+        result = upload_sessions.finalize(upload_id)
+        return jsonify(dict(result, success=True, timestamp=datetime.now().isoformat()))
+    except UploadSessionError as e:
+        return jsonify({'success': False, 'error': str(e)}), e.status
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/uploads/<upload_id>', methods=['DELETE'])
+def api_abort_upload(upload_id):
+    """
+    NEW API ENDPOINT: Abandon a resumable upload and delete its chunks
+    """
+    try:
+        upload_sessions.abort(upload_id)
+        return jsonify({'success': True})
+    except UploadSessionError as e:
+        return jsonify({'success': False, 'error': str(e)}), e.status
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/jobs', methods=['POST'])
+def api_submit_job():
+    """
+    NEW API ENDPOINT: Queue a hash or verify job on a stored file
+    
+    Returns immediately with a job ID; the file is hashed by a job worker.
+    Follow the job by polling /api/jobs/<id> or by subscribing to
+    /api/jobs/<id>/events (server-sent events).
+    
+    Request JSON:
+        {
+            "type": "verify",              // or "hash"
+            "filename": "backup.tar",
+            "expected_hash": "...",        // verify jobs only
+            "algorithms": ["md5"]          // optional extra digests
+        }
+    
+    Usage from JavaScript:
+        const {job_id} = await (await fetch('/api/jobs', {...})).json();
+        const events = new EventSource(`/api/jobs/${job_id}/events`);
+        events.addEventListener('progress', e => show(JSON.parse(e.data)));
+        events.addEventListener('done', e => { events.close(); ... });
+    
+    Returns:
+        JSON with job_id and the status and events URLs (202 Accepted)
+    """
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'success': False, 'error': 'Expected a JSON object'}), 400
+        job_id = job_queue.submit(data.get('type', 'hash'), data)
+        return jsonify({
+            'success': True,
+            'job_id': job_id,
+            'status_url': f'/api/jobs/{job_id}',
+            'events_url': f'/api/jobs/{job_id}/events'
+        }), 202
+    except JobError as e:
+        return jsonify({'success': False, 'error': str(e)}), e.status
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def api_job_status(job_id):
+    """
+    NEW API ENDPOINT: Job status and progress
+    
+    Returns:
+        JSON with status (queued, running, done, failed, cancelled),
+        bytes processed, percent, ETA while running and the result
+    """
+    try:
+        job = job_queue.get(job_id)
+        if job is None:
+            return jsonify({'success': False, 'error': 'Unknown job'}), 404
+        return jsonify(dict(job, success=True))
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+# Seconds between keepalive comments on an idle job event stream
+JOB_EVENTS_KEEPALIVE = 15
+JOB_EVENTS_RETRY_AFTER = 5
+_job_event_streams = threading.BoundedSemaphore(app.config['JOB_EVENTS_MAX_STREAMS'])
+
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def api_job_events(job_id):
+    """
+    NEW API ENDPOINT: Job progress as server-sent events
+    
+    Sends a 'progress' event whenever the job's state changes and a
+    final 'done' event (with the result or error) when it finishes.
+    
+    Every stream holds a request thread, so each process serves at most
+    JOB_EVENTS_MAX_STREAMS of them (503 beyond that) and ends a stream
+    after JOB_EVENTS_MAX_SECONDS; EventSource reconnects by itself. A
+    keepalive comment is sent when nothing else has been for a while,
+    which is also how a client that went away is noticed.
+    """
+    if job_queue.get(job_id) is None:
+        return jsonify({'success': False, 'error': 'Unknown job'}), 404
+    if not _job_event_streams.acquire(blocking=False):
+        response = jsonify({'success': False, 'error': 'Too many event streams; poll the job instead',
+                            'retry_after': JOB_EVENTS_RETRY_AFTER})
+        response.headers['Retry-After'] = str(JOB_EVENTS_RETRY_AFTER)
+        return response, 503
+    
+    def generate():
+        last = None
+        now = time.monotonic()
+        deadline = now + app.config['JOB_EVENTS_MAX_SECONDS']
+        keepalive_at = now + JOB_EVENTS_KEEPALIVE
+        while True:
+            job = job_queue.get(job_id)
+            if job is None:
+                return  # Purged
+            finished = job['status'] not in ('queued', 'running')
+            state = (job['status'], job['processed_bytes'])
+            now = time.monotonic()
+            if finished or state != last:
+                event = 'done' if finished else 'progress'
+                yield f"event: {event}\ndata: {json.dumps(job)}\n\n"
+                last = state
+                keepalive_at = now + JOB_EVENTS_KEEPALIVE
+            elif now >= keepalive_at:
+                yield ": keepalive\n\n"
+                keepalive_at = now + JOB_EVENTS_KEEPALIVE
+            if finished or now >= deadline:
+                return
+            time.sleep(JobQueue.HEARTBEAT_INTERVAL)
+    
+    released = []
+    
+    def release():
+        # The server closes the response however the stream ended
+        if not released:
+            released.append(True)
+            _job_event_streams.release()
+    
+    response = Response(generate(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(release)
+    return response
+
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def api_cancel_job(job_id):
+    """
+    NEW API ENDPOINT: Cancel a queued or running job
+    """
+    try:
+        if not job_queue.cancel(job_id):
+            return jsonify({'success': False, 'error': 'Unknown or finished job'}), 404
+        return jsonify({'success': True, 'job_id': job_id, 'status': 'cancelled'})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/scrub', methods=['GET'])
+def api_scrub_status():
+    """
+    NEW API ENDPOINT: Background scrubber progress
+    
+    Returns:
+        JSON with the current pass, position, files/bytes checked in this
+        pass, mismatch count and the configured limits
+    """
+    try:
+        return jsonify(dict(scrubber.status(), success=True))
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/scrub/mismatches', methods=['GET'])
+def api_scrub_mismatches():
+    """
+    NEW API ENDPOINT: Stored files that failed re-verification
+    
+    Each entry has the expected SHA-256 (the blob name), the hash that was
+    actually read (or the read error), when it was detected, and the
+    filenames that point at the damaged blob.
+    
+    Returns:
+        JSON with the list of mismatches
+    """
+    try:
+        limit = request.args.get('limit', 1000, type=int)
+        mismatches = scrubber.mismatches(limit)
+        return jsonify({'success': True, 'count': len(mismatches), 'mismatches': mismatches})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+def admin_auth_error():
+    """
+    Check the request's admin credentials.
+    
+    Admin endpoints need an "Authorization: Bearer <token>" header with
+    the token set in SHA256_ADMIN_TOKEN; without a configured token they
+    are switched off.
+    
+    Returns:
+        A (response, status) tuple to return, or None if authorized
+    """
+    token = app.config['ADMIN_TOKEN']
+    if not token:
+        return jsonify({'success': False,
+                        'error': 'Admin endpoints are disabled (set SHA256_ADMIN_TOKEN)'}), 403
+    scheme, _, supplied = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not hmac.compare_digest(supplied.strip().encode(), token.encode()):
+        response = jsonify({'success': False, 'error': 'Invalid or missing admin token'})
+        response.headers['WWW-Authenticate'] = 'Bearer'
+        return response, 401
+    return None
+
+
+@app.route('/api/scrub/<action>', methods=['POST'])
+def api_scrub_control(action):
+    """
+    NEW API ENDPOINT: Start or stop the background scrubber
+    
+    POST /api/scrub/start or /api/scrub/stop with the admin token (see
+    admin_auth_error()). Whichever worker answers, the scrubbing process
+    picks the change up within a second. Stopping checkpoints the
+    current position, so a later start continues from there.
+    """
+    try:
+        error = admin_auth_error()
+        if error is not None:
+            return error
+        if action not in ('start', 'stop'):
+            return jsonify({'success': False, 'error': 'Unknown action'}), 404
+        scrubber.set_enabled(action == 'start')
+        return jsonify(dict(scrubber.status(), success=True))
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/admission', methods=['GET'])
+def api_admission_status():
+    """
+    NEW API ENDPOINT: Admission control state
+    
+    Returns:
+        JSON with running hashing requests and bytes, queue depth, the
+        number admitted and rejected (by reason) and the configured limits
+    """
+    return jsonify(dict(admission.status(), success=True))
+
+
+@app.route('/api/hash-backends', methods=['GET'])
+def api_hash_backends():
+    """
+    NEW API ENDPOINT: Hash implementations in use
+    
+    Returns:
+        JSON with the registered backends and their algorithms, the backend
+        selected for each algorithm, operator overrides (SHA256_HASH_BACKEND)
+        and the startup benchmark results in MB/s
+    """
+    hash_backends.ensure_selected()
+    return jsonify(dict(hash_backends.status(), success=True))
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """
+    Prometheus metrics for the server.
+    
+    Under a multi-process server every process answers with the totals
+    of all of them (see Metrics). Exposes request counts, latency and request-size histograms per
+    route, error counts, in-flight requests, bytes hashed and a hashing
+    throughput histogram.
+    
+    Returns:
+        Metrics in the Prometheus text exposition format
+    """
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/demo')
+def demo():
+    """
+    API endpoint for SHA-256 demonstration.
+    
+    Returns:
+        JSON with example hashes showing how small changes affect output
+    """
+    return jsonify(demonstrate_sha256())
@@ -0,0 +1,333 @@
+"""
+Background integrity scrubber.
+"""
+
+import fcntl
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+from .config import app
+from .database import SQLiteDatabase
+from .hashing import HASH_BLOCK_SIZE, calculate_sha256
+from .store import content_store
+
+
+class RateLimiter:
+    """
+    Token bucket that limits how fast work is done.
+    
+    Args:
+        rate (float): Units allowed per second (0 or None = unlimited)
+        burst (float): Units that may be used at once (default: one second's worth)
+        stop_event (threading.Event): Cuts waits short when set
+    """
+    
+    def __init__(self, rate, burst=None, stop_event=None):
+        self.rate = rate
+        self.capacity = burst or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.stop_event = stop_event or threading.Event()
+    
+    def acquire(self, amount=1):
+        """Wait until ``amount`` units may be used."""
+        if not self.rate:
+            return
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # A request larger than the bucket is allowed once it is full
+            if self.tokens >= min(amount, self.capacity):
+                self.tokens -= amount
+                return
+            if self.stop_event.wait((min(amount, self.capacity) - self.tokens) / self.rate):
+                return
+
+
+class Scrubber(SQLiteDatabase):
+    """
+    Background thread that keeps re-verifying stored blobs.
+    
+    Blobs in the content store are named after their SHA-256, so each one
+    is re-hashed and compared with its own name, always reading the data
+    (the digest cache would hide bit rot). Reads are
+    throttled by a bytes-per-second and an I/O-per-second limit so the
+    scrubber does not starve foreground requests.
+    
+    Progress is checkpointed to scrub.db, so after a restart the scrubber
+    continues with the next blob instead of starting over. When a pass
+    finishes it waits pass_interval seconds and starts the next one.
+    
+    Only one process per store scrubs: serve() waits for a lock file
+    before doing anything. The prefork server runs it in a child process
+    of its own; other servers run it on a thread (start()), and whichever
+    process gets the lock scrubs. Any process can switch scrubbing on or
+    off with set_enabled(), which the scrubbing process picks up from
+    scrub.db within a second; it also publishes a heartbeat and its
+    position there, so status() is right in every process.
+    
+    Args:
+        store (ContentStore): Store to scrub
+        max_bytes_per_sec (int): Read bandwidth limit (0 = unlimited)
+        max_iops (int): Read operations per second limit (0 = unlimited)
+        pass_interval (float): Seconds to wait between full passes
+        checkpoint_every (float): Seconds between progress checkpoints
+    """
+    
+    def __init__(self, store, max_bytes_per_sec=0, max_iops=0, pass_interval=3600,
+                 checkpoint_every=10):
+        super().__init__(os.path.join(store.root, 'scrub.db'))
+        self.store = store
+        self.max_bytes_per_sec = max_bytes_per_sec
+        self.max_iops = max_iops
+        self.pass_interval = pass_interval
+        self.checkpoint_every = checkpoint_every
+        self.block_size = HASH_BLOCK_SIZE
+        self._stop = threading.Event()
+        self._thread = None
+        self._enabled = False
+        self._next_poll = 0.0
+        self.current = None
+    
+    def _setup(self, conn):
+        conn.execute("CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS mismatches (
+                sha256 TEXT PRIMARY KEY,
+                path TEXT NOT NULL,
+                actual TEXT,
+                detected TEXT NOT NULL
+            )""")
+    
+    # -- persistent state --
+    
+    def _get_state(self):
+        with self._connect() as conn:
+            state = dict(conn.execute("SELECT key, value FROM state"))
+        state.setdefault('pass', 1)
+        state.setdefault('position', '')
+        state.setdefault('files_checked', 0)
+        state.setdefault('bytes_checked', 0)
+        state.setdefault('enabled', 0)
+        state.setdefault('heartbeat', 0)
+        return state
+    
+    def _save_state(self, **values):
+        with self._connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO state VALUES (?, ?)", values.items())
+    
+    # Seconds between the scrubbing process's looks at scrub.db
+    POLL_INTERVAL = 1.0
+    # Seconds between attempts to take over the lock from another process
+    LOCK_RETRY = 5.0
+    
+    def set_enabled(self, enabled):
+        """Switch scrubbing on or off, for whichever process does it."""
+        self._save_state(enabled=int(bool(enabled)))
+    
+    def _poll(self):
+        """
+        Publish a heartbeat and return whether scrubbing is enabled.
+        
+        Touches scrub.db at most once per POLL_INTERVAL, so this is cheap
+        enough to call for every blob and every block read.
+        """
+        now = time.monotonic()
+        if now >= self._next_poll:
+            self._next_poll = now + self.POLL_INTERVAL
+            self._save_state(heartbeat=time.time(), owner_pid=os.getpid(),
+                             current=self.current or '')
+            self._enabled = bool(self._get_state()['enabled'])
+        return self._enabled
+    
+    # -- scrubbing --
+    
+    def iter_blobs(self, after=''):
+        """
+        Yield (sha256, path) for every blob, in digest order.
+        
+        Args:
+            after (str): Only yield blobs whose digest sorts after this one
+        """
+        self.store.setup()
+        objects_dir = self.store.objects_dir
+        for shard1 in sorted(os.listdir(objects_dir)):
+            if shard1 < after[:2]:
+                continue
+            shard1_dir = os.path.join(objects_dir, shard1)
+            for shard2 in sorted(os.listdir(shard1_dir)):
+                if shard1 + shard2 < after[:4]:
+                    continue
+                shard2_dir = os.path.join(shard1_dir, shard2)
+                for name in sorted(os.listdir(shard2_dir)):
+                    if name > after and not name.startswith('.'):
+                        yield name, os.path.join(shard2_dir, name)
+    
+    def scrub_pass(self):
+        """
+        Verify blobs from the last checkpoint to the end of the store.
+        
+        Returns:
+            bool: True if the pass completed, False if it was stopped
+        """
+        state = self._get_state()
+        bandwidth = RateLimiter(self.max_bytes_per_sec, stop_event=self._stop)
+        iops = RateLimiter(self.max_iops, stop_event=self._stop)
+        
+        def throttle(nbytes):
+            iops.acquire(1)
+            bandwidth.acquire(nbytes)
+            self._poll()
+        
+        files_checked = state['files_checked']
+        bytes_checked = state['bytes_checked']
+        last_checkpoint = time.monotonic()
+        position = state['position']
+        
+        for sha256_hex, path in self.iter_blobs(position):
+            if self._stop.is_set() or not self._poll():
+                break
+            self.current = sha256_hex
+            try:
+                iops.acquire(1)  # open + stat
+                size = os.path.getsize(path)
+                # Always read the data (the digest cache would hide bit rot),
+                # and keep what was read for the report
+                actual = calculate_sha256(path, use_cache=False, throttle=throttle)
+                if actual != sha256_hex:
+                    self.record_mismatch(sha256_hex, path, actual)
+                else:
+                    self.clear_mismatch(sha256_hex)
+                files_checked += 1
+                bytes_checked += size
+            except FileNotFoundError:
+                pass  # Removed since the directory was listed
+            except OSError as e:
+                self.record_mismatch(sha256_hex, path, f'error: {e}')
+            
+            position = sha256_hex
+            if time.monotonic() - last_checkpoint >= self.checkpoint_every:
+                self._save_state(position=position, files_checked=files_checked,
+                                 bytes_checked=bytes_checked)
+                last_checkpoint = time.monotonic()
+        
+        self.current = None
+        if self._stop.is_set() or not self._enabled:
+            self._save_state(position=position, files_checked=files_checked,
+                             bytes_checked=bytes_checked)
+            return False
+        
+        self._save_state(**{'pass': state['pass'] + 1, 'position': '', 'files_checked': 0,
+                            'bytes_checked': 0, 'last_pass_completed': datetime.now().isoformat(),
+                            'last_pass_files': files_checked})
+        return True
+    
+    def record_mismatch(self, sha256_hex, path, actual):
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO mismatches VALUES (?, ?, ?, ?)",
+                         (sha256_hex, path, actual, datetime.now().isoformat()))
+    
+    def clear_mismatch(self, sha256_hex):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM mismatches WHERE sha256 = ?", (sha256_hex,))
+    
+    def mismatches(self, limit=1000):
+        """
+        Return blobs that failed verification, with the filenames using them.
+        
+        Returns:
+            list: dicts with sha256, path, actual hash, detected time, filenames
+        """
+        with self._connect() as conn:
+            rows = conn.execute("SELECT sha256, path, actual, detected FROM mismatches "
+                                "ORDER BY detected DESC LIMIT ?", (limit,)).fetchall()
+        with self.store._connect() as conn:
+            return [{
+                'sha256': sha256_hex, 'path': path, 'actual': actual, 'detected': detected,
+                'filenames': [row[0] for row in conn.execute(
+                    "SELECT name FROM refs WHERE sha256 = ?", (sha256_hex,))]
+            } for sha256_hex, path, actual, detected in rows]
+    
+    # -- process control --
+    
+    def serve(self, stop_event=None):
+        """
+        Be the scrubbing process until ``stop_event`` is set.
+        
+        Waits for the store's lock, then scrubs while scrubbing is enabled
+        and idles while it is not. Blocks; see start() for a thread.
+        
+        Args:
+            stop_event (threading.Event): Set to stop (checkpointing first)
+        """
+        if stop_event is not None:
+            self._stop = stop_event
+        self.store.setup()
+        lock_file = open(os.path.join(self.store.root, 'scrub.lock'), 'w')
+        owner = False
+        try:
+            while not owner:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    owner = True
+                except OSError:
+                    if self._stop.wait(self.LOCK_RETRY):
+                        return
+            
+            while not self._stop.is_set():
+                if not self._poll():
+                    self._stop.wait(self.POLL_INTERVAL)
+                    continue
+                try:
+                    completed = self.scrub_pass()
+                except Exception as e:
+                    print(f"scrubber error: {e}", file=sys.stderr)
+                    completed = True
+                if completed:
+                    resume = time.monotonic() + self.pass_interval
+                    while time.monotonic() < resume and self._poll():
+                        if self._stop.wait(min(self.POLL_INTERVAL, resume - time.monotonic())):
+                            break
+        finally:
+            if owner:
+                self._save_state(heartbeat=0)
+            lock_file.close()
+    
+    def start(self):
+        """Run serve() in a daemon thread of this process."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self.serve, name='sha256-scrubber', daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout=None):
+        """Stop the thread started by start() after checkpointing its position."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+    
+    def status(self):
+        """Return progress and configuration as a dict."""
+        state = self._get_state()
+        with self._connect() as conn:
+            mismatch_count = conn.execute("SELECT COUNT(*) FROM mismatches").fetchone()[0]
+        # Running means some process holds the lock and is answering
+        alive = time.time() - float(state.pop('heartbeat')) < 3 * self.POLL_INTERVAL + 1
+        state['enabled'] = bool(state['enabled'])
+        return dict(state, running=alive and state['enabled'],
+                    current=(state.get('current') or None) if alive else None,
+                    owner_pid=state.get('owner_pid') if alive else None,
+                    mismatches=mismatch_count, max_bytes_per_sec=self.max_bytes_per_sec,
+                    max_iops=self.max_iops, pass_interval=self.pass_interval)
+
+
+scrubber = Scrubber(content_store,
+                    max_bytes_per_sec=app.config['SCRUB_MAX_BYTES_PER_SEC'],
+                    max_iops=app.config['SCRUB_MAX_IOPS'],
+                    pass_interval=app.config['SCRUB_PASS_INTERVAL'])
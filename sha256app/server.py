@@ -0,0 +1,306 @@
+"""
+Pre-fork production server.
+
+A pre-fork server so CPU-bound hashing can use every core: the master
+process binds the port and forks worker processes, and each worker
+accepts connections on the shared socket and serves them from a fixed
+pool of threads. The master only supervises:
+
+    SIGTERM / SIGINT   graceful shutdown (workers finish in-flight requests)
+    SIGHUP             graceful reload: the master re-executes itself,
+                       so new code is loaded, starts fresh workers and
+                       then drains the old ones; the port stays open
+    SIGTTIN / SIGTTOU  one worker more / less
+
+Background tasks (the integrity scrubber) get a child process each,
+which the master restarts if it dies and stops with the workers.
+
+Workers that die are replaced, and with max_requests set every worker
+is recycled after that many requests (plus some jitter so they do not
+all restart at once), which caps slow memory growth.
+
+Any WSGI server also works, e.g. gunicorn -w 8 --threads 4 SHA256:app
+"""
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class _WorkerRequestHandler(WSGIRequestHandler):
+    # Close idle keep-alive connections so they cannot hold a thread forever
+    timeout = 5
+
+
+class _PooledWSGIServer(BaseWSGIServer):
+    """
+    Werkzeug WSGI server that handles requests on a fixed thread pool.
+    
+    A connection is only accepted when a thread is free, so a busy
+    worker leaves new connections to the other workers instead of
+    queueing them behind its own.
+    """
+    
+    multithread = True
+    
+    def __init__(self, host, port, app, threads, fd):
+        super().__init__(host, port, app, handler=_WorkerRequestHandler, fd=fd)
+        # Every worker is woken for a new connection; the ones that lose
+        # the race must not block in accept()
+        self.socket.setblocking(False)
+        self.pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='sha256-http')
+        self.free_threads = threading.Semaphore(threads)
+    
+    def get_request(self):
+        self.free_threads.acquire()
+        try:
+            return super().get_request()
+        except BaseException:
+            self.free_threads.release()
+            raise
+    
+    def process_request(self, request, client_address):
+        self.pool.submit(self._process, request, client_address)
+    
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self.free_threads.release()
+
+
+class PreforkServer:
+    """
+    Multi-process server for a WSGI app (see the section comment above).
+    
+    Args:
+        app: WSGI application
+        host (str): Address to bind
+        port (int): Port to bind
+        workers (int): Number of worker processes
+        threads (int): Request threads per worker
+        max_requests (int): Recycle a worker after this many requests (0 = never)
+        max_requests_jitter (int): Up to this many extra requests, chosen per worker
+        graceful_timeout (float): Seconds workers get to finish before being killed
+        post_fork (callable): Called as post_fork(server) in each new worker
+        worker_exit (callable): Called as worker_exit(server) in a worker before it exits
+        background (list): Callables to run in a child process each, as
+            task(stop_event); they should return soon after stop_event is set
+    """
+    
+    LISTEN_FD_ENV = 'SHA256_LISTEN_FD'
+    OLD_WORKERS_ENV = 'SHA256_OLD_WORKERS'
+    
+    def __init__(self, app, host='0.0.0.0', port=5000, workers=None, threads=8,
+                 max_requests=0, max_requests_jitter=0, graceful_timeout=30, post_fork=None,
+                 worker_exit=None, background=()):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.num_workers = workers or os.cpu_count() or 1
+        self.threads = threads
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.graceful_timeout = graceful_timeout
+        self.post_fork = post_fork
+        self.worker_exit = worker_exit
+        self.background = list(background)
+        self.background_pids = {}         # task index -> pid
+        self.workers = set()
+        self.socket = None
+        self._signals = deque()
+    
+    # -- master --
+    
+    def _listen(self):
+        fd = os.environ.pop(self.LISTEN_FD_ENV, None)
+        if fd is not None:
+            # Re-executed by a reload: keep serving on the inherited socket
+            sock = socket.socket(fileno=int(fd))
+        else:
+            sock = socket.create_server((self.host, self.port), backlog=2048, reuse_port=False)
+        sock.set_inheritable(True)
+        return sock
+    
+    def run(self):
+        """Serve until SIGTERM or SIGINT; returns the exit code."""
+        self.socket = self._listen()
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGTTIN, signal.SIGTTOU):
+            signal.signal(sig, lambda signum, frame: self._signals.append(signum))
+        
+        # Workers left over from before a reload are still our children
+        old_workers = [int(pid) for pid in os.environ.pop(self.OLD_WORKERS_ENV, '').split(',') if pid]
+        
+        print(f"Serving on http://{self.host}:{self.port} with {self.num_workers} workers "
+              f"x {self.threads} threads (master pid {os.getpid()})", file=sys.stderr)
+        for _ in range(self.num_workers):
+            self._spawn()
+        self._stop_workers(old_workers)
+        background_started = {}
+        
+        while True:
+            self._reap()
+            while self._signals:
+                signum = self._signals.popleft()
+                if signum in (signal.SIGTERM, signal.SIGINT):
+                    self._shutdown()
+                    return 0
+                if signum == signal.SIGHUP:
+                    self._reload()
+                elif signum == signal.SIGTTIN:
+                    self.num_workers += 1
+                elif signum == signal.SIGTTOU and self.num_workers > 1:
+                    self.num_workers -= 1
+                    self._stop_workers([next(iter(self.workers))])
+            while len(self.workers) < self.num_workers:
+                self._spawn()
+            for index in range(len(self.background)):
+                # A task that keeps failing is restarted at most once a second
+                if (index not in self.background_pids
+                        and time.monotonic() - background_started.get(index, -1.0) >= 1.0):
+                    background_started[index] = time.monotonic()
+                    self._spawn_background(index)
+            time.sleep(0.2)
+    
+    def _spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                code = self._worker_main()
+            finally:
+                os._exit(code)
+        self.workers.add(pid)
+    
+    def _spawn_background(self, index):
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                code = self._background_main(self.background[index])
+            finally:
+                os._exit(code)
+        self.background_pids[index] = pid
+    
+    def _reap(self):
+        while True:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            self.workers.discard(pid)
+            for index, task_pid in list(self.background_pids.items()):
+                if task_pid == pid:
+                    del self.background_pids[index]
+    
+    def _stop_workers(self, pids):
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+            self.workers.discard(pid)
+    
+    def _shutdown(self):
+        pids = list(self.workers) + list(self.background_pids.values())
+        self._stop_workers(pids)
+        self.background_pids.clear()
+        deadline = time.monotonic() + self.graceful_timeout
+        for pid in pids:
+            while True:
+                try:
+                    done, _ = os.waitpid(pid, os.WNOHANG)
+                except ChildProcessError:
+                    break
+                if done:
+                    break
+                if time.monotonic() > deadline:
+                    os.kill(pid, signal.SIGKILL)
+                    os.waitpid(pid, 0)
+                    break
+                time.sleep(0.1)
+        self.socket.close()
+    
+    def _reload(self):
+        print("Reloading: starting new workers with fresh code", file=sys.stderr)
+        os.environ[self.LISTEN_FD_ENV] = str(self.socket.fileno())
+        os.environ[self.OLD_WORKERS_ENV] = ','.join(
+            str(pid) for pid in list(self.workers) + list(self.background_pids.values()))
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.execv(sys.executable, [sys.executable] + sys.argv)
+    
+    # -- worker --
+    
+    def _background_main(self, task):
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        for sig in (signal.SIGHUP, signal.SIGTTIN, signal.SIGTTOU):
+            signal.signal(sig, signal.SIG_DFL)
+        self.socket.close()
+        stop_event = threading.Event()
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+        task(stop_event)
+        return 0
+    
+    def _worker_main(self):
+        signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl-C is handled by the master
+        for sig in (signal.SIGHUP, signal.SIGTTIN, signal.SIGTTOU):
+            signal.signal(sig, signal.SIG_DFL)
+        if self.post_fork is not None:
+            self.post_fork(self)
+        
+        server = _PooledWSGIServer(self.host, self.port, None, self.threads, self.socket.fileno())
+        self.socket.close()
+        
+        limit = self.max_requests
+        if limit and self.max_requests_jitter:
+            limit += int.from_bytes(os.urandom(4), 'big') % (self.max_requests_jitter + 1)
+        state = {'handled': 0, 'draining': False}
+        lock = threading.Lock()
+        
+        def drain(*args):
+            with lock:
+                if state['draining']:
+                    return
+                state['draining'] = True
+            # shutdown() blocks until serve_forever() returns, so not in
+            # the serving thread
+            threading.Thread(target=server.shutdown, daemon=True).start()
+        
+        def app(environ, start_response):
+            with lock:
+                state['handled'] += 1
+                if limit and state['handled'] >= limit:
+                    drain_now = True
+                else:
+                    drain_now = False
+            if drain_now:
+                drain()
+            
+            def start(status, headers, exc_info=None):
+                if state['draining']:
+                    headers = [h for h in headers if h[0].lower() != 'connection']
+                    headers.append(('Connection', 'close'))
+                return start_response(status, headers, exc_info)
+            
+            return self.app(environ, start)
+        
+        server.app = app
+        signal.signal(signal.SIGTERM, drain)
+        server.serve_forever()
+        # Let requests already accepted finish before exiting
+        server.pool.shutdown(wait=True)
+        if self.worker_exit is not None:
+            self.worker_exit(self)
+        return 0
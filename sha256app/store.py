@@ -0,0 +1,305 @@
+"""
+Content-addressed, deduplicating storage of uploads, and the hash catalog.
+"""
+
+import os
+import time
+from datetime import datetime
+
+from .config import UPLOAD_FOLDER
+from .database import SQLiteDatabase
+
+
+class ContentStore(SQLiteDatabase):
+    """
+    Deduplicating, content-addressed storage for uploaded files.
+    
+    Every file is stored once as a blob named after its SHA-256, under
+    two levels of shard directories (objects/ab/cd/abcd...). Filenames
+    are only references kept in a small SQLite index, so uploading the
+    same content under ten names stores it once, and re-uploading a
+    name points it at the new blob instead of overwriting data in place.
+    
+    A blob that no name points at any more is deleted by gc() once it
+    has been unreferenced for GC_GRACE seconds. The grace period covers
+    an upload that found its content already stored and has not yet
+    pointed its name at it: such a hit touches the blob (add_stream(),
+    add_file()), and gc() leaves recently touched blobs alone.
+    
+    Args:
+        root (str): Directory holding objects/ and refs.db
+    
+    Layout:
+        root/objects/ab/cd/<sha256>    blob data
+        root/refs.db                   filename -> sha256, size, updated;
+                                       blobs left without a name, since when
+    """
+    
+    # Seconds a blob must be unreferenced (and untouched) before deletion
+    GC_GRACE = 3600
+    # Seconds between automatic sweeps, see set_ref()
+    GC_INTERVAL = 600
+    
+    def __init__(self, root):
+        self.root = root
+        self.objects_dir = os.path.join(root, 'objects')
+        super().__init__(os.path.join(root, 'refs.db'))
+        self._last_gc = time.monotonic()
+    
+    def _setup(self, conn):
+        os.makedirs(self.objects_dir, exist_ok=True)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS refs (
+                name TEXT PRIMARY KEY,
+                sha256 TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                updated TEXT NOT NULL
+            )""")
+        conn.execute("CREATE INDEX IF NOT EXISTS refs_sha256 ON refs (sha256)")
+        conn.execute("CREATE TABLE IF NOT EXISTS orphans (sha256 TEXT PRIMARY KEY, since REAL)")
+    
+    def blob_path(self, sha256_hex):
+        """Return the path where the blob with this digest lives."""
+        return os.path.join(self.objects_dir, sha256_hex[:2], sha256_hex[2:4], sha256_hex)
+    
+    def has_blob(self, sha256_hex):
+        """Return True if a blob with this digest is already stored."""
+        return os.path.exists(self.blob_path(sha256_hex))
+    
+    def add_stream(self, stream):
+        """
+        Store a HashingStream that has finished receiving its data.
+        
+        If a blob with the same digest already exists, the streamed copy
+        is left uncommitted (and deleted when the request closes) instead
+        of being written a second time.
+        
+        Args:
+            stream (HashingStream): Stream with a sink file in this store's
+                filesystem
+        
+        Returns:
+            bool: True if the content was new, False if it was a duplicate
+        """
+        sha256_hex = stream.hexdigest()
+        blob_path = self.blob_path(sha256_hex)
+        if self._claim(blob_path):
+            return False
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        stream.commit(blob_path)
+        return True
+    
+    @staticmethod
+    def _claim(blob_path):
+        """Touch an existing blob so gc() spares it; False if there is none."""
+        try:
+            os.utime(blob_path)
+            return True
+        except FileNotFoundError:
+            return False
+    
+    def add_file(self, file_path, sha256_hex):
+        """
+        Move a finished file into the store.
+        
+        Args:
+            file_path (str): File on the same filesystem as the store
+            sha256_hex (str): Its SHA-256
+        
+        Returns:
+            bool: True if the content was new, False if it was a duplicate
+                (the file is deleted instead of stored twice)
+        """
+        blob_path = self.blob_path(sha256_hex)
+        if self._claim(blob_path):
+            os.remove(file_path)
+            return False
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        os.replace(file_path, blob_path)
+        return True
+    
+    def set_ref(self, name, sha256_hex, size):
+        """
+        Point filename ``name`` at a stored blob.
+        
+        If that leaves the blob the name pointed at before without any
+        name, it is noted for gc(), which this also runs every
+        GC_INTERVAL seconds.
+        """
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            # gc() deletes inside the same kind of transaction, so the blob
+            # cannot vanish between this check and the new reference
+            if not os.path.exists(self.blob_path(sha256_hex)):
+                raise FileNotFoundError(f'Blob {sha256_hex} is no longer stored; upload it again')
+            old = conn.execute("SELECT sha256 FROM refs WHERE name = ?", (name,)).fetchone()
+            conn.execute("INSERT OR REPLACE INTO refs VALUES (?, ?, ?, ?)",
+                         (name, sha256_hex, size, datetime.now().isoformat()))
+            conn.execute("DELETE FROM orphans WHERE sha256 = ?", (sha256_hex,))
+            if old is not None and old[0] != sha256_hex and conn.execute(
+                    "SELECT 1 FROM refs WHERE sha256 = ? LIMIT 1", (old[0],)).fetchone() is None:
+                conn.execute("INSERT OR REPLACE INTO orphans VALUES (?, ?)", (old[0], time.time()))
+        
+        if time.monotonic() - self._last_gc >= self.GC_INTERVAL:
+            self._last_gc = time.monotonic()
+            self.gc()
+    
+    def gc(self, grace=None, full=False):
+        """
+        Delete blobs that no filename points at.
+        
+        Args:
+            grace (float): Only delete blobs unreferenced and untouched for
+                this many seconds (default GC_GRACE)
+            full (bool): Check every blob in the store instead of only the
+                ones set_ref() noted, e.g. for blobs orphaned before it
+                kept track
+        
+        Returns:
+            dict: Number of blobs and bytes deleted
+        """
+        cutoff = time.time() - (self.GC_GRACE if grace is None else grace)
+        conn = self._connect()
+        if full:
+            candidates = (name for shard1 in os.listdir(self.objects_dir)
+                          for shard2 in os.listdir(os.path.join(self.objects_dir, shard1))
+                          for name in os.listdir(os.path.join(self.objects_dir, shard1, shard2))
+                          if not name.startswith('.'))
+        else:
+            candidates = [row[0] for row in conn.execute(
+                "SELECT sha256 FROM orphans WHERE since < ?", (cutoff,))]
+        
+        deleted = freed = 0
+        for sha256_hex in candidates:
+            blob_path = self.blob_path(sha256_hex)
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                if conn.execute("SELECT 1 FROM refs WHERE sha256 = ? LIMIT 1",
+                                (sha256_hex,)).fetchone() is not None:
+                    conn.execute("DELETE FROM orphans WHERE sha256 = ?", (sha256_hex,))
+                    continue
+                try:
+                    st = os.stat(blob_path)
+                except FileNotFoundError:
+                    conn.execute("DELETE FROM orphans WHERE sha256 = ?", (sha256_hex,))
+                    continue
+                if st.st_mtime > cutoff:
+                    continue  # Just stored or claimed by a duplicate upload
+                os.remove(blob_path)
+                conn.execute("DELETE FROM orphans WHERE sha256 = ?", (sha256_hex,))
+            deleted += 1
+            freed += st.st_size
+        return {'deleted': deleted, 'bytes': freed}
+    
+    def resolve(self, name):
+        """
+        Look up a filename.
+        
+        Args:
+            name (str): Filename as uploaded
+        
+        Returns:
+            dict: sha256, size, updated and path of the blob, or None
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT sha256, size, updated FROM refs WHERE name = ?",
+                               (name,)).fetchone()
+        if row is None:
+            return None
+        return {'sha256': row[0], 'size': row[1], 'updated': row[2],
+                'path': self.blob_path(row[0])}
+
+
+content_store = ContentStore(UPLOAD_FOLDER)
+
+# HASH CATALOG
+
+class HashCatalog(SQLiteDatabase):
+    """
+    Index of every SHA-256 the server has computed.
+    
+    Each hashing route records the digest, size and filename it saw, so
+    a client can ask "do you already have this?" before uploading and
+    skip sending data the store already holds. Whether the content is
+    actually stored is answered by the content store; the catalog also
+    remembers hashes that were only calculated or verified.
+    
+    Args:
+        db_path (str): SQLite database file
+    
+    Tables:
+        hashes       sha256 -> size, first_seen, last_seen, times_seen
+        hash_names   (sha256, filename) pairs seen together
+    """
+    
+    # SQLite's default limit on host parameters per statement is 999
+    QUERY_BATCH = 500
+    
+    def _setup(self, conn):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS hashes (
+                sha256 TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                first_seen TEXT NOT NULL,
+                last_seen TEXT NOT NULL,
+                times_seen INTEGER NOT NULL DEFAULT 1
+            )""")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS hash_names (
+                sha256 TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                PRIMARY KEY (sha256, filename)
+            ) WITHOUT ROWID""")
+    
+    def record(self, sha256_hex, size, filename=None):
+        """Record one computed hash; see record_many()."""
+        self.record_many([(sha256_hex, size, filename)])
+    
+    def record_many(self, entries):
+        """
+        Record computed hashes in one transaction.
+        
+        Args:
+            entries (list): (sha256, size, filename) tuples; filename may be None
+        """
+        now = datetime.now().isoformat()
+        with self._connect() as conn:
+            conn.executemany("""
+                INSERT INTO hashes (sha256, size, first_seen, last_seen) VALUES (?, ?, ?, ?)
+                ON CONFLICT (sha256) DO UPDATE SET
+                    last_seen = excluded.last_seen, times_seen = times_seen + 1
+                """, [(sha256_hex, size, now, now) for sha256_hex, size, _ in entries])
+            conn.executemany("INSERT OR IGNORE INTO hash_names VALUES (?, ?)",
+                             [(sha256_hex, filename) for sha256_hex, _, filename in entries
+                              if filename])
+    
+    def lookup(self, hashes):
+        """
+        Look up many hashes at once.
+        
+        Args:
+            hashes (list): Hex SHA-256 strings
+        
+        Returns:
+            dict: sha256 -> {size, first_seen, last_seen, times_seen, filenames}
+                for the hashes that are in the catalog
+        """
+        found = {}
+        unique = list(dict.fromkeys(hashes))
+        with self._connect() as conn:
+            for start in range(0, len(unique), self.QUERY_BATCH):
+                batch = unique[start:start + self.QUERY_BATCH]
+                marks = ','.join('?' * len(batch))
+                for row in conn.execute(
+                        f"SELECT sha256, size, first_seen, last_seen, times_seen "
+                        f"FROM hashes WHERE sha256 IN ({marks})", batch):
+                    found[row[0]] = {'size': row[1], 'first_seen': row[2], 'last_seen': row[3],
+                                     'times_seen': row[4], 'filenames': []}
+                for sha256_hex, filename in conn.execute(
+                        f"SELECT sha256, filename FROM hash_names WHERE sha256 IN ({marks})", batch):
+                    found[sha256_hex]['filenames'].append(filename)
+        return found
+
+
+hash_catalog = HashCatalog(os.path.join(UPLOAD_FOLDER, 'catalog.db'))
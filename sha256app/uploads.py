@@ -0,0 +1,394 @@
+"""
+Resumable chunked uploads.
+"""
+
+import fcntl
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+from .config import UPLOAD_FOLDER, app
+from .backends import new_hash
+from .hashing import HASH_BLOCK_SIZE
+from .store import content_store, hash_catalog
+
+
+class UploadSessionError(Exception):
+    """Raised for a bad resumable-upload request; carries the HTTP status."""
+    
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class UploadSessions:
+    """
+    Resumable, chunked uploads with per-chunk integrity checks.
+    
+    A session is a directory under root/sessions/<upload_id>:
+        meta.json    filename, size, chunk_size, expected sha256
+        data         the file being assembled (chunks written in place)
+        chunks.log   one "index sha256" line per verified chunk
+        chunk-*      chunks still being received
+    
+    Chunks can arrive in any order and be retried. The whole-file SHA-256
+    is built up while chunks arrive: a chunk that continues the hashed
+    prefix is hashed straight from the request stream, so finalize()
+    normally has nothing left to read. Only chunks that arrived out of
+    order (or were received by another process) are read back, once.
+    
+    A chunk is received into its own file and checked before it is
+    copied into place, so a bad retry can never overwrite a chunk that
+    was already verified. Copying a chunk in, finishing and aborting
+    hold the session lock: a thread lock plus a file lock on chunks.log,
+    for the other server processes.
+    
+    A session that receives nothing for ttl seconds expires. Expired
+    sessions are refused and deleted when touched, and a sweep (run at
+    most every GC_INTERVAL seconds, when a session is created) deletes
+    the ones that are never touched again.
+    
+    Args:
+        root (str): Directory that holds the sessions/ folder
+        store (ContentStore): Where finished uploads are stored
+        max_size (int): Largest file a session may be created for
+        ttl (float): Seconds a session may sit idle before it expires
+    """
+    
+    # Seconds between sweeps for expired sessions
+    GC_INTERVAL = 600
+    
+    def __init__(self, root, store, max_size=None, ttl=24 * 3600):
+        self.sessions_dir = os.path.join(root, 'sessions')
+        self.store = store
+        self.max_size = max_size
+        self.ttl = ttl
+        self._last_gc = 0.0
+        self._lock = threading.Lock()     # guards the two dicts below
+        self._session_locks = {}          # upload_id -> lock for its data and running hash
+        # upload_id -> (sha256 object over chunks [0, next_index), next_index)
+        self._running = {}
+    
+    def _session_lock(self, upload_id):
+        with self._lock:
+            return self._session_locks.setdefault(upload_id, threading.Lock())
+    
+    @contextmanager
+    def _locked(self, upload_id, session_dir):
+        # Yields chunks.log, opened for appending, while the lock is held
+        with self._session_lock(upload_id):
+            try:
+                log = open(os.path.join(session_dir, 'chunks.log'), 'a')
+            except FileNotFoundError:
+                raise UploadSessionError('Unknown upload', 404)
+            with log:
+                fcntl.flock(log, fcntl.LOCK_EX)
+                if not os.path.isdir(session_dir):
+                    # Finished or aborted while we waited
+                    raise UploadSessionError('Unknown upload', 404)
+                yield log
+    
+    def _forget(self, upload_id):
+        with self._lock:
+            self._running.pop(upload_id, None)
+            self._session_locks.pop(upload_id, None)
+    
+    def _last_activity(self, session_dir):
+        # chunks.log is appended to (and touched) for every chunk
+        return os.path.getmtime(os.path.join(session_dir, 'chunks.log'))
+    
+    def _session_path(self, upload_id):
+        if not isinstance(upload_id, str) or len(upload_id) != 32 or \
+                any(c not in '0123456789abcdef' for c in upload_id):
+            raise UploadSessionError('Unknown upload', 404)
+        return os.path.join(self.sessions_dir, upload_id)
+    
+    def _session_dir(self, upload_id):
+        path = self._session_path(upload_id)
+        try:
+            expired = self.ttl and time.time() - self._last_activity(path) > self.ttl
+        except FileNotFoundError:
+            raise UploadSessionError('Unknown upload', 404)
+        if expired:
+            self._remove(upload_id)
+            raise UploadSessionError('Upload expired', 404)
+        return path
+    
+    def gc(self):
+        """
+        Delete sessions that have been idle for longer than the TTL.
+        
+        Returns:
+            int: Number of sessions deleted
+        """
+        removed = 0
+        now = time.time()
+        try:
+            upload_ids = os.listdir(self.sessions_dir)
+        except FileNotFoundError:
+            return 0  # No session was ever created
+        for upload_id in upload_ids:
+            session_dir = os.path.join(self.sessions_dir, upload_id)
+            try:
+                if now - self._last_activity(session_dir) <= self.ttl:
+                    continue
+            except FileNotFoundError:
+                # Half-created or half-deleted; judge it by the directory
+                try:
+                    if now - os.path.getmtime(session_dir) <= self.ttl:
+                        continue
+                except FileNotFoundError:
+                    continue
+            shutil.rmtree(session_dir, ignore_errors=True)
+            self._forget(upload_id)
+            removed += 1
+        return removed
+    
+    def create(self, filename, size, chunk_size, expected_hash=None):
+        """
+        Start a new upload session.
+        
+        Args:
+            filename (str): Name the finished file will be stored under
+            size (int): Total file size in bytes
+            chunk_size (int): Size of every chunk except the last
+            expected_hash (str): Optional SHA-256 the finished file must have
+        
+        Returns:
+            dict: Session state (see status())
+        """
+        if not filename or not isinstance(filename, str):
+            raise UploadSessionError('Missing filename')
+        if size < 0 or chunk_size <= 0:
+            raise UploadSessionError('Invalid size or chunk_size')
+        if self.max_size is not None and size > self.max_size:
+            raise UploadSessionError(f'size exceeds the {self.max_size} byte limit', 413)
+        if chunk_size > app.config['MAX_CONTENT_LENGTH']:
+            raise UploadSessionError('chunk_size exceeds the per-request limit')
+        
+        if self.ttl and time.monotonic() - self._last_gc >= self.GC_INTERVAL:
+            self._last_gc = time.monotonic()
+            self.gc()
+        
+        upload_id = uuid.uuid4().hex
+        session_dir = os.path.join(self.sessions_dir, upload_id)
+        os.makedirs(session_dir)
+        meta = {
+            'upload_id': upload_id,
+            'filename': filename,
+            'size': size,
+            'chunk_size': chunk_size,
+            'chunk_count': max(1, -(-size // chunk_size)),
+            'expected_hash': expected_hash.strip().lower() if expected_hash else None,
+            'created': datetime.now().isoformat()
+        }
+        with open(os.path.join(session_dir, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+        with open(os.path.join(session_dir, 'data'), 'wb') as f:
+            f.truncate(size)
+        open(os.path.join(session_dir, 'chunks.log'), 'w').close()
+        
+        with self._lock:
+            self._running[upload_id] = (new_hash(), 0)
+        return self.status(upload_id)
+    
+    def _load(self, upload_id):
+        session_dir = self._session_dir(upload_id)
+        with open(os.path.join(session_dir, 'meta.json')) as f:
+            meta = json.load(f)
+        received = {}
+        with open(os.path.join(session_dir, 'chunks.log')) as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 2:
+                    received[int(parts[0])] = parts[1]
+        return session_dir, meta, received
+    
+    def status(self, upload_id):
+        """
+        Report which chunks of an upload have been received.
+        
+        Returns:
+            dict: Session metadata plus 'received' and 'missing' chunk lists
+            and when the session expires if nothing more arrives
+        """
+        session_dir, meta, received = self._load(upload_id)
+        meta['received'] = sorted(received)
+        meta['missing'] = [i for i in range(meta['chunk_count']) if i not in received]
+        if self.ttl:
+            meta['expires'] = datetime.fromtimestamp(
+                self._last_activity(session_dir) + self.ttl).isoformat()
+        return meta
+    
+    def write_chunk(self, upload_id, index, stream, chunk_hash):
+        """
+        Receive one chunk, check its SHA-256 and write it in place.
+        
+        Args:
+            upload_id (str): Session ID
+            index (int): Chunk number, starting at 0
+            stream: Readable request body holding exactly this chunk
+            chunk_hash (str): SHA-256 the client computed for the chunk
+        
+        Returns:
+            dict: Updated session state
+        """
+        session_dir, meta, received = self._load(upload_id)
+        if not chunk_hash:
+            raise UploadSessionError('Missing chunk SHA-256')
+        if not 0 <= index < meta['chunk_count']:
+            raise UploadSessionError('Chunk index out of range')
+        
+        chunk_hash = chunk_hash.strip().lower()
+        if index in received:
+            # A retry of a chunk we already hold: nothing to write
+            if received[index] != chunk_hash:
+                raise UploadSessionError('Chunk was already received with a different SHA-256', 409)
+            return self.status(upload_id)
+        
+        offset = index * meta['chunk_size']
+        expected_length = min(meta['chunk_size'], meta['size'] - offset)
+        # A chunk being received counts as activity, so a slow one does
+        # not see its session swept away
+        os.utime(os.path.join(session_dir, 'chunks.log'))
+        
+        # If this chunk extends the hashed prefix, feed a copy of the
+        # running hash from the stream too, so it is never read back
+        session_lock = self._session_lock(upload_id)
+        with session_lock:
+            running = self._running.get(upload_id)
+        candidate = running[0].copy() if running and running[1] == index else None
+        
+        chunk_sha256 = new_hash()
+        length = 0
+        part_path = os.path.join(session_dir, f'chunk-{index}-{uuid.uuid4().hex}')
+        try:
+            part = open(part_path, 'wb')
+        except FileNotFoundError:
+            raise UploadSessionError('Unknown upload', 404)
+        
+        def store(block):
+            chunk_sha256.update(block)
+            if candidate is not None:
+                candidate.update(block)
+            part.write(block)
+        
+        try:
+            with part:
+                for block in iter(lambda: stream.read(HASH_BLOCK_SIZE), b""):
+                    length += len(block)
+                    if length > expected_length:
+                        raise UploadSessionError('Chunk is larger than expected')
+                    store(block)
+            
+            if length != expected_length:
+                raise UploadSessionError(f'Chunk must be {expected_length} bytes, got {length}')
+            if chunk_sha256.hexdigest() != chunk_hash:
+                raise UploadSessionError('Chunk SHA-256 mismatch', 422)
+            
+            # Only a verified chunk is copied into place
+            with self._locked(upload_id, session_dir) as log:
+                session_dir, meta, received = self._load(upload_id)
+                if index in received:
+                    # A concurrent retry got there first
+                    if received[index] != chunk_hash:
+                        raise UploadSessionError(
+                            'Chunk was already received with a different SHA-256', 409)
+                    return self.status(upload_id)
+                
+                fd = os.open(os.path.join(session_dir, 'data'), os.O_WRONLY)
+                try:
+                    with open(part_path, 'rb') as f:
+                        pos = offset
+                        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+                            os.pwrite(fd, block, pos)
+                            pos += len(block)
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+                
+                log.write(f"{index} {chunk_hash}\n")
+                log.flush()
+                received[index] = chunk_hash
+                
+                running = self._running.get(upload_id)
+                if candidate is not None and running and running[1] == index:
+                    self._running[upload_id] = (candidate, index + 1)
+                self._advance(upload_id, session_dir, meta, received)
+        finally:
+            try:
+                os.remove(part_path)
+            except FileNotFoundError:
+                pass
+        return self.status(upload_id)
+    
+    def _advance(self, upload_id, session_dir, meta, received):
+        """
+        Extend the running hash over received chunks that follow the prefix.
+        
+        Called with the session lock held (see _locked()).
+        """
+        running = self._running.get(upload_id)
+        if running is None:
+            # State was lost (restart or another worker); rebuild it
+            running = (new_hash(), 0)
+        sha256_hash, next_index = running
+        with open(os.path.join(session_dir, 'data'), 'rb') as f:
+            while next_index in received and next_index < meta['chunk_count']:
+                f.seek(next_index * meta['chunk_size'])
+                sha256_hash.update(f.read(meta['chunk_size']))
+                next_index += 1
+        self._running[upload_id] = (sha256_hash, next_index)
+        return sha256_hash, next_index
+    
+    def finalize(self, upload_id):
+        """
+        Finish an upload once every chunk has been received.
+        
+        The whole-file SHA-256 comes from the running hash built while the
+        chunks arrived. It is checked against the expected hash (if one
+        was given), then the file is moved into the content store. Only
+        one call can finish a session; a concurrent one gets a 404.
+        
+        Returns:
+            dict: filename, hash, size and whether the content was a duplicate
+        """
+        with self._locked(upload_id, self._session_dir(upload_id)):
+            session_dir, meta, received = self._load(upload_id)
+            missing = [i for i in range(meta['chunk_count']) if i not in received]
+            if missing:
+                raise UploadSessionError(f'{len(missing)} chunks still missing', 409)
+            
+            sha256_hash, _ = self._advance(upload_id, session_dir, meta, received)
+            file_hash = sha256_hash.hexdigest()
+            if meta['expected_hash'] and file_hash != meta['expected_hash']:
+                raise UploadSessionError('File SHA-256 does not match expected hash', 422)
+            
+            is_new = self.store.add_file(os.path.join(session_dir, 'data'), file_hash)
+            self.store.set_ref(meta['filename'], file_hash, meta['size'])
+            hash_catalog.record(file_hash, meta['size'], meta['filename'])
+            self._remove(upload_id)
+        return {'filename': meta['filename'], 'hash': file_hash,
+                'size': meta['size'], 'duplicate': not is_new}
+    
+    def abort(self, upload_id):
+        """Delete a session and any data received for it."""
+        session_dir = self._session_path(upload_id)
+        if not os.path.isdir(session_dir):
+            raise UploadSessionError('Unknown upload', 404)
+        with self._locked(upload_id, session_dir):
+            self._remove(upload_id)
+    
+    def _remove(self, upload_id):
+        shutil.rmtree(self._session_path(upload_id), ignore_errors=True)
+        self._forget(upload_id)
+
+
+upload_sessions = UploadSessions(UPLOAD_FOLDER, content_store,
+                                 max_size=app.config['RESUMABLE_MAX_SIZE'],
+                                 ttl=app.config['RESUMABLE_SESSION_TTL'])
@@ -0,0 +1 @@
+"""Behaviour tests for the SHA-256 file integrity checker."""
@@ -0,0 +1,27 @@
+"""
+Shared test setup.
+
+The server keeps uploads/ and its SQLite databases relative to the
+working directory, so the whole session runs in a scratch directory
+that is entered before SHA256 is imported.
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+os.environ['SHA256_HASH_BENCHMARK'] = '0'  # Keep server start-ups in tests quick
+os.chdir(tempfile.mkdtemp(prefix='sha256-tests-'))
+
+import SHA256  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    return SHA256.app.test_client()
@@ -0,0 +1,25 @@
+"""Small helpers shared by the tests."""
+
+import hashlib
+import io
+import os
+import uuid
+
+
+def unique_name(prefix='file'):
+    """A filename no other test uses."""
+    return f'{prefix}-{uuid.uuid4().hex}.bin'
+
+
+def random_bytes(size):
+    return os.urandom(size)
+
+
+def sha256_hex(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def upload(client, data, filename=None, query=''):
+    """POST ``data`` to /upload and return the response."""
+    return client.post('/upload' + query,
+                       data={'file': (io.BytesIO(data), filename or unique_name())})
@@ -0,0 +1,144 @@
+"""Admission control and backpressure."""
+
+import asyncio
+import io
+import threading
+import time
+
+import pytest
+
+import SHA256
+from tests.helpers import random_bytes, unique_name, upload
+
+
+@pytest.fixture
+def tight_admission():
+    """Limit the server to one piece of hashing work and a one-entry queue."""
+    admission = SHA256.admission
+    saved = (admission.limits, admission.max_wait, admission.processes)
+    admission.limits = (1, 0, 1)
+    admission.max_wait = 0.3
+    admission.set_processes(1)
+    yield admission
+    admission.limits, admission.max_wait = saved[:2]
+    admission.set_processes(saved[2])
+
+
+def test_full_queue_rejects_before_the_body_is_read(client, tight_admission):
+    held = tight_admission.acquire()
+    waiter = threading.Thread(target=lambda: tight_admission.release(
+        0, tight_admission.acquire(timeout=5)))
+    waiter.start()
+    while tight_admission.status()['queue_depth'] == 0:
+        time.sleep(0.01)
+    try:
+        rejected = tight_admission.status()['rejected'].get('queue_full', 0)
+        response = upload(client, random_bytes(1000))
+        assert response.status_code == 503
+        assert int(response.headers['Retry-After']) >= 1
+        assert response.get_json()['retry_after'] >= 1
+        response = client.post('/verify', data={'file': (io.BytesIO(b'x'), 'x'),
+                                                'expected_hash': 'x'})
+        assert response.status_code == 503 and response.get_json()['verified'] is False
+        assert tight_admission.status()['rejected']['queue_full'] == rejected + 2
+    finally:
+        tight_admission.release(0, held)
+        waiter.join()
+    assert upload(client, random_bytes(1000)).status_code == 200
+
+
+def test_held_endpoint_times_out_in_the_queue(client, tight_admission):
+    held = tight_admission.acquire()
+    try:
+        start = time.monotonic()
+        response = client.post('/api/merkle-hash', data={'file': (io.BytesIO(b'x'), unique_name())})
+        assert response.status_code == 503
+        assert 'timeout' in response.get_json()['error']
+        assert time.monotonic() - start >= 0.3
+    finally:
+        tight_admission.release(0, held)
+    assert tight_admission.status()['active'] == 0
+
+
+def test_routes_outside_admission_are_never_rejected(client, tight_admission):
+    tight_admission.limits = (1, 0, 0)
+    tight_admission.set_processes(1)
+    held = tight_admission.acquire()
+    try:
+        assert client.get('/api/admission').status_code == 200
+        assert upload(client, b'x').status_code == 503
+    finally:
+        tight_admission.release(0, held)
+
+
+def test_byte_budget_rejects_streamed_uploads(client, tight_admission):
+    tight_admission.limits = (0, 10_000, 4)
+    tight_admission.set_processes(1)
+    held = tight_admission.acquire(8_000)
+    try:
+        # The declared body does not fit next to the bytes in flight
+        start = time.monotonic()
+        response = upload(client, random_bytes(5_000))
+        assert response.status_code == 503
+        assert 'timeout' in response.get_json()['error']
+        assert time.monotonic() - start >= 0.3
+        # A small one does, and holds its bytes only while it runs
+        assert upload(client, random_bytes(500)).status_code == 200
+        assert tight_admission.status()['active_bytes'] == 8_000
+    finally:
+        tight_admission.release(8_000, held)
+    assert upload(client, random_bytes(5_000)).status_code == 200
+    assert tight_admission.status()['active_bytes'] == 0
+
+
+def test_fifo_order_and_byte_budget():
+    admission = SHA256.AdmissionController(max_concurrent=0, max_bytes=100, max_wait=5)
+    first = admission.acquire(80)
+    order = []
+    
+    def wait(name, nbytes):
+        admitted_at = admission.acquire(nbytes)
+        order.append(name)
+        admission.release(nbytes, admitted_at)
+    
+    threads = [threading.Thread(target=wait, args=('big', 95))]
+    threads[0].start()
+    while admission.status()['queue_depth'] < 1:
+        time.sleep(0.01)
+    # Would fit next to the 80 bytes, but must not overtake the queued waiter
+    # (and does not fit next to it, so the order below is not a race)
+    threads.append(threading.Thread(target=wait, args=('small', 10)))
+    threads[1].start()
+    while admission.status()['queue_depth'] < 2:
+        time.sleep(0.01)
+    admission.release(80, first)
+    for thread in threads:
+        thread.join()
+    assert order[0] == 'big'
+    # A block bigger than the whole budget still runs once the server is idle
+    admission.release(500, admission.acquire(500))
+
+
+def test_limits_are_shared_between_processes():
+    admission = SHA256.AdmissionController(max_concurrent=5, max_bytes=1000, max_queue=3)
+    admission.set_processes(2)
+    assert (admission.max_concurrent, admission.max_bytes, admission.max_queue) == (3, 500, 2)
+
+
+def test_async_waiters_do_not_block_threads():
+    admission = SHA256.AdmissionController(max_concurrent=1, max_wait=0.2)
+    
+    async def run():
+        held = await admission.acquire_async()
+        waiting = asyncio.ensure_future(admission.acquire_async())
+        await asyncio.sleep(0.05)
+        assert not waiting.done()
+        admission.release(0, held)
+        admission.release(0, await waiting)
+        held = await admission.acquire_async()
+        with pytest.raises(SHA256.Overloaded):
+            await admission.acquire_async()
+        admission.release(0, held)
+    
+    asyncio.run(run())
+    assert admission.status()['rejected'] == {'timeout': 1}
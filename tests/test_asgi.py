@@ -0,0 +1,158 @@
+"""ASGI serving mode, driven through fake receive/send channels."""
+
+import asyncio
+import gzip
+import io
+import json
+import threading
+import time
+
+from werkzeug.datastructures import FileStorage
+from werkzeug.test import encode_multipart
+
+import SHA256
+from tests.helpers import random_bytes, sha256_hex, unique_name
+
+
+def call(method, path, body=b'', headers=(), query=b''):
+    """Run one request through SHA256.asgi_app; return (status, headers, body)."""
+    messages = [{'type': 'http.request', 'body': body[i:i + 65536],
+                 'more_body': i + 65536 < len(body)}
+                for i in range(0, len(body), 65536)] or [{'type': 'http.request', 'body': b''}]
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query,
+             'headers': [(k.encode(), v.encode()) for k, v in headers],
+             'http_version': '1.1', 'server': ('testserver', 80), 'client': ('127.0.0.1', 1)}
+    sent = []
+    
+    async def run():
+        finished = asyncio.Event()
+        
+        async def receive():
+            if messages:
+                return messages.pop(0)
+            await finished.wait()    # the client stays connected until the response is done
+            return {'type': 'http.disconnect'}
+        
+        async def send(message):
+            sent.append(message)
+            if message['type'] == 'http.response.body' and not message.get('more_body'):
+                finished.set()
+        
+        await SHA256.asgi_app(scope, receive, send)
+    
+    asyncio.run(run())
+    start = sent[0]
+    return (start['status'], {k.decode(): v.decode() for k, v in start['headers']},
+            b''.join(m.get('body', b'') for m in sent[1:]))
+
+
+def multipart(fields):
+    boundary, body = encode_multipart(fields)
+    return body, ('content-type', f'multipart/form-data; boundary={boundary}')
+
+
+def test_native_upload_and_verify():
+    data = random_bytes(300_000)
+    name = unique_name()
+    body, ctype = multipart({'file': FileStorage(io.BytesIO(data), name)})
+    status, _, payload = call('POST', '/upload', body, [ctype])
+    assert status == 200
+    assert json.loads(payload)['hash'] == sha256_hex(data)
+    assert SHA256.content_store.resolve(name)['sha256'] == sha256_hex(data)
+    
+    body, ctype = multipart({'file': FileStorage(io.BytesIO(data), name),
+                             'expected_hash': sha256_hex(data)})
+    status, _, payload = call('POST', '/verify', body, [ctype])
+    assert json.loads(payload)['verified'] is True
+
+
+def test_native_route_rejects_non_multipart():
+    status, _, payload = call('POST', '/api/calculate-hash', b'xx', [('content-type', 'text/plain')])
+    assert status == 400
+    assert json.loads(payload)['success'] is False
+
+
+def test_other_routes_fall_back_to_flask():
+    status, _, payload = call('GET', '/api/admission')
+    assert status == 200
+    assert 'active' in json.loads(payload)
+    
+    data = random_bytes(5000)
+    body, ctype = multipart({'files': FileStorage(io.BytesIO(data), unique_name())})
+    status, _, payload = call('POST', '/api/calculate-hash-batch', body, [ctype])
+    assert status == 200
+    assert json.loads(payload)['results'][0]['hash'] == sha256_hex(data)
+
+
+def test_compressed_body_goes_through_flask():
+    data = random_bytes(10_000)
+    body, ctype = multipart({'file': FileStorage(io.BytesIO(data), unique_name())})
+    status, _, payload = call('POST', '/api/calculate-hash', gzip.compress(body),
+                              [ctype, ('content-encoding', 'gzip')])
+    assert status == 200
+    assert json.loads(payload)['hash'] == sha256_hex(data)
+
+
+def test_lifespan():
+    async def run():
+        messages = [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}]
+        sent = []
+        
+        async def receive():
+            return messages.pop(0)
+        
+        async def send(message):
+            sent.append(message['type'])
+        
+        await SHA256.asgi_app({'type': 'lifespan'}, receive, send)
+        return sent
+    
+    assert asyncio.run(run()) == ['lifespan.startup.complete', 'lifespan.shutdown.complete']
+
+
+def test_native_route_counts_content_length_against_byte_budget():
+    admission = SHA256.admission
+    saved = (admission.limits, admission.max_wait, admission.processes)
+    admission.limits, admission.max_wait = (0, 10_000, 4), 0.2
+    admission.set_processes(1)
+    held = admission.acquire(8_000)
+    try:
+        body, ctype = multipart({'file': FileStorage(io.BytesIO(random_bytes(5_000)), unique_name())})
+        status, headers, payload = call('POST', '/api/calculate-hash', body,
+                                        [ctype, ('content-length', str(len(body)))])
+        assert status == 503
+        assert int(headers['retry-after']) >= 1
+    finally:
+        admission.release(8_000, held)
+        admission.limits, admission.max_wait = saved[:2]
+        admission.set_processes(saved[2])
+    status, _, _ = call('POST', '/api/calculate-hash', body,
+                        [ctype, ('content-length', str(len(body)))])
+    assert status == 200
+    assert admission.status()['active_bytes'] == 0
+
+
+def test_native_upload_records_range_hashes(monkeypatch):
+    monkeypatch.setitem(SHA256.app.config, 'RANGE_HASHES_ON_UPLOAD', True)
+    data = random_bytes(50_000)
+    body, ctype = multipart({'file': FileStorage(io.BytesIO(data), unique_name())})
+    status, _, _ = call('POST', '/upload', body, [ctype])
+    assert status == 200
+    deadline = time.monotonic() + 5
+    while SHA256.range_index.get(sha256_hex(data)) is None and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert SHA256.range_index.get(sha256_hex(data))['size'] == len(data)
+
+
+def test_streams_are_closed_off_the_event_loop(monkeypatch):
+    threads = []
+    close = SHA256.HashingStream.close
+
+    def recording_close(self):
+        threads.append(threading.current_thread())
+        close(self)
+
+    monkeypatch.setattr(SHA256.HashingStream, 'close', recording_close)
+    body, ctype = multipart({'file': FileStorage(io.BytesIO(b'abc'), unique_name())})
+    assert call('POST', '/upload', body, [ctype])[0] == 200
+    assert threads and threading.main_thread() not in threads
@@ -0,0 +1,73 @@
+"""Batch hashing endpoint."""
+
+import hashlib
+import io
+import threading
+
+import SHA256
+from tests.helpers import random_bytes, sha256_hex, unique_name
+
+
+def test_batch_hashes_every_file_in_order(client):
+    blobs = [random_bytes(n) for n in (0, 100, 70_000, 5)]
+    names = [unique_name() for _ in blobs]
+    response = client.post('/api/calculate-hash-batch', data={
+        'files': [(io.BytesIO(b), n) for b, n in zip(blobs, names)]})
+    body = response.get_json()
+    assert response.status_code == 200
+    assert body['count'] == len(blobs)
+    assert [r['filename'] for r in body['results']] == names
+    assert [r['hash'] for r in body['results']] == [sha256_hex(b) for b in blobs]
+    assert [r['size'] for r in body['results']] == [len(b) for b in blobs]
+
+
+def test_batch_extra_algorithms(client):
+    data = random_bytes(2048)
+    response = client.post('/api/calculate-hash-batch?algorithms=sha256,md5', data={
+        'files': [(io.BytesIO(data), unique_name())]})
+    digests = response.get_json()['results'][0]['digests']
+    assert digests == {'sha256': sha256_hex(data), 'md5': hashlib.md5(data).hexdigest()}
+
+
+def test_batch_without_files_is_rejected(client):
+    assert client.post('/api/calculate-hash-batch', data={}).status_code == 400
+
+
+def test_batch_file_limit(client, monkeypatch):
+    monkeypatch.setitem(SHA256.app.config, 'BATCH_MAX_FILES', 2)
+    response = client.post('/api/calculate-hash-batch', data={
+        'files': [(io.BytesIO(b'x'), unique_name()) for _ in range(3)]})
+    assert response.status_code == 400
+    assert 'Too many files' in response.get_json()['error']
+
+
+def test_batch_parts_are_hashed_on_the_pool(client, monkeypatch):
+    threads = set()
+    write = SHA256.HashingStream._write
+
+    def recording_write(self, data):
+        threads.add(threading.current_thread().name)
+        return write(self, data)
+
+    monkeypatch.setattr(SHA256.HashingStream, '_write', recording_write)
+    blobs = [random_bytes(200_000) for _ in range(3)]
+    response = client.post('/api/calculate-hash-batch', data={
+        'files': [(io.BytesIO(b), unique_name()) for b in blobs]})
+    assert [r['hash'] for r in response.get_json()['results']] == [sha256_hex(b) for b in blobs]
+    assert threads and all(name.startswith('sha256') for name in threads)
+
+
+def test_batch_file_limit_stops_parsing(client, monkeypatch):
+    monkeypatch.setitem(SHA256.app.config, 'BATCH_MAX_FILES', 2)
+    parts = []
+    get_file_stream = SHA256.HashingRequest._get_file_stream
+
+    def counting(self, *args, **kwargs):
+        parts.append(args)
+        return get_file_stream(self, *args, **kwargs)
+
+    monkeypatch.setattr(SHA256.HashingRequest, '_get_file_stream', counting)
+    response = client.post('/api/calculate-hash-batch', data={
+        'files': [(io.BytesIO(b'x'), unique_name()) for _ in range(10)]})
+    assert response.status_code == 400
+    assert len(parts) <= 2
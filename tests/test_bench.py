@@ -0,0 +1,44 @@
+"""Microbenchmark suite helpers."""
+
+import io
+
+import bench_sha256
+import SHA256
+
+
+def test_sizes_round_trip():
+    assert bench_sha256.parse_size('64K') == 64 * 1024
+    assert bench_sha256.parse_size('4gb') == 4 * 1024 ** 3
+    assert bench_sha256.parse_size('512') == 512
+    assert [bench_sha256.format_size(s) for s in (512, 65536, 16 * 1024 ** 2)] == ['512', '64K', '16M']
+
+
+def test_data_is_reproducible():
+    assert bench_sha256.make_data(3 * 1024 ** 2) == bench_sha256.make_data(3 * 1024 ** 2)
+    assert len(bench_sha256.make_data(100)) == 100
+
+
+def test_salted_reader_replaces_only_the_prefix():
+    data = bytes(range(200))
+    out = io.BufferedReader(bench_sha256.SaltedReader(data, b'SALT')).read()
+    assert out == b'SALT' + data[4:]
+
+
+def test_compare_flags_slowdowns_beyond_tolerance():
+    base = {'suite': 'bytes', 'name': 'x', 'size': 64}
+    baseline = [dict(base, mb_per_s=100.0), dict(base, size=128, mb_per_s=100.0)]
+    results = [dict(base, mb_per_s=95.0), dict(base, size=128, mb_per_s=80.0),
+               dict(base, size=256, mb_per_s=1.0)]
+    regressions = bench_sha256.compare(results, baseline, tolerance=0.10)
+    assert [r['size'] for r, _, _ in regressions] == [128]
+    assert round(results[0]['change'], 2) == -0.05
+    assert 'change' not in results[2]
+
+
+def test_endpoint_suite_runs(monkeypatch):
+    monkeypatch.setattr(bench_sha256, 'measure', lambda fn, size, **kw: (fn(), {
+        'best_s': 1.0, 'median_s': 1.0, 'calls': 1, 'mb_per_s': 1.0})[1])
+    results = bench_sha256.bench_endpoints(SHA256, [4096], repeat=1)
+    assert {r['name'] for r in results} == {
+        '/upload', '/verify', '/api/calculate-hash', '/api/verify-hash', '/api/merkle-hash',
+        '/api/calculate-hash-batch', '/api/merkle-verify'}
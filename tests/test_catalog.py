@@ -0,0 +1,50 @@
+"""Hash catalog and the "already have it?" lookup."""
+
+import io
+
+import SHA256
+from tests.helpers import random_bytes, sha256_hex, unique_name, upload
+
+
+def test_lookup_tells_stored_from_only_seen(client):
+    stored_data, seen_data = random_bytes(3000), random_bytes(3000)
+    name = unique_name()
+    upload(client, stored_data, name)
+    client.post('/api/calculate-hash', data={'file': (io.BytesIO(seen_data), 'seen.bin')})
+    unknown = sha256_hex(random_bytes(10))
+    
+    body = client.post('/api/lookup', json={
+        'hashes': [sha256_hex(stored_data), sha256_hex(seen_data).upper(), unknown, 'not-a-hash']
+    }).get_json()
+    assert body['stored'] == [sha256_hex(stored_data)]
+    assert body['missing'] == [sha256_hex(seen_data), unknown, 'not-a-hash']
+    assert body['known'][sha256_hex(stored_data)]['filenames'] == [name]
+    assert body['known'][sha256_hex(stored_data)]['stored'] is True
+    assert body['known'][sha256_hex(seen_data)]['stored'] is False
+    assert unknown not in body['known']
+
+
+def test_get_lookup_and_bad_requests(client):
+    data = random_bytes(100)
+    upload(client, data)
+    body = client.get(f'/api/lookup?hash={sha256_hex(data)}').get_json()
+    assert body['stored'] == [sha256_hex(data)]
+    assert client.get('/api/lookup').status_code == 400
+    assert client.post('/api/lookup', json={'hashes': 'abc'}).status_code == 400
+
+
+def test_lookup_limit(client, monkeypatch):
+    monkeypatch.setitem(SHA256.app.config, 'LOOKUP_MAX_HASHES', 2)
+    assert client.post('/api/lookup', json={'hashes': ['a', 'b', 'c']}).status_code == 400
+
+
+def test_catalog_counts_sightings_in_batches(tmp_path):
+    catalog = SHA256.HashCatalog(str(tmp_path / 'catalog.db'))
+    entries = [(f'{i:064x}', i, f'name-{i}') for i in range(SHA256.HashCatalog.QUERY_BATCH + 10)]
+    catalog.record_many(entries)
+    catalog.record(entries[0][0], 0, 'other-name')
+    found = catalog.lookup([sha256 for sha256, _, _ in entries])
+    assert len(found) == len(entries)
+    assert found[entries[0][0]]['times_seen'] == 2
+    assert sorted(found[entries[0][0]]['filenames']) == ['name-0', 'other-name']
+    assert found[entries[-1][0]]['size'] == len(entries) - 1
@@ -0,0 +1,80 @@
+"""Compressed upload bodies are hashed after decoding."""
+
+import gzip
+import io
+import uuid
+
+import pytest
+from werkzeug.datastructures import FileStorage
+from werkzeug.test import encode_multipart
+
+import SHA256
+from tests.helpers import random_bytes, sha256_hex, unique_name
+
+
+def whole_body(client, route, data, encoding='gzip', compress=gzip.compress, fields=None):
+    boundary, body = encode_multipart(dict(fields or {}, file=FileStorage(io.BytesIO(data), unique_name())))
+    return client.post(route, data=compress(body), headers={
+        'Content-Type': f'multipart/form-data; boundary={boundary}', 'Content-Encoding': encoding})
+
+
+def encoded_part(client, route, payload, encoding='gzip'):
+    boundary = uuid.uuid4().hex
+    body = (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; '
+            f'filename="{unique_name()}"\r\nContent-Encoding: {encoding}\r\n\r\n').encode()
+    body += payload + f'\r\n--{boundary}--\r\n'.encode()
+    return client.post(route, data=body,
+                       content_type=f'multipart/form-data; boundary={boundary}')
+
+
+def test_gzip_body_is_hashed_decoded(client):
+    data = random_bytes(300_000)
+    response = whole_body(client, '/upload', data)
+    assert response.status_code == 200
+    assert response.get_json()['hash'] == sha256_hex(data)
+    assert response.get_json()['size'] == len(data)
+
+
+def test_gzip_part_is_hashed_decoded(client):
+    data = b'compressible ' * 50_000
+    for route in ('/upload', '/api/calculate-hash'):
+        response = encoded_part(client, route, gzip.compress(data))
+        assert response.get_json()['hash'] == sha256_hex(data)
+
+
+def test_concatenated_gzip_members(client):
+    response = encoded_part(client, '/api/calculate-hash',
+                            gzip.compress(b'first ') + gzip.compress(b'second'))
+    assert response.get_json()['hash'] == sha256_hex(b'first second')
+
+
+def test_zstd(client):
+    zstandard = pytest.importorskip('zstandard')
+    data = random_bytes(100_000)
+    response = whole_body(client, '/api/calculate-hash', data, 'zstd',
+                          zstandard.ZstdCompressor().compress)
+    assert response.get_json()['hash'] == sha256_hex(data)
+
+
+def test_unknown_encoding_is_415(client):
+    response = whole_body(client, '/upload', b'x', 'br', lambda body: body)
+    assert response.status_code == 415
+    assert 'gzip' in response.get_json()['error']
+    assert encoded_part(client, '/upload', b'x', 'br').status_code == 415
+
+
+def test_corrupt_data_is_400(client):
+    compressed = gzip.compress(random_bytes(10_000))
+    assert encoded_part(client, '/upload', compressed[:len(compressed) // 2]).status_code == 400
+    assert encoded_part(client, '/upload', b'not gzip at all').status_code == 400
+    response = whole_body(client, '/api/calculate-hash', b'x', compress=lambda b: b'\x1f\x8bjunk')
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+
+def test_decompression_bomb_is_413(client, monkeypatch):
+    monkeypatch.setitem(SHA256.app.config, 'MAX_DECOMPRESSED_LENGTH', 1024 * 1024)
+    bomb = gzip.compress(bytes(10 * 1024 * 1024))
+    assert len(bomb) < 64 * 1024
+    assert encoded_part(client, '/upload', bomb).status_code == 413
+    assert whole_body(client, '/api/calculate-hash', bytes(10 * 1024 * 1024)).status_code == 413
@@ -0,0 +1,167 @@
+"""Block signatures and rebuilding new versions from deltas."""
+
+import base64
+import os
+import zlib
+
+import pytest
+
+import SHA256
+from tests.helpers import random_bytes, sha256_hex, unique_name, upload
+
+BLOCK = 1024
+
+
+@pytest.fixture
+def base(client):
+    data = random_bytes(BLOCK * 40 + 300)
+    name = unique_name()
+    upload(client, data, name)
+    return name, data
+
+
+def signature(client, name, block_size=BLOCK):
+    response = client.get(f'/api/signature?filename={name}&block_size={block_size}')
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_signature_matches_blocks(client, base):
+    name, data = base
+    sig = signature(client, name)
+    assert sig['hash'] == sha256_hex(data)
+    assert sig['size'] == len(data)
+    assert len(sig['weak']) == len(sig['strong']) == 41
+    assert sig['strong'][3] == sha256_hex(data[3 * BLOCK:4 * BLOCK])
+    assert sig['strong'][-1] == sha256_hex(data[40 * BLOCK:])
+    # Served from the signature cache the second time
+    assert signature(client, name) == sig
+
+
+def test_signature_errors(client, base):
+    name, _ = base
+    assert client.get('/api/signature').status_code == 400
+    assert client.get(f'/api/signature?filename={name}&block_size=abc').status_code == 400
+    assert client.get(f'/api/signature?filename={name}&block_size=16').status_code == 400
+    assert client.get(f'/api/signature?filename={unique_name()}').status_code == 404
+
+
+def test_default_block_size():
+    assert SHA256.default_delta_block_size(0) == 2048
+    assert SHA256.default_delta_block_size(1 << 30) == 32768
+    assert SHA256.default_delta_block_size(1 << 50) == 1024 * 1024
+
+
+def test_rolling_checksum_matches_adler32():
+    data = random_bytes(5000)
+    rolling = SHA256.RollingChecksum(data[:512])
+    for start in range(1, 1000):
+        rolling.roll(data[start - 1], data[start + 511])
+    assert rolling.value == zlib.adler32(data[999:1511])
+
+
+def test_delta_rebuilds_modified_file(client, base):
+    name, data = base
+    sig = signature(client, name)
+    new = data[:5000] + b'inserted bytes' + data[5000:20000] + data[22000:] + b'tail'
+    instructions = SHA256.make_delta(sig, new)
+    assert any('copy' in op for op in instructions)
+
+    new_name = unique_name()
+    response = client.post('/api/delta', json={
+        'base': name, 'base_hash': sig['hash'], 'filename': new_name,
+        'block_size': BLOCK, 'expected_hash': sha256_hex(new), 'instructions': instructions})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['hash'] == sha256_hex(new)
+    assert body['size'] == len(new)
+    assert not body['duplicate']
+    assert body['copied_bytes'] >= len(data) - 2000 - 4 * BLOCK
+    assert body['literal_bytes'] < 4 * BLOCK
+
+    ref = SHA256.content_store.resolve(new_name)
+    with open(ref['path'], 'rb') as f:
+        assert f.read() == new
+    # The base version is still stored under its own name
+    assert SHA256.content_store.resolve(name)['sha256'] == sha256_hex(data)
+
+
+def test_identical_delta_is_duplicate(client, base):
+    name, data = base
+    sig = signature(client, name)
+    instructions = SHA256.make_delta(sig, data)
+    assert instructions == [{'copy': 0, 'count': 41}]
+    body = client.post('/api/delta', json={
+        'base': name, 'block_size': BLOCK, 'instructions': instructions}).get_json()
+    assert body['duplicate']
+    assert body['literal_bytes'] == 0
+
+
+def test_stale_base_is_409(client, base):
+    name, data = base
+    sig = signature(client, name)
+    upload(client, random_bytes(3000), name)
+    response = client.post('/api/delta', json={
+        'base': name, 'base_hash': sig['hash'], 'block_size': BLOCK,
+        'instructions': SHA256.make_delta(sig, data)})
+    assert response.status_code == 409
+    assert response.get_json()['hash'] != sig['hash']
+
+
+def test_expected_hash_mismatch_is_422(client, base):
+    name, _ = base
+    response = client.post('/api/delta', json={
+        'base': name, 'filename': unique_name(), 'block_size': BLOCK,
+        'expected_hash': '0' * 64, 'instructions': [{'copy': 0, 'count': 2}]})
+    assert response.status_code == 422
+    assert not [f for f in os.listdir(SHA256.app.config['UPLOAD_FOLDER']) if f.startswith('.delta-')]
+
+
+def test_output_limit_is_413(client, base, monkeypatch):
+    name, _ = base
+    monkeypatch.setitem(SHA256.app.config, 'DELTA_MAX_OUTPUT', 10 * BLOCK)
+    response = client.post('/api/delta', json={
+        'base': name, 'block_size': BLOCK,
+        'instructions': [{'copy': 0, 'count': 8}, {'copy': 0, 'count': 8}]})
+    assert response.status_code == 413
+
+
+@pytest.mark.parametrize('instructions', [
+    'not a list',
+    [42],
+    [{'copy': 41}],
+    [{'copy': -1}],
+    [{'copy': 0, 'count': 0}],
+    [{'data': 'not base64!'}],
+    [{'move': 0}],
+])
+def test_bad_instructions_are_400(client, base, instructions):
+    name, _ = base
+    response = client.post('/api/delta', json={
+        'base': name, 'block_size': BLOCK, 'instructions': instructions})
+    assert response.status_code == 400
+
+
+def test_bad_requests(client, base):
+    name, _ = base
+    assert client.post('/api/delta', data='x').status_code == 400
+    assert client.post('/api/delta', json={'base': name, 'block_size': 16,
+                                           'instructions': []}).status_code == 400
+    assert client.post('/api/delta', json={'base': 5, 'block_size': BLOCK}).status_code == 400
+    assert client.post('/api/delta', json={'base': unique_name(), 'block_size': BLOCK,
+                                           'instructions': []}).status_code == 404
+
+
+def test_parse_and_apply_delta(tmp_path):
+    data = random_bytes(3 * BLOCK + 10)
+    path = tmp_path / 'base.bin'
+    path.write_bytes(data)
+    ops = SHA256.parse_delta([{'copy': 3}, {'data': base64.b64encode(b'new').decode()},
+                              {'copy': 0, 'count': 2}], len(data), BLOCK)
+    assert ops == [('copy', 3 * BLOCK, 10), ('data', b'new'), ('copy', 0, 2 * BLOCK)]
+    with open(tmp_path / 'out.bin', 'wb') as out:
+        result = SHA256.apply_delta(str(path), ops, out)
+    expected = data[3 * BLOCK:] + b'new' + data[:2 * BLOCK]
+    assert (tmp_path / 'out.bin').read_bytes() == expected
+    assert result == {'sha256': sha256_hex(expected), 'size': len(expected),
+                      'copied_bytes': 2 * BLOCK + 10, 'literal_bytes': 3}
@@ -0,0 +1,66 @@
+"""Persistent digest cache keyed by file identity."""
+
+import os
+
+import pytest
+
+import SHA256
+from tests.helpers import random_bytes, sha256_hex
+
+OLD_NS = 1_600_000_000 * 1000 ** 3
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = SHA256.enable_digest_cache(str(tmp_path / 'digests.db'))
+    yield cache
+    SHA256.disable_digest_cache()
+
+
+def write_old(path, data, mtime_ns=OLD_NS):
+    path.write_bytes(data)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_unchanged_file_is_answered_from_cache(cache, tmp_path):
+    path = tmp_path / 'data.bin'
+    original = random_bytes(4096)
+    write_old(path, original)
+    assert SHA256.calculate_sha256(str(path)) == sha256_hex(original)
+    
+    # Same inode, size and mtime: only a cache hit can still report the old digest
+    write_old(path, random_bytes(4096))
+    assert SHA256.calculate_sha256(str(path)) == sha256_hex(original)
+    assert SHA256.verify_file_integrity(str(path), sha256_hex(original))
+    # Bypassing the cache reads the data
+    assert SHA256.calculate_sha256(str(path), use_cache=False) != sha256_hex(original)
+
+
+def test_changed_identity_misses(cache, tmp_path):
+    path = tmp_path / 'data.bin'
+    write_old(path, b'first')
+    SHA256.calculate_sha256(str(path))
+    write_old(path, b'second', OLD_NS + 1)
+    assert SHA256.calculate_sha256(str(path)) == sha256_hex(b'second')
+    write_old(path, b'second, longer', OLD_NS + 1)
+    assert SHA256.calculate_sha256(str(path)) == sha256_hex(b'second, longer')
+
+
+def test_recently_modified_files_are_not_cached(cache, tmp_path):
+    path = tmp_path / 'fresh.bin'
+    path.write_bytes(b'just written')
+    SHA256.calculate_sha256(str(path))
+    assert cache.get(str(path), os.stat(path)) is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = SHA256.DigestCache(str(tmp_path / 'digests.db'), max_entries=2)
+    paths = []
+    for i in range(3):
+        path = tmp_path / f'{i}.bin'
+        write_old(path, bytes([i]))
+        cache.put(str(path), os.stat(path), sha256_hex(bytes([i])))
+        paths.append(path)
+    cache.trim()
+    assert cache.get(str(paths[0]), os.stat(paths[0])) is None
+    assert cache.get(str(paths[2]), os.stat(paths[2])) == sha256_hex(bytes([2]))
@@ -0,0 +1,50 @@
+"""Several digests from a single pass over the data."""
+
+import hashlib
+import io
+
+import pytest
+
+import SHA256
+from tests.helpers import random_bytes, unique_name, upload
+
+
+def expected(data, algorithms):
+    return {name: hashlib.new(name, data).hexdigest() for name in algorithms}
+
+
+def test_parse_algorithms():
+    assert SHA256.parse_algorithms(None) == ['sha256']
+    assert SHA256.parse_algorithms('MD5, SHA512,md5,sha256,sha3-256') == ['sha256', 'md5', 'sha512', 'sha3_256']
+    with pytest.raises(ValueError):
+        SHA256.parse_algorithms('crc32')
+
+
+@pytest.mark.parametrize('size', [0, 1000, SHA256.PARALLEL_DIGEST_MIN * 2 + 3])
+def test_every_entry_point_agrees_with_hashlib(tmp_path, size):
+    algorithms = list(SHA256.DIGEST_ALGORITHMS)
+    data = random_bytes(size)
+    path = tmp_path / 'data.bin'
+    path.write_bytes(data)
+    want = expected(data, algorithms)
+    assert SHA256.calculate_digests(str(path), algorithms) == want
+    assert SHA256.calculate_digests_from_bytes(data, algorithms) == want
+    assert SHA256.calculate_digests_from_stream(io.BytesIO(data), algorithms) == (want, size)
+
+
+def test_routes_return_requested_digests(client):
+    data = random_bytes(50_000)
+    want = expected(data, ['sha256', 'md5', 'sha512'])
+    body = upload(client, data, query='?algorithms=md5,sha512').get_json()
+    assert body['digests'] == want
+    body = client.post('/verify?algorithms=md5,sha512', data={
+        'file': (io.BytesIO(data), unique_name()), 'expected_hash': want['sha256']}).get_json()
+    assert body['verified'] is True and body['digests'] == want
+    # SHA-256 alone keeps the old response shape
+    assert 'digests' not in upload(client, data).get_json()
+
+
+def test_unknown_algorithm_is_a_400(client):
+    response = upload(client, b'x', query='?algorithms=crc32')
+    assert response.status_code == 400
+    assert 'crc32' in response.get_json()['error']
@@ -0,0 +1,110 @@
+"""Hash backend registry: overrides, conformance checks and selection."""
+
+import hashlib
+
+import pytest
+
+import SHA256
+from tests.helpers import random_bytes
+
+
+@pytest.fixture
+def registry():
+    registry = SHA256.HashBackendRegistry()
+    for name, (factory, algorithms) in SHA256.hash_backends.backends.items():
+        registry.register(name, factory, algorithms)
+    return registry
+
+
+@pytest.fixture
+def global_selection():
+    """Restore the process-wide selection after a test changes it."""
+    backends = SHA256.hash_backends
+    saved = (backends.selected, backends.benchmarks, backends.overrides, backends._factories)
+    yield backends
+    backends.selected, backends.benchmarks, backends.overrides, backends._factories = saved
+
+
+@pytest.mark.parametrize('value, expected', [
+    (None, {}),
+    ('', {}),
+    ('hashlib', {'*': 'hashlib'}),
+    (' sha256 = pycryptodome , MD5=hashlib ', {'sha256': 'pycryptodome', 'md5': 'hashlib'}),
+    ('sha3-256=cryptography,hashlib', {'sha3_256': 'cryptography', '*': 'hashlib'}),
+])
+def test_parse_overrides(value, expected):
+    assert SHA256.parse_hash_backend_overrides(value) == expected
+
+
+def test_bad_overrides_raise(registry):
+    with pytest.raises(ValueError, match='Unknown hash backend'):
+        registry.select({'*': 'nosuchlib'}, run_benchmark=False)
+    registry.register('sha256-only', hashlib.new, ['sha256'])
+    with pytest.raises(ValueError, match='cannot be used for md5'):
+        registry.select({'md5': 'sha256-only'}, run_benchmark=False)
+
+
+def test_nonconforming_backend_is_dropped(registry):
+    registry.register('broken', lambda algorithm: hashlib.new('md5'), ['sha256'])
+    assert not registry.conforms('broken', 'sha256')
+    registry.select(run_benchmark=False)
+    assert registry.selected['sha256'] != 'broken'
+    with pytest.raises(ValueError):
+        registry.select({'sha256': 'broken'}, run_benchmark=False)
+
+
+def test_first_use_selects_without_benchmark(registry):
+    registry.overrides = {'*': 'hashlib'}
+    assert registry.new('sha256').hexdigest() == hashlib.sha256().hexdigest()
+    assert set(registry.selected.values()) == {'hashlib'}
+    assert registry.benchmarks == {}
+
+
+def test_benchmark_picks_a_conforming_backend(registry):
+    registry.select()
+    assert set(registry.selected) == set(SHA256.DIGEST_ALGORITHMS)
+    for algorithm, rates in registry.benchmarks.items():
+        assert len(rates) > 1
+        assert registry.selected[algorithm] in rates
+
+
+@pytest.mark.parametrize('backend', ['hashlib', 'pycryptodome', 'cryptography'])
+def test_backends_agree_with_hashlib(registry, backend):
+    if backend not in registry.backends:
+        pytest.skip(f'{backend} is not installed')
+    registry.select({'*': backend}, run_benchmark=False)
+    data = random_bytes(100_000)
+    for algorithm in SHA256.DIGEST_ALGORITHMS:
+        hash_object = registry.new(algorithm)
+        hash_object.update(data[:777])
+        copied = hash_object.copy()
+        hash_object.update(data[777:])
+        copied.update(data[777:])
+        expected = hashlib.new(algorithm, data).hexdigest()
+        assert hash_object.hexdigest() == copied.hexdigest() == expected
+    if backend != 'hashlib':
+        assert registry.selected['sha256'] == backend
+        # BLAKE2 stays on hashlib for pycryptodome; '*' only applies where it conforms
+        assert registry.selected['blake2b'] in registry.backends
+
+
+def test_new_hash_with_initial_data():
+    assert SHA256.new_hash('sha1', b'abc').hexdigest() == hashlib.sha1(b'abc').hexdigest()
+    assert SHA256.new_hash().hexdigest() == hashlib.sha256().hexdigest()
+
+
+def test_endpoint(client):
+    body = client.get('/api/hash-backends').get_json()
+    assert body['success']
+    assert 'sha256' in body['backends']['hashlib']
+    assert body['selected']['sha256'] in body['backends']
+    assert set(body) >= {'overrides', 'benchmarks_mb_per_s'}
+
+
+def test_cli_honours_config_override(global_selection, monkeypatch, capsys):
+    monkeypatch.setitem(SHA256.app.config, 'HASH_BACKEND', 'sha256=hashlib')
+    assert SHA256.main(['hash-backends']) == 0
+    out = capsys.readouterr().out
+    assert 'Registered: hashlib' in out
+    assert 'sha256    hashlib (override)' in out
+    assert global_selection.overrides == {'sha256': 'hashlib'}
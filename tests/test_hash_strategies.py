@@ -0,0 +1,46 @@
+"""Every read strategy of the hashing engine gives the same digest."""
+
+import pytest
+
+import SHA256
+from tests.helpers import random_bytes, sha256_hex
+
+
+@pytest.mark.parametrize('size', [0, 1, 4095, 4096 * 3 + 17])
+@pytest.mark.parametrize('strategy', ('auto',) + SHA256.HASH_STRATEGIES)
+def test_strategies_agree(tmp_path, strategy, size):
+    data = random_bytes(size)
+    path = tmp_path / 'data.bin'
+    path.write_bytes(data)
+    assert SHA256.calculate_sha256(str(path), strategy=strategy, block_size=4096,
+                                   use_cache=False) == sha256_hex(data)
+
+
+def test_choose_hash_strategy_by_size():
+    block = SHA256.HASH_BLOCK_SIZE
+    assert SHA256.choose_hash_strategy(block) == 'read'
+    assert SHA256.choose_hash_strategy(block + 1) == 'readinto'
+    assert SHA256.choose_hash_strategy(SHA256.HASH_MMAP_THRESHOLD) == 'mmap'
+
+
+def test_feed_file_reports_size_and_blocks(tmp_path):
+    path = tmp_path / 'data.bin'
+    path.write_bytes(random_bytes(10_000))
+    blocks = []
+    assert SHA256.feed_file(str(path), lambda b: blocks.append(len(b)), 'readinto', 4096) == 10_000
+    assert blocks == [4096, 4096, 1808]
+
+
+def test_unknown_strategy_is_rejected(tmp_path):
+    path = tmp_path / 'data.bin'
+    path.write_bytes(b'x')
+    with pytest.raises(ValueError):
+        SHA256.calculate_sha256(str(path), strategy='bogus', use_cache=False)
+
+
+def test_throttle_sees_every_byte(tmp_path):
+    path = tmp_path / 'data.bin'
+    path.write_bytes(random_bytes(9000))
+    seen = []
+    SHA256.calculate_sha256(str(path), block_size=4096, use_cache=False, throttle=seen.append)
+    assert sum(seen) == 9000
@@ -0,0 +1,26 @@
+"""Request hooks are registered once, in one place, in a fixed order."""
+
+import SHA256
+
+
+def names(funcs):
+    return [func.__name__ for func in funcs]
+
+
+def test_request_hook_order():
+    app = SHA256.app
+    assert names(app.before_request_funcs[None]) == [
+        '_check_request_encoding', '_metrics_start_request', '_timing_start_request',
+        '_admission_start_request', '_start_job_workers']
+    assert names(app.after_request_funcs[None]) == [
+        'cors_after_request', '_metrics_finish_request', '_timing_finish_request']
+    assert names(app.teardown_request_funcs[None]) == [
+        '_metrics_teardown_request', '_timing_teardown_request', '_admission_teardown_request']
+
+
+def test_request_class_and_error_handlers():
+    app = SHA256.app
+    assert app.request_class is SHA256.HashingRequest
+    handlers = app.error_handler_spec[None]
+    assert SHA256.CorruptEncodingError in handlers[400]
+    assert SHA256.DecodedTooLargeError in handlers[413]
@@ -0,0 +1,44 @@
+"""Pre-rendered, compressed, cacheable index page."""
+
+import gzip
+
+import SHA256
+
+
+def test_plain_and_gzip_variants_carry_the_same_page(client):
+    plain = client.get('/', headers={'Accept-Encoding': 'identity'})
+    assert plain.status_code == 200
+    assert 'Content-Encoding' not in plain.headers
+    assert b'SHA-256' in plain.data
+    
+    compressed = client.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert compressed.headers['Vary'] == 'Accept-Encoding'
+    assert gzip.decompress(compressed.data) == plain.data
+    assert compressed.headers['ETag'] != plain.headers['ETag']
+
+
+def test_conditional_request_gets_304(client):
+    etag = client.get('/', headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+    response = client.get('/', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+    assert client.get('/', headers={'If-None-Match': '"stale"'}).status_code == 200
+
+
+def test_other_variants_etag_gets_the_full_page(client):
+    plain_etag = client.get('/', headers={'Accept-Encoding': 'identity'}).headers['ETag']
+    response = client.get('/', headers={'Accept-Encoding': 'gzip', 'If-None-Match': plain_etag})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    gzip.decompress(response.data)
+
+
+def test_static_page_is_encoded_once():
+    page = SHA256.StaticPage('<p>hello</p>', mimetype='text/plain')
+    raw, etag = page.variants[None]
+    assert raw == b'<p>hello</p>'
+    assert gzip.decompress(page.variants['gzip'][0]) == raw
+    # mtime=0 keeps the gzip bytes (and so the ETag) stable across restarts
+    assert SHA256.StaticPage('<p>hello</p>').variants['gzip'] == page.variants['gzip']
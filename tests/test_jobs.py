@@ -0,0 +1,153 @@
+"""Asynchronous hash/verify job queue."""
+
+import json
+import threading
+import time
+
+import pytest
+
+import SHA256
+from tests.helpers import random_bytes, sha256_hex, unique_name, upload
+
+
+def wait_for(client, job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f'/api/jobs/{job_id}').get_json()
+        if job['status'] not in ('queued', 'running'):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f'job {job_id} did not finish')
+
+
+def test_verify_job_over_http(client):
+    data = random_bytes(200_000)
+    name = unique_name()
+    upload(client, data, name)
+    response = client.post('/api/jobs', json={'type': 'verify', 'filename': name,
+                                              'expected_hash': sha256_hex(data).upper(),
+                                              'algorithms': ['md5']})
+    assert response.status_code == 202
+    job = wait_for(client, response.get_json()['job_id'])
+    assert job['status'] == 'done'
+    assert job['percent'] == 100.0
+    assert job['result']['verified'] is True
+    assert job['result']['hash'] == sha256_hex(data)
+    assert set(job['result']['digests']) == {'sha256', 'md5'}
+
+
+def test_events_stream_ends_with_done(client):
+    data = random_bytes(1000)
+    name = unique_name()
+    upload(client, data, name)
+    job_id = client.post('/api/jobs', json={'filename': name}).get_json()['job_id']
+    response = client.get(f'/api/jobs/{job_id}/events')
+    assert response.mimetype == 'text/event-stream'
+    events = [block.split('\n') for block in response.get_data(as_text=True).strip().split('\n\n')
+              if block.startswith('event:')]
+    response.close()
+    assert events[-1][0] == 'event: done'
+    assert json.loads(events[-1][1][len('data: '):])['result']['hash'] == sha256_hex(data)
+
+
+def test_bad_submissions(client):
+    assert client.post('/api/jobs', json={'type': 'shred', 'filename': 'x'}).status_code == 400
+    assert client.post('/api/jobs', json={'filename': unique_name()}).status_code == 404
+    name = unique_name()
+    upload(client, b'x', name)
+    assert client.post('/api/jobs', json={'type': 'verify', 'filename': name}).status_code == 400
+    assert client.get('/api/jobs/nope').status_code == 404
+    assert client.get('/api/jobs/nope/events').status_code == 404
+    assert client.delete('/api/jobs/nope').status_code == 404
+    
+    response = client.post('/api/jobs', json={'filename': name, 'algorithms': 'md5'})
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'algorithms must be a list of strings'
+    assert client.post('/api/jobs', json={'filename': name, 'algorithms': [5]}).status_code == 400
+    assert client.post('/api/jobs', json={'filename': [name]}).status_code == 400
+    assert client.post('/api/jobs', json={'type': 'verify', 'filename': name,
+                                          'expected_hash': 5}).status_code == 400
+    assert client.post('/api/jobs', json=[name]).status_code == 400
+
+
+@pytest.fixture
+def queue(tmp_path, client):
+    name = unique_name()
+    upload(client, random_bytes(5000), name)
+    return SHA256.JobQueue(str(tmp_path / 'jobs.db'), SHA256.content_store, stale_after=30), name
+
+
+def test_cancelled_job_is_not_run(queue):
+    queue, name = queue
+    job_id = queue.submit('hash', {'filename': name})
+    assert queue.cancel(job_id) is True
+    assert queue.claim() is None
+    assert queue.get(job_id)['status'] == 'cancelled'
+    assert queue.cancel(job_id) is False
+
+
+def test_abandoned_job_is_claimed_again(queue):
+    queue, name = queue
+    job_id = queue.submit('hash', {'filename': name})
+    assert queue.claim()[0] == job_id       # this worker "dies" here
+    assert queue.claim() is None            # its heartbeat is still fresh
+    queue.stale_after = -1
+    claimed = queue.claim()
+    assert claimed[0] == job_id
+    queue.run_job(*claimed)
+    assert queue.get(job_id)['status'] == 'done'
+
+
+def test_purge_deletes_finished_jobs_only(queue):
+    queue, name = queue
+    finished = queue.submit('hash', {'filename': name})
+    queue.run_job(*queue.claim())
+    waiting = queue.submit('hash', {'filename': name})
+    assert queue.purge() == 0
+    assert queue.purge(older_than=-1) == 1
+    assert queue.get(finished) is None
+    assert queue.get(waiting)['status'] == 'queued'
+
+
+@pytest.fixture
+def blocked_job(queue, monkeypatch):
+    """A job whose first block waits until the test releases it."""
+    queue, name = queue
+    queue.HEARTBEAT_INTERVAL = 0.05
+    queue.stale_after = 0.5
+    release = threading.Event()
+    admitted_update = SHA256.admitted_update
+
+    def blocking_admitted_update(update):
+        def update_blocked(block):
+            release.wait(10)
+            update(block)
+        return admitted_update(update_blocked)
+
+    monkeypatch.setattr('sha256app.jobs.admitted_update', blocking_admitted_update)
+    job_id = queue.submit('hash', {'filename': name})
+    worker = threading.Thread(target=queue.run_job, args=queue.claim())
+    worker.start()
+    yield queue, job_id, release
+    release.set()
+    worker.join(10)
+
+
+def test_blocked_job_keeps_heartbeating(blocked_job):
+    queue, job_id, release = blocked_job
+    time.sleep(3 * queue.stale_after)
+    assert queue.claim() is None            # still alive, so not reclaimed
+    release.set()
+    deadline = time.monotonic() + 10
+    while queue.get(job_id)['status'] == 'running' and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert queue.get(job_id)['status'] == 'done'
+
+
+def test_blocked_job_can_be_cancelled(blocked_job):
+    queue, job_id, release = blocked_job
+    assert queue.cancel(job_id) is True
+    time.sleep(3 * queue.HEARTBEAT_INTERVAL)
+    release.set()
+    time.sleep(0.1)
+    assert queue.get(job_id)['status'] == 'cancelled'
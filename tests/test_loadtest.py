@@ -0,0 +1,44 @@
+"""Built-in load-test harness."""
+
+import hashlib
+import signal
+
+import loadtest_sha256
+
+
+def test_weights_and_percentiles():
+    assert loadtest_sha256.parse_weights('upload=2, verify') == {'upload': 2.0, 'verify': 1.0}
+    values = list(range(1, 101))
+    assert loadtest_sha256.percentile(values, 50) == 50
+    assert loadtest_sha256.percentile(values, 99) == 99
+    assert loadtest_sha256.percentile([], 50) is None
+
+
+def test_uploads_are_salted_and_other_bodies_reused():
+    workload = loadtest_sha256.Workload({'endpoints': {'upload': 1, 'verify': 1},
+                                         'sizes': {'4K': 1}})
+    first, _ = workload.body('upload', 4096)
+    second, _ = workload.body('upload', 4096)
+    assert b''.join(map(bytes, first)) != b''.join(map(bytes, second))
+    assert len(b''.join(map(bytes, first))) == len(b''.join(map(bytes, second)))
+    body, content_type = workload.body('verify', 4096)
+    assert body is workload.body('verify', 4096)[0]
+    digest = hashlib.sha256(loadtest_sha256.make_data(4096)).hexdigest()
+    assert digest.encode() in body and content_type.startswith('multipart/form-data')
+
+
+def test_load_test_against_a_local_server(tmp_path):
+    port = loadtest_sha256.free_port()
+    server = loadtest_sha256.start_server(str(tmp_path), port, workers=1, threads=2)
+    try:
+        profile = dict(loadtest_sha256.DEFAULT_PROFILE, sizes={'4K': 1, '64K': 1},
+                       concurrency=[2], duration=0.5)
+        [result] = loadtest_sha256.load_test(f'http://127.0.0.1:{port}', profile,
+                                             report=lambda result: None)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
+    assert result['requests'] > 0
+    assert result['errors'] == 0
+    assert set(result['endpoints']) == set(loadtest_sha256.ENDPOINTS)
+    assert server.returncode == 0
@@ -0,0 +1,69 @@
+"""Parallel directory-tree manifests (manifest / verify-manifest)."""
+
+import io
+
+import SHA256
+from tests.helpers import random_bytes, sha256_hex
+
+
+def make_tree(root):
+    files = {
+        'a.txt': b'alpha',
+        'sub/b.bin': random_bytes(5000),
+        'sub/deeper/c.bin': random_bytes(20),
+        'odd\tname\n.txt': b'escaped',
+    }
+    for rel_path, data in files.items():
+        path = root / rel_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+    return files
+
+
+def test_write_and_read_manifest(tmp_path):
+    files = make_tree(tmp_path)
+    out = io.StringIO()
+    stats = SHA256.write_manifest(str(tmp_path), out, workers=2, use_processes=False)
+    assert stats == {'files': 4, 'bytes': sum(map(len, files.values())), 'errors': 0}
+    assert out.getvalue().startswith(SHA256.MANIFEST_HEADER)
+    entries = {path: (size, digest) for path, size, _, digest
+               in SHA256.read_manifest(io.StringIO(out.getvalue()))}
+    assert entries == {path: (len(data), sha256_hex(data)) for path, data in files.items()}
+
+
+def test_process_pool_gives_same_manifest(tmp_path):
+    make_tree(tmp_path)
+    threads, processes = io.StringIO(), io.StringIO()
+    SHA256.write_manifest(str(tmp_path), threads, workers=2, use_processes=False)
+    SHA256.write_manifest(str(tmp_path), processes, workers=2, use_processes=True)
+    assert threads.getvalue() == processes.getvalue()
+
+
+def test_verify_reports_every_kind_of_problem(tmp_path):
+    make_tree(tmp_path)
+    out = io.StringIO()
+    SHA256.write_manifest(str(tmp_path), out, workers=2, use_processes=False)
+    (tmp_path / 'a.txt').write_bytes(b'ALPHA')            # same size, new content
+    (tmp_path / 'sub' / 'deeper' / 'c.bin').unlink()
+    (tmp_path / 'sub' / 'new.txt').write_bytes(b'unlisted')
+    
+    report = io.StringIO()
+    stats = SHA256.verify_manifest(str(tmp_path), io.StringIO(out.getvalue()), workers=2,
+                                   use_processes=False, report=report)
+    assert stats == {'OK': 2, 'MISSING': 1, 'MISMATCH': 1, 'ERROR': 0, 'EXTRA': 1}
+    lines = sorted(report.getvalue().splitlines())
+    assert lines == ['EXTRA\tsub/new.txt', 'MISMATCH\ta.txt\thash changed',
+                     'MISSING\tsub/deeper/c.bin']
+
+
+def test_cli_exit_codes(tmp_path, capsys):
+    tree = tmp_path / 'tree'
+    tree.mkdir()
+    make_tree(tree)
+    manifest = tree / 'MANIFEST'
+    assert SHA256.main(['manifest', str(tree), '-o', str(manifest), '--threads']) == 0
+    # The manifest lives inside the tree but is not reported as EXTRA
+    assert SHA256.main(['verify-manifest', str(tree), str(manifest), '--threads']) == 0
+    (tree / 'extra.bin').write_bytes(b'x')
+    assert SHA256.main(['verify-manifest', str(tree), str(manifest), '--threads']) == 1
+    assert '1 extra' in capsys.readouterr().err
@@ -0,0 +1,102 @@
+"""Merkle-tree chunk hashing and partial verification."""
+
+import hashlib
+import io
+
+import pytest
+
+import SHA256
+from tests.helpers import random_bytes, sha256_hex, unique_name, upload
+
+CHUNK = SHA256.MERKLE_MIN_CHUNK_SIZE
+
+
+def leaf(data):
+    return hashlib.sha256(b'\x00' + data).hexdigest()
+
+
+def node(left, right):
+    return hashlib.sha256(b'\x01' + bytes.fromhex(left) + bytes.fromhex(right)).hexdigest()
+
+
+def test_root_carries_odd_node_up():
+    leaves = [leaf(bytes([i])) for i in range(3)]
+    assert SHA256.merkle_root(leaves) == node(node(leaves[0], leaves[1]), leaves[2])
+    assert SHA256.merkle_root([]) == leaf(b'')
+
+
+def test_file_and_stream_trees_agree(tmp_path):
+    data = random_bytes(CHUNK * 5 + 100)
+    path = tmp_path / 'data.bin'
+    path.write_bytes(data)
+    tree = SHA256.calculate_merkle_tree(str(path), CHUNK)
+    assert tree['chunks'] == [leaf(data[i:i + CHUNK]) for i in range(0, len(data), CHUNK)]
+    chunks, flat, size = SHA256.merkle_chunk_hashes_from_stream(io.BytesIO(data), CHUNK)
+    assert (chunks, flat, size) == (tree['chunks'], sha256_hex(data), len(data))
+
+
+def test_merkle_hash_endpoint(client):
+    data = random_bytes(CHUNK * 3)
+    response = client.post('/api/merkle-hash', data={
+        'file': (io.BytesIO(data), unique_name()), 'chunk_size': str(CHUNK)})
+    body = response.get_json()
+    assert body['hash'] == sha256_hex(data)
+    assert body['root'] == SHA256.merkle_root(body['chunks'])
+    assert len(body['chunks']) == 3
+    
+    response = client.post('/api/merkle-hash', data={
+        'file': (io.BytesIO(data), unique_name()), 'chunk_size': '10'})
+    assert response.status_code == 400
+
+
+def test_verify_pinpoints_corrupt_chunk(client):
+    data = random_bytes(CHUNK * 4)
+    name = unique_name()
+    upload(client, data, name)
+    tree = client.post('/api/merkle-hash', data={
+        'file': (io.BytesIO(data), name), 'chunk_size': str(CHUNK)}).get_json()
+    claim = {'filename': name, 'chunk_size': CHUNK, 'chunks': tree['chunks'], 'root': tree['root']}
+    
+    assert client.post('/api/merkle-verify', json=claim).get_json()['verified'] is True
+    
+    # Flip a byte in the third chunk of the stored blob
+    with open(SHA256.content_store.resolve(name)['path'], 'r+b') as f:
+        f.seek(CHUNK * 2 + 10)
+        f.write(bytes([data[CHUNK * 2 + 10] ^ 0xFF]))
+    
+    body = client.post('/api/merkle-verify', json=claim).get_json()
+    assert body['verified'] is False
+    assert body['corrupt_chunks'] == [2]
+    
+    # A byte range only reads the chunks covering it
+    body = client.post('/api/merkle-verify', json=dict(claim, offset=0, length=CHUNK * 2)).get_json()
+    assert body['verified'] is True
+    assert body['checked'] == [0, 1]
+    body = client.post('/api/merkle-verify', json=dict(claim, indices=[2, 3])).get_json()
+    assert body['corrupt_chunks'] == [2]
+
+
+def test_verify_rejects_chunks_not_matching_root(client):
+    name = unique_name()
+    upload(client, b'data', name)
+    response = client.post('/api/merkle-verify', json={
+        'filename': name, 'chunk_size': CHUNK, 'chunks': [leaf(b'data')], 'root': '0' * 64})
+    assert response.status_code == 400
+    response = client.post('/api/merkle-verify', json={
+        'filename': unique_name(), 'chunk_size': CHUNK, 'chunks': [leaf(b'data')]})
+    assert response.status_code == 404
+
+
+@pytest.mark.parametrize('claim', [
+    {'root': 'not hex'},
+    {'root': 'ab' * 31 + 'zz'},
+    {'root': 5},
+    {'chunks': ['xyz']},
+    {'chunks': ['ab' * 31 + 'zz'], 'root': '0' * 64},
+])
+def test_verify_rejects_malformed_hashes(client, claim):
+    name = unique_name()
+    upload(client, b'data', name)
+    response = client.post('/api/merkle-verify', json=dict(
+        {'filename': name, 'chunk_size': CHUNK, 'chunks': [leaf(b'data')]}, **claim))
+    assert response.status_code == 400
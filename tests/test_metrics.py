@@ -0,0 +1,84 @@
+"""Prometheus metrics."""
+
+import io
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+
+import SHA256
+from tests.helpers import random_bytes, upload
+
+
+def sample(text, name, **labels):
+    """Return the value of one sample in Prometheus text output (0 if absent)."""
+    for line in text.splitlines():
+        match = re.fullmatch(r'(\w+)(?:\{(.*)\})? (\S+)', line)
+        if not match or match.group(1) != name:
+            continue
+        found = dict(re.findall(r'(\w+)="((?:[^"\\]|\\.)*)"', match.group(2) or ''))
+        if all(found.get(k) == v for k, v in labels.items()):
+            return float(match.group(3))
+    return 0.0
+
+
+def test_requests_and_hashed_bytes_are_counted(client):
+    before = client.get('/metrics').get_data(as_text=True)
+    upload(client, random_bytes(100_000))
+    client.post('/verify', data={})        # 400
+    client.post('/api/merkle-hash', data={'file': (io.BytesIO(b'x' * 5000), 'm')})
+    after = client.get('/metrics').get_data(as_text=True)
+    
+    def delta(name, **labels):
+        return sample(after, name, **labels) - sample(before, name, **labels)
+    
+    assert delta('sha256_http_requests_total', route='/upload', method='POST', status='200') == 1
+    assert delta('sha256_http_requests_total', route='/verify', method='POST', status='400') == 1
+    assert delta('sha256_http_request_duration_seconds_count', route='/upload') == 1
+    assert delta('sha256_bytes_hashed_total') >= 5000
+    assert '# TYPE sha256_http_request_duration_seconds histogram' in after
+
+
+def test_histogram_buckets_are_cumulative():
+    m = SHA256.Metrics()
+    m.describe('t_seconds', 'histogram', 'test', (0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5):
+        m.observe('t_seconds', value)
+    text = m.render()
+    assert sample(text, 't_seconds_bucket', le='0.1') == 1
+    assert sample(text, 't_seconds_bucket', le='1.0') == 3
+    assert sample(text, 't_seconds_bucket', le='+Inf') == 4
+    assert sample(text, 't_seconds_sum') == 6.05
+
+
+def test_shards_of_finished_threads_are_kept():
+    m = SHA256.Metrics()
+    m.describe('t_total', 'counter', 'test')
+    threads = [threading.Thread(target=m.inc, args=('t_total', (('k', 'a"b'),))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sample(m.render(), 't_total', k='a\\"b') == 8
+
+
+def test_processes_share_totals_and_dead_ones_are_archived(tmp_path):
+    m = SHA256.Metrics()
+    m.describe('t_total', 'counter', 'test')
+    m.describe('t_live', 'gauge', 'test')
+    m.multiprocess_dir = str(tmp_path)
+    m.inc('t_total', value=1)
+    
+    dead = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'],
+                          capture_output=True, text=True).stdout.strip()
+    other = {'counters': [['t_total', [], 10], ['t_live', [], 3]], 'histograms': []}
+    for pid in (dead, os.getppid()):
+        (tmp_path / f'{pid}.json').write_text(json.dumps(other))
+    
+    text = m.render()
+    assert sample(text, 't_total') == 21
+    assert sample(text, 't_live') == 3          # the dead process's gauge is dropped
+    assert not (tmp_path / f'{dead}.json').exists()
+    assert sample(m.render(), 't_total') == 21  # archived counts are kept
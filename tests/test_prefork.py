@@ -0,0 +1,118 @@
+"""Multi-process pre-fork server."""
+
+import http.client
+import os
+import signal
+import subprocess
+import sys
+import textwrap
+import time
+import uuid
+
+import pytest
+
+import loadtest_sha256
+from tests.helpers import random_bytes, sha256_hex
+from tests.test_metrics import sample
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def request(port, method='GET', path='/', body=None, headers=None, timeout=10):
+    """One request on a fresh connection, retried while the server (re)starts."""
+    deadline = time.monotonic() + timeout
+    while True:
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        try:
+            conn.request(method, path, body=body, headers=headers or {})
+            response = conn.getresponse()
+            return response.status, response.read()
+        except (ConnectionError, http.client.RemoteDisconnected):
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+        finally:
+            conn.close()
+
+
+def wait_listening(process, port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        assert process.poll() is None, f'server exited with {process.returncode}'
+        try:
+            return request(port, timeout=0)
+        except OSError:
+            time.sleep(0.1)
+    raise AssertionError('server did not start')
+
+
+@pytest.fixture
+def serve(tmp_path):
+    processes = []
+    
+    def start(command):
+        process = subprocess.Popen(command, cwd=str(tmp_path), stdout=subprocess.DEVNULL,
+                                   stderr=subprocess.DEVNULL)
+        processes.append(process)
+        return process
+    
+    yield start
+    for process in processes:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+
+def test_workers_share_the_port_and_are_recycled(serve):
+    port = loadtest_sha256.free_port()
+    script = textwrap.dedent(f"""
+        import os, sys
+        sys.path.insert(0, {ROOT!r})
+        import SHA256
+        
+        def app(environ, start_response):
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return [str(os.getpid()).encode()]
+        
+        sys.exit(SHA256.PreforkServer(app, '127.0.0.1', {port}, workers=2, threads=2,
+                                      max_requests=3).run())
+    """)
+    server = serve([sys.executable, '-c', script])
+    wait_listening(server, port)
+    
+    pids = set()
+    for _ in range(20):
+        status, body = request(port)
+        assert status == 200
+        pids.add(int(body))
+    # Two workers handling at most three requests each means fresh workers took over
+    assert len(pids) > 2
+    assert server.pid not in pids
+    
+    server.send_signal(signal.SIGTERM)
+    assert server.wait(timeout=30) == 0
+
+
+def test_app_under_prefork_server(serve):
+    port = loadtest_sha256.free_port()
+    server = serve([sys.executable, os.path.join(ROOT, 'SHA256.py'), 'serve', '--host',
+                    '127.0.0.1', '--port', str(port), '--workers', '2', '--threads', '2'])
+    wait_listening(server, port)
+    
+    uploads = 6
+    for _ in range(uploads):
+        data = random_bytes(20_000)
+        boundary = uuid.uuid4().hex
+        body = (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; '
+                f'filename="{boundary}.bin"\r\n\r\n').encode() + data + f'\r\n--{boundary}--\r\n'.encode()
+        status, payload = request(port, 'POST', '/upload', body,
+                                  {'Content-Type': f'multipart/form-data; boundary={boundary}'})
+        assert status == 200 and sha256_hex(data).encode() in payload
+    
+    # Every worker's counts show up whichever worker answers the scrape
+    time.sleep(1.5)
+    status, text = request(port, path='/metrics')
+    assert sample(text.decode(), 'sha256_http_requests_total', route='/upload', status='200') == uploads
+    
+    server.send_signal(signal.SIGTERM)
+    assert server.wait(timeout=30) == 0
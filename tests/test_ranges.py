@@ -0,0 +1,114 @@
+"""Byte-range and sampled hashing of stored files."""
+
+import pytest
+
+import SHA256
+from tests.helpers import random_bytes, sha256_hex, unique_name, upload
+
+RANGE = 4096
+
+
+@pytest.fixture
+def stored(client):
+    data = random_bytes(RANGE * 8 + 100)
+    name = unique_name()
+    upload(client, data, name)
+    return name, data
+
+
+@pytest.mark.parametrize('strategy', ['pread', 'mmap'])
+def test_range_equals_hash_of_slice(tmp_path, strategy):
+    data = random_bytes(200_000)
+    path = tmp_path / 'data.bin'
+    path.write_bytes(data)
+    for offset, length in ((0, 10), (65_537, 70_000), (199_990, 100), (300_000, 5)):
+        assert SHA256.calculate_range_sha256(str(path), offset, length, strategy) == \
+            sha256_hex(data[offset:offset + length])
+
+
+def test_range_hash_endpoint(client, stored):
+    name, data = stored
+    body = client.get(f'/api/range-hash?filename={name}&offset=5000&length=300').get_json()
+    assert body['ranges'] == [{'offset': 5000, 'length': 300,
+                               'sha256': sha256_hex(data[5000:5300])}]
+    
+    ranges = [{'offset': i * 1000, 'length': 1500} for i in range(20)] + \
+             [{'offset': len(data) - 50, 'length': 1000}]
+    body = client.post('/api/range-hash', json={'filename': name, 'ranges': ranges}).get_json()
+    assert [r['sha256'] for r in body['ranges']] == [
+        sha256_hex(data[r['offset']:r['offset'] + r['length']]) for r in ranges]
+    assert body['ranges'][-1]['length'] == 50
+
+
+def test_range_hash_errors(client, stored):
+    name, _ = stored
+    assert client.get(f'/api/range-hash?filename={name}&offset=-1&length=5').status_code == 400
+    assert client.get(f'/api/range-hash?filename={name}&offset=x').status_code == 400
+    assert client.get(f'/api/range-hash?filename={unique_name()}').status_code == 404
+
+
+def test_grid_hashes_and_sampled_verify(client, stored):
+    name, data = stored
+    assert client.post('/api/sampled-verify', json={'filename': name}).status_code == 409
+    
+    body = client.post('/api/range-hashes', json={'filename': name, 'range_size': RANGE}).get_json()
+    assert body['ranges'] == 9
+    
+    body = client.post('/api/sampled-verify', json={'filename': name, 'samples': 100}).get_json()
+    assert body['verified'] is True
+    assert body['checked'] == list(range(9)) and body['coverage'] == 1.0
+    
+    # Damage one range; a full sample finds exactly it
+    with open(SHA256.content_store.resolve(name)['path'], 'r+b') as f:
+        f.seek(RANGE * 5 + 7)
+        f.write(b'X')
+    body = client.post('/api/sampled-verify', json={'filename': name, 'samples': 100}).get_json()
+    assert body['verified'] is False
+    assert body['mismatched_ranges'] == [{'offset': RANGE * 5, 'length': RANGE}]
+    
+    # A partial sample reads only part of the file, reproducibly for a seed
+    first = client.post('/api/sampled-verify', json={'filename': name, 'samples': 3,
+                                                    'seed': 7}).get_json()
+    again = client.post('/api/sampled-verify', json={'filename': name, 'samples': 3,
+                                                    'seed': 7}).get_json()
+    assert len(first['checked']) == 3 and first['checked'] == again['checked']
+    assert first['coverage'] < 0.5
+    
+    # Range hashes are never recorded from damaged data
+    assert client.post('/api/range-hashes', json={'filename': name}).status_code == 409
+
+
+def test_grid_hashes_match_slices(tmp_path):
+    data = random_bytes(RANGE * 3 + 1)
+    path = tmp_path / 'data.bin'
+    path.write_bytes(data)
+    hashes, whole, size = SHA256.grid_range_hashes(str(path), RANGE)
+    assert hashes == [sha256_hex(data[i:i + RANGE]) for i in range(0, len(data), RANGE)]
+    assert (whole, size) == (sha256_hex(data), len(data))
+
+
+@pytest.mark.parametrize('path, body', [
+    ('/api/range-hash', ['not', 'an', 'object']),
+    ('/api/range-hash', {'filename': ['a'], 'ranges': [{'offset': 0, 'length': 1}]}),
+    ('/api/range-hashes', ['not', 'an', 'object']),
+    ('/api/range-hashes', {'range_size': 'big'}),
+    ('/api/sampled-verify', ['not', 'an', 'object']),
+    ('/api/sampled-verify', {'filename': 5}),
+])
+def test_bad_json_bodies_are_400(client, path, body):
+    assert client.post(path, json=body).status_code == 400
+
+
+@pytest.mark.parametrize('range_size', [1, SHA256.RANGE_MIN_HASH_SIZE - 1,
+                                        SHA256.RANGE_MAX_HASH_SIZE + 1, 'x', None])
+def test_range_size_limits(client, stored, range_size):
+    name, _ = stored
+    response = client.post('/api/range-hashes', json={'filename': name, 'range_size': range_size})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('samples', ['many', [3], 0])
+def test_bad_samples_are_400(client, stored, samples):
+    name, _ = stored
+    response = client.post('/api/sampled-verify', json={'filename': name, 'samples': samples})
+    assert response.status_code == 400
@@ -0,0 +1,149 @@
+"""Resumable chunked uploads."""
+
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import SHA256
+from tests.helpers import random_bytes, sha256_hex, unique_name, upload
+
+CHUNK = 32 * 1024
+
+
+def create(client, data, name=None, **extra):
+    body = dict({'filename': name or unique_name(), 'size': len(data), 'chunk_size': CHUNK,
+                 'sha256': sha256_hex(data)}, **extra)
+    return client.post('/api/uploads', json=body)
+
+
+def put_chunk(client, upload_id, data, index, chunk_hash=None):
+    chunk = data[index * CHUNK:(index + 1) * CHUNK]
+    return client.put(f'/api/uploads/{upload_id}/chunks/{index}', data=chunk,
+                      headers={'X-Chunk-SHA256': chunk_hash or sha256_hex(chunk)})
+
+
+def test_out_of_order_upload_beyond_request_limit(client, monkeypatch):
+    monkeypatch.setitem(SHA256.app.config, 'MAX_CONTENT_LENGTH', 2 * CHUNK)
+    data = random_bytes(CHUNK * 6 + 123)
+    name = unique_name()
+    assert upload(client, data).status_code == 413
+    
+    session = create(client, data, name)
+    assert session.status_code == 201
+    session = session.get_json()
+    upload_id = session['upload_id']
+    assert session['chunk_count'] == 7
+    
+    for index in (3, 0, 6, 1):
+        assert put_chunk(client, upload_id, data, index).status_code == 200
+    
+    # Resume: the server says which chunks it still needs
+    status = client.get(f'/api/uploads/{upload_id}').get_json()
+    assert status['missing'] == [2, 4, 5]
+    response = client.post(f'/api/uploads/{upload_id}/complete')
+    assert response.status_code == 409
+    
+    for index in status['missing']:
+        put_chunk(client, upload_id, data, index)
+    body = client.post(f'/api/uploads/{upload_id}/complete').get_json()
+    assert body['hash'] == sha256_hex(data)
+    assert body['size'] == len(data)
+    with open(SHA256.content_store.resolve(name)['path'], 'rb') as f:
+        assert f.read() == data
+    assert client.get(f'/api/uploads/{upload_id}').status_code == 404
+
+
+def test_corrupt_chunk_is_rejected_and_can_be_resent(client):
+    data = random_bytes(CHUNK * 2)
+    upload_id = create(client, data).get_json()['upload_id']
+    assert put_chunk(client, upload_id, data, 0, '0' * 64).status_code == 422
+    assert client.get(f'/api/uploads/{upload_id}').get_json()['missing'] == [0, 1]
+    assert put_chunk(client, upload_id, data, 0).status_code == 200
+    assert put_chunk(client, upload_id, data, 0).status_code == 200   # retries are fine
+
+
+def test_wrong_whole_file_hash_is_refused(client):
+    data = random_bytes(CHUNK + 1)
+    upload_id = create(client, data, sha256='f' * 64).get_json()['upload_id']
+    put_chunk(client, upload_id, data, 0)
+    put_chunk(client, upload_id, data, 1)
+    assert client.post(f'/api/uploads/{upload_id}/complete').status_code == 422
+
+
+def test_abort_and_bad_requests(client):
+    data = random_bytes(100)
+    upload_id = create(client, data).get_json()['upload_id']
+    assert client.delete(f'/api/uploads/{upload_id}').status_code == 200
+    assert client.get(f'/api/uploads/{upload_id}').status_code == 404
+    assert client.get('/api/uploads/not-an-id').status_code == 404
+    assert create(client, data, filename='').status_code == 400
+    assert create(client, data, chunk_size=SHA256.app.config['MAX_CONTENT_LENGTH'] + 1
+                  ).status_code == 400
+
+
+def test_expired_sessions_are_swept(tmp_path):
+    sessions = SHA256.UploadSessions(str(tmp_path), SHA256.content_store, ttl=60)
+    upload_id = sessions.create('old.bin', 10, 10)['upload_id']
+    sessions.create('new.bin', 10, 10)
+    log = tmp_path / 'sessions' / upload_id / 'chunks.log'
+    stale = log.stat().st_mtime - 120
+    os.utime(log, (stale, stale))
+    assert sessions.gc() == 1
+    assert len(os.listdir(tmp_path / 'sessions')) == 1
+
+
+class RacingStream:
+    """Request body that lets another request run halfway through it."""
+
+    def __init__(self, data, halfway):
+        self.stream = io.BytesIO(data)
+        self.halfway = halfway
+
+    def read(self, size=-1):
+        if self.halfway is not None:
+            self.halfway, halfway = None, self.halfway
+            halfway()
+        return self.stream.read(size)
+
+
+def test_bad_retry_cannot_overwrite_a_verified_chunk(client):
+    data = random_bytes(CHUNK * 2)
+    upload_id = create(client, data).get_json()['upload_id']
+    good = sha256_hex(data[:CHUNK])
+
+    def good_upload_lands():
+        assert put_chunk(client, upload_id, data, 0).status_code == 200
+
+    bad = RacingStream(b'X' * CHUNK, good_upload_lands)
+    with pytest.raises(SHA256.UploadSessionError) as e:
+        SHA256.upload_sessions.write_chunk(upload_id, 0, bad, good)
+    assert e.value.status == 422
+    session_dir = os.path.join(SHA256.upload_sessions.sessions_dir, upload_id)
+    assert not [f for f in os.listdir(session_dir) if f.startswith('chunk-')]
+    put_chunk(client, upload_id, data, 1)
+    body = client.post(f'/api/uploads/{upload_id}/complete').get_json()
+    assert body['hash'] == sha256_hex(data)
+    with open(SHA256.content_store.blob_path(body['hash']), 'rb') as f:
+        assert f.read() == data
+
+
+def test_concurrent_finalize_finishes_once(client):
+    data = random_bytes(CHUNK + 10)
+    upload_id = create(client, data).get_json()['upload_id']
+    put_chunk(client, upload_id, data, 0)
+    put_chunk(client, upload_id, data, 1)
+    barrier = threading.Barrier(2)
+
+    def finalize():
+        barrier.wait()
+        try:
+            return SHA256.upload_sessions.finalize(upload_id)['hash']
+        except SHA256.UploadSessionError as e:
+            return e.status
+
+    with ThreadPoolExecutor(2) as pool:
+        results = list(pool.map(lambda _: finalize(), range(2)))
+    assert sorted(results, key=lambda r: r == 404) == [sha256_hex(data), 404]
@@ -0,0 +1,100 @@
+"""Background integrity scrubber."""
+
+import os
+import time
+
+import pytest
+
+import SHA256
+from tests.helpers import random_bytes, sha256_hex
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SHA256.ContentStore(str(tmp_path))
+    store.setup()
+    return store
+
+
+def add_blobs(store, count, size=2000):
+    digests = []
+    for i in range(count):
+        data = random_bytes(size)
+        path = os.path.join(store.root, f'incoming-{i}')
+        with open(path, 'wb') as f:
+            f.write(data)
+        store.add_file(path, sha256_hex(data))
+        store.set_ref(f'file-{i}', sha256_hex(data), size)
+        digests.append(sha256_hex(data))
+    return sorted(digests)
+
+
+def test_pass_finds_bit_rot(store):
+    digests = add_blobs(store, 4)
+    with open(store.blob_path(digests[1]), 'r+b') as f:
+        f.write(b'ROT')
+    scrubber = SHA256.Scrubber(store)
+    scrubber.set_enabled(True)
+    assert scrubber.scrub_pass() is True
+    
+    mismatches = scrubber.mismatches()
+    assert [m['sha256'] for m in mismatches] == [digests[1]]
+    assert mismatches[0]['actual'] != digests[1]
+    assert mismatches[0]['filenames']
+    status = scrubber.status()
+    assert status['pass'] == 2 and status['last_pass_files'] == 4 and status['mismatches'] == 1
+
+
+def test_stopped_pass_resumes_after_restart(store):
+    digests = add_blobs(store, 5)
+    scrubber = SHA256.Scrubber(store)
+    scrubber.set_enabled(True)
+    checked = []
+    
+    def clear_mismatch(sha256_hex):
+        checked.append(sha256_hex)
+        if len(checked) == 2:
+            scrubber._stop.set()
+    scrubber.clear_mismatch = clear_mismatch
+    assert scrubber.scrub_pass() is False
+    assert scrubber.status()['position'] == digests[1]
+    
+    restarted = SHA256.Scrubber(store)
+    assert restarted.status()['files_checked'] == 2
+    assert [d for d, _ in restarted.iter_blobs(digests[1])] == digests[2:]
+    assert restarted.scrub_pass() is True
+    assert restarted.status()['last_pass_files'] == 5
+
+
+def test_disabled_scrubber_does_nothing(store):
+    add_blobs(store, 2)
+    scrubber = SHA256.Scrubber(store)
+    assert scrubber.scrub_pass() is False
+    assert scrubber.status()['files_checked'] == 0
+
+
+def test_rate_limiter_throttles():
+    limiter = SHA256.RateLimiter(rate=1000, burst=100)
+    start = time.monotonic()
+    for _ in range(3):
+        limiter.acquire(100)
+    # The first 100 units are the burst; the next 200 take 0.2 s
+    assert time.monotonic() - start >= 0.18
+
+
+def test_control_endpoints_need_the_admin_token(client, monkeypatch):
+    monkeypatch.setitem(SHA256.app.config, 'ADMIN_TOKEN', '')
+    assert client.post('/api/scrub/start').status_code == 403
+    
+    monkeypatch.setitem(SHA256.app.config, 'ADMIN_TOKEN', 'secret')
+    response = client.post('/api/scrub/start', headers={'Authorization': 'Bearer wrong'})
+    assert response.status_code == 401
+    assert response.headers['WWW-Authenticate'] == 'Bearer'
+    
+    auth = {'Authorization': 'Bearer secret'}
+    try:
+        assert client.post('/api/scrub/start', headers=auth).get_json()['enabled'] is True
+        assert client.get('/api/scrub').get_json()['enabled'] is True
+    finally:
+        assert client.post('/api/scrub/stop', headers=auth).get_json()['enabled'] is False
+    assert client.post('/api/scrub/bogus', headers=auth).status_code == 404
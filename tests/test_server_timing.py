@@ -0,0 +1,59 @@
+"""Server-Timing phases and the profiling hook."""
+
+import pstats
+import time
+
+import SHA256
+from tests.helpers import random_bytes, upload
+
+
+def phases(response):
+    timing = {}
+    for entry in response.headers['Server-Timing'].split(', '):
+        name, duration = entry.split(';dur=')
+        timing[name] = float(duration)
+    return timing
+
+
+def test_upload_reports_its_phases(client):
+    timing = phases(upload(client, random_bytes(200_000)))
+    assert {'receive', 'hash', 'store', 'serialize', 'total'} <= set(timing)
+    assert timing['total'] >= timing['hash']
+
+
+def test_every_response_has_a_total(client):
+    timing = phases(client.get('/api/admission'))
+    assert set(timing) == {'total'}
+
+
+def test_every_nth_request_is_profiled(client, monkeypatch, tmp_path):
+    monkeypatch.setitem(SHA256.app.config, 'PROFILE_DIR', str(tmp_path))
+    monkeypatch.setitem(SHA256.app.config, 'PROFILE_EVERY_N', 1)
+    upload(client, random_bytes(1000))
+    profiles = list(tmp_path.glob('*-upload-*.prof'))
+    assert len(profiles) == 1
+    assert pstats.Stats(str(profiles[0])).total_calls > 0
+
+
+def test_sampling_profiler_collects_stacks():
+    profiler = SHA256.SamplingProfiler(interval=0.001)
+    
+    def busy_wait():
+        end = time.perf_counter() + 0.1
+        while time.perf_counter() < end:
+            pass
+    
+    profiler.start()
+    busy_wait()
+    samples = profiler.stop()
+    assert samples
+    assert any('busy_wait' in stack for stack in samples)
+    assert profiler.stop() == {}
+
+
+def test_fast_requests_leave_no_sampled_profile(client, monkeypatch, tmp_path):
+    monkeypatch.setitem(SHA256.app.config, 'PROFILE_DIR', str(tmp_path))
+    monkeypatch.setitem(SHA256.app.config, 'PROFILE_EVERY_N', 0)
+    monkeypatch.setitem(SHA256.app.config, 'PROFILE_SLOW_MS', 60_000)
+    client.get('/api/admission')
+    assert not list(tmp_path.iterdir())
@@ -0,0 +1,76 @@
+"""Content-addressed, deduplicating upload storage."""
+
+import os
+
+import SHA256
+from tests.helpers import random_bytes, sha256_hex, unique_name, upload
+
+
+def test_same_content_is_stored_once(client):
+    data = random_bytes(40_000)
+    first, second = unique_name(), unique_name()
+    assert upload(client, data, first).get_json()['duplicate'] is False
+    assert upload(client, data, second).get_json()['duplicate'] is True
+    
+    store = SHA256.content_store
+    a, b = store.resolve(first), store.resolve(second)
+    assert a['sha256'] == b['sha256'] == sha256_hex(data)
+    assert a['path'] == b['path'] == store.blob_path(sha256_hex(data))
+    # Sharded layout: objects/ab/cd/abcd...
+    assert os.path.relpath(a['path'], store.objects_dir).split(os.sep) == [
+        a['sha256'][:2], a['sha256'][2:4], a['sha256']]
+
+
+def test_reupload_points_name_at_new_blob(client):
+    name = unique_name()
+    old, new = random_bytes(1000), random_bytes(1000)
+    upload(client, old, name)
+    upload(client, new, name)
+    ref = SHA256.content_store.resolve(name)
+    assert ref['sha256'] == sha256_hex(new)
+    with open(ref['path'], 'rb') as f:
+        assert f.read() == new
+
+
+def test_gc_deletes_only_unreferenced_blobs(tmp_path):
+    store = SHA256.ContentStore(str(tmp_path))
+    store.setup()
+    
+    def add(data):
+        path = tmp_path / unique_name()
+        path.write_bytes(data)
+        store.add_file(str(path), sha256_hex(data))
+        return sha256_hex(data)
+    
+    old, new, shared = add(b'old'), add(b'new'), add(b'shared')
+    store.set_ref('a', old, 3)
+    store.set_ref('b', shared, 6)
+    store.set_ref('c', shared, 6)
+    store.set_ref('a', new, 3)          # old is now orphaned
+    store.set_ref('c', new, 3)          # shared still has b
+    
+    # Within the grace period nothing goes
+    assert store.gc()['deleted'] == 0
+    assert store.gc(grace=-1) == {'deleted': 1, 'bytes': 3}
+    assert not store.has_blob(old)
+    assert store.has_blob(new) and store.has_blob(shared)
+
+
+def test_full_gc_finds_blobs_never_referenced(tmp_path):
+    store = SHA256.ContentStore(str(tmp_path))
+    store.setup()
+    path = tmp_path / 'stray'
+    path.write_bytes(b'stray')
+    store.add_file(str(path), sha256_hex(b'stray'))
+    assert store.gc(grace=-1)['deleted'] == 0
+    assert store.gc(grace=-1, full=True)['deleted'] == 1
+
+
+def test_duplicate_add_file_removes_the_copy(tmp_path):
+    store = SHA256.ContentStore(str(tmp_path))
+    store.setup()
+    for expected in (True, False):
+        path = tmp_path / 'incoming'
+        path.write_bytes(b'same')
+        assert store.add_file(str(path), sha256_hex(b'same')) is expected
+        assert not path.exists()
@@ -0,0 +1,63 @@
+"""Uploads are hashed while they stream in (/upload, /verify)."""
+
+import io
+import os
+
+import SHA256
+from tests.helpers import random_bytes, sha256_hex, unique_name, upload
+
+
+def test_upload_hashes_and_stores_file(client):
+    data = random_bytes(300_000)
+    name = unique_name()
+    response = upload(client, data, name)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['success'] is True
+    assert body['hash'] == sha256_hex(data)
+    assert body['size'] == len(data)
+    with open(SHA256.content_store.resolve(name)['path'], 'rb') as f:
+        assert f.read() == data
+
+
+def test_duplicate_upload_leaves_no_ingest_file(client):
+    data = random_bytes(50_000)
+    upload(client, data).close()
+    response = upload(client, data)
+    response.close()
+    assert response.get_json()['duplicate'] is True
+    folder = SHA256.app.config['UPLOAD_FOLDER']
+    assert not [n for n in os.listdir(folder) if n.startswith('.ingest-')]
+
+
+def test_upload_without_file_is_rejected(client):
+    response = client.post('/upload', data={})
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+
+def test_verify_matches_and_mismatches(client):
+    data = random_bytes(70_000)
+    for expected, verified in ((sha256_hex(data), True), ('0' * 64, False)):
+        response = client.post('/verify', data={
+            'file': (io.BytesIO(data), unique_name()), 'expected_hash': expected.upper()})
+        body = response.get_json()
+        assert body['verified'] is verified
+        assert body['calculated_hash'] == sha256_hex(data)
+
+
+def test_verify_hash_api_does_not_store(client):
+    data = random_bytes(10_000)
+    name = unique_name()
+    response = client.post('/api/verify-hash', data={
+        'file': (io.BytesIO(data), name), 'client_hash': sha256_hex(data)})
+    body = response.get_json()
+    assert body['verified'] is True
+    assert body['server_hash'] == sha256_hex(data)
+    assert SHA256.content_store.resolve(name) is None
+
+
+def test_calculate_hash_api(client):
+    data = random_bytes(1234)
+    response = client.post('/api/calculate-hash', data={'file': (io.BytesIO(data), unique_name())})
+    assert response.get_json()['hash'] == sha256_hex(data)
@@ -0,0 +1,63 @@
+"""Bulk verification of stored files with streamed NDJSON results."""
+
+import json
+
+import SHA256
+from sha256app.manifest import _manifest_size
+from tests.helpers import random_bytes, sha256_hex, unique_name, upload
+
+
+def verify(client, lines, query=''):
+    response = client.post('/api/verify-manifest' + query, data='\n'.join(lines),
+                           content_type='application/x-ndjson')
+    assert response.mimetype == 'application/x-ndjson'
+    results = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    return {r['line']: r for r in results[:-1]}, results[-1]['summary']
+
+
+def test_every_status_is_reported(client):
+    good, rotten, other = random_bytes(2000), random_bytes(2000), random_bytes(2000)
+    names = [unique_name() for _ in range(4)]
+    upload(client, good, names[0])
+    upload(client, rotten, names[1])
+    upload(client, other, names[2])
+    with open(SHA256.content_store.resolve(names[1])['path'], 'r+b') as f:
+        f.write(b'ROT')
+    
+    results, summary = verify(client, [
+        json.dumps({'filename': names[0], 'hash': sha256_hex(good), 'size': str(len(good))}),
+        f'{sha256_hex(rotten)}  {names[1]}',
+        f'{sha256_hex(good)} *{names[2]}',
+        '# comment',
+        json.dumps({'filename': names[3], 'hash': sha256_hex(good)}),
+        json.dumps({'filename': names[0], 'hash': sha256_hex(good), 'size': len(good) + 1}),
+        json.dumps({'filename': names[0], 'hash': sha256_hex(good), 'size': 'big'}),
+        'garbage',
+    ])
+    assert results[1]['status'] == 'OK'
+    assert results[2] == dict(results[2], status='MISMATCH', detail='stored data corrupted')
+    assert results[3]['status'] == 'MISMATCH' and results[3]['actual'] == sha256_hex(other)
+    assert 4 not in results
+    assert results[5]['status'] == 'MISSING'
+    assert results[6]['detail'] == 'size differs'
+    assert results[7]['status'] == 'ERROR' and 'non-negative integer' in results[7]['detail']
+    assert results[8]['status'] == 'ERROR'
+    assert summary['total'] == 7
+    assert (summary['OK'], summary['MISMATCH'], summary['MISSING'], summary['ERROR']) == (1, 3, 1, 2)
+
+
+def test_problems_only(client):
+    data = random_bytes(100)
+    name = unique_name()
+    upload(client, data, name)
+    results, summary = verify(client, [f'{sha256_hex(data)}  {name}',
+                                       f'{sha256_hex(data)}  {unique_name()}'], '?problems_only=1')
+    assert list(results) == [2]
+    assert summary['OK'] == 1
+
+
+def test_size_coercion():
+    assert _manifest_size('12') == 12
+    assert _manifest_size(12) == 12
+    for bad in (True, -1, '-1', '1_0', 12.5, '１２', None):
+        assert _manifest_size(bad) is None